@@ -0,0 +1,477 @@
+"""
+ConvoAI ASGI Interface - Async chat endpoints for production serving
+
+/chat, /chat/stream, /chat/batch and the /ws WebSocket are handled natively
+on the event loop, so thousands of waiting chats cost coroutines rather
+than threads. /chat is admitted by the same inference scheduler as the
+Flask app but generates on the asyncio Ollama client (on a worker thread
+only when hedged routing is on), and /chat/batch items queue there at
+BATCH priority; the streaming routes use the asyncio Ollama client (or,
+with hedged routing on, send the routed reply as one chunk). The
+prerendered page and static assets are sent straight from memory. Every
+other route is served by the Flask app through asgiref.
+
+Run with: python serve.py   (or: uvicorn asgi_app:app --workers 4)
+"""
+
+import asyncio
+import json
+import time
+from http.cookies import CookieError, SimpleCookie
+from urllib.parse import urlsplit
+
+from asgiref.wsgi import WsgiToAsgi
+
+from config.settings import Settings
+from chatbot.lock_striping import AsyncStripedLock
+from chatbot.scheduler import INTERACTIVE
+from chatbot.batching import parse_batch, scheduled_batch_async
+from chatbot.metrics import ERRORS, REQUESTS, REQUEST_SECONDS
+from chatbot import tracing
+from chatbot.sessions import (
+    BATCH_USER_PREFIX, SESSION_COOKIE, new_session_id, session_cookie, user_id_for, valid_session_id
+)
+import web_app_with_personalities as web
+
+flask_app = WsgiToAsgi(web.app)
+
+# Same per-session ordering as the Flask app, without blocking the event loop
+user_locks = AsyncStripedLock(Settings.WEB_LOCK_STRIPES)
+# user_id -> open /ws ChatSocket in this worker (one per browser session)
+open_sockets = {}
+
+
+async def read_json(receive, send):
+    """Read the whole request body as a JSON object ({} if empty or invalid).
+
+    Returns None, having answered 400, if the body is some other JSON value
+    (or None if the client went away).
+    """
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    try:
+        data = json.loads(body) if body else {}
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        await send_json(send, {'error': 'request body must be a JSON object'}, status=400)
+        return None
+    return data
+
+
+async def send_json(send, payload, status=200, headers=()):
+    data = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(data)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": data})
+
+
+def _header(scope, name):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def session(scope):
+    """(user_id, extra response headers): a Set-Cookie if this browser is new"""
+    cookie = SimpleCookie()
+    try:
+        cookie.load(_header(scope, b"cookie") or "")
+    except CookieError:
+        pass
+    morsel = cookie.get(SESSION_COOKIE)
+    if morsel is not None and valid_session_id(morsel.value):
+        return user_id_for(morsel.value), []
+    session_id = new_session_id()
+    return user_id_for(session_id), [(b"set-cookie", session_cookie(session_id).encode())]
+
+
+async def send_precompressed(scope, send, resource, extra_headers=()):
+    """Send a Precompressed body: no per-request rendering or compression"""
+    status, headers, body = resource.respond(
+        _header(scope, b"if-none-match"), _header(scope, b"accept-encoding")
+    )
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers]
+                   + list(extra_headers),
+    })
+    await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
+
+
+async def chat(scope, receive, send):
+    data = await read_json(receive, send)
+    if data is None:
+        return
+    user_message = data.get('message', '')
+    personality = data.get('personality', 'friendly_assistant')
+    user_id, cookie_headers = session(scope)
+
+    fallback = lambda: web.chat_brain.get_fallback(personality, reason="deadline")
+    loop = asyncio.get_running_loop()
+    timeout = web.scheduler.timeouts[INTERACTIVE]
+    # One deadline covers waiting for the session's lock and for the reply, as on the Flask path
+    deadline = time.monotonic() + timeout
+    try:
+        lock = await user_locks.acquire(user_id, timeout)
+    except TimeoutError:
+        await send_json(send, {'response': fallback()}, headers=cookie_headers)
+        return
+    try:
+        # Same queue bound, priorities and admission control as the Flask app
+        if hasattr(web.chat_brain, "generate_response_async"):
+            future = web.scheduler.submit_async(
+                web.chat_brain.generate_response_async, user_message, user_id, personality,
+                priority=INTERACTIVE, timeout=deadline - time.monotonic(), fallback=fallback
+            )
+        else:
+            # The hedged router is thread-based: it runs on the scheduler's workers
+            future = web.scheduler.submit(
+                web.chat_brain.generate_response, user_message, user_id, personality,
+                priority=INTERACTIVE, timeout=deadline - time.monotonic(), fallback=fallback
+            )
+    except BaseException:
+        lock.release()
+        raise
+    # Keep the session's lock until a late reply has finished storing its turn
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(lock.release))
+    try:
+        response = await web.scheduler.result_async(future, deadline - time.monotonic(), fallback)
+    except Exception as e:
+        ERRORS.labels("web").inc()
+        response = f'Error: {str(e)}'
+
+    await send_json(send, {'response': response}, headers=cookie_headers)
+
+
+def reply_stream(user_message, user_id, personality):
+    """Reply chunks for SSE and /ws: streamed by the Ollama brain, in one chunk
+    from the hedged router (WEB_BACKENDS), which runs on the scheduler"""
+    if web.router is None:
+        return web.brain.generate_response_stream_async(user_message, user_id, personality)
+    return _routed_reply(user_message, user_id, personality)
+
+
+async def _routed_reply(user_message, user_id, personality):
+    fallback = lambda: web.router.get_fallback(personality, reason="deadline")
+    future = web.scheduler.submit(web.router.generate_response, user_message, user_id, personality,
+                                  priority=INTERACTIVE, fallback=fallback)
+    yield await web.scheduler.result_async(future, web.scheduler.timeouts[INTERACTIVE], fallback)
+    # A late reply still stores its turn: keep the caller's session lock until it has
+    await asyncio.wait([asyncio.wrap_future(future)])
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def chat_stream(scope, receive, send):
+    data = await read_json(receive, send)
+    if data is None:
+        return
+    user_message = data.get('message', '')
+    personality = data.get('personality', 'friendly_assistant')
+    user_id, cookie_headers = session(scope)
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"), *cookie_headers],
+    })
+
+    async def event(frame):
+        await send({"type": "http.response.body", "body": frame.encode(), "more_body": True})
+
+    # Stop generating (and stop Ollama) as soon as the browser goes away
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    stream = reply_stream(user_message, user_id, personality)
+    parts = []
+    try:
+        async with user_locks.hold(user_id, timeout=Settings.INTERACTIVE_DEADLINE):
+            async for text in stream:
+                if disconnected.done():
+                    break
+                parts.append(text)
+                await event(f"data: {json.dumps({'token': text})}\n\n")
+            else:
+                await event(f"event: done\ndata: {json.dumps({'response': ''.join(parts)})}\n\n")
+    except Exception as e:
+        ERRORS.labels("web").inc()
+        await event(f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n")
+    finally:
+        await stream.aclose()
+        disconnected.cancel()
+        await send({"type": "http.response.body", "body": b""})
+
+
+async def chat_batch(scope, receive, send):
+    data = await read_json(receive, send)
+    if data is None:
+        return
+    try:
+        items = parse_batch(data.get('items'), user_prefix=BATCH_USER_PREFIX,
+                            max_items=Settings.BATCH_MAX_ITEMS)
+    except ValueError as e:
+        await send_json(send, {'error': str(e)}, status=400)
+        return
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/x-ndjson"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no")],
+    })
+
+    async def line(payload):
+        await send({"type": "http.response.body", "body": (json.dumps(payload) + "\n").encode(),
+                    "more_body": True})
+
+    # Abandon the rest of the batch if the client goes away
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    # BATCH priority on the shared scheduler: bulk work yields to interactive chats
+    results = scheduled_batch_async(web.scheduler, web.chat_brain.generate_response, items,
+                                    Settings.BATCH_CONCURRENCY)
+    start = time.perf_counter()
+    errors = 0
+    try:
+        async for result in results:
+            if disconnected.done():
+                break
+            errors += bool(result.error)
+            await line(result.to_dict())
+        else:
+            await line({'done': True, 'count': len(items), 'errors': errors,
+                        'elapsed_s': round(time.perf_counter() - start, 3)})
+    finally:
+        await results.aclose()
+        disconnected.cancel()
+        await send({"type": "http.response.body", "body": b""})
+
+
+class ChatSocket:
+    """One browser session's WebSocket: chat turns as compact JSON frames.
+
+    Client frames: {"t": "msg", "id": n, "m": text, "p": personality?},
+    {"t": "p", "p": personality} to switch, {"t": "ping"}.
+    Server frames: {"t": "tok", "id": n, "d": text} per streamed chunk, then
+    {"t": "end", "id": n, "d": reply} or {"t": "err", "id": n, "d": error};
+    {"t": "pong"}. Turns run in order (the session's user lock), while the
+    socket keeps reading so switches and pings are handled mid-reply. An idle
+    socket is closed after WS_IDLE_TIMEOUT; protocol-level pings (serve.py)
+    detect dead peers.
+    """
+
+    def __init__(self, receive, send, user_id, registry):
+        self.receive = receive
+        self.send = send
+        self.user_id = user_id
+        self.registry = registry
+        self.personality = 'friendly_assistant'
+        self.turns = set()
+        self._send_lock = asyncio.Lock()
+        self.closed = False
+
+    async def frame(self, **payload):
+        if self.closed:
+            return
+        text = json.dumps(payload, separators=(',', ':'))
+        async with self._send_lock:
+            try:
+                await self.send({"type": "websocket.send", "text": text})
+            except OSError:
+                # The browser went away mid-reply; run() sees the disconnect next
+                self.closed = True
+
+    async def close(self, code=1000, reason=""):
+        if not self.closed:
+            self.closed = True
+            async with self._send_lock:
+                await self.send({"type": "websocket.close", "code": code, "reason": reason})
+
+    async def run(self):
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(self.receive(), Settings.WS_IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    if self.turns:
+                        continue
+                    await self.close(1000, "idle")
+                    return
+                if message["type"] == "websocket.disconnect":
+                    self.closed = True
+                    return
+                await self.handle(message.get("text") or (message.get("bytes") or b"").decode())
+        finally:
+            for task in self.turns:
+                task.cancel()
+            if self.registry.get(self.user_id) is self:
+                del self.registry[self.user_id]
+
+    async def handle(self, text):
+        try:
+            data = json.loads(text)
+            kind = data["t"]
+        except (ValueError, TypeError, KeyError):
+            await self.frame(t="err", d="bad frame")
+            return
+        if kind == "msg":
+            personality = data.get("p") or self.personality
+            task = asyncio.ensure_future(self.turn(data.get("id"), str(data.get("m", "")), personality))
+            self.turns.add(task)
+            task.add_done_callback(self.turns.discard)
+        elif kind == "p":
+            self.personality = data.get("p") or self.personality
+        elif kind == "ping":
+            await self.frame(t="pong")
+
+    async def turn(self, turn_id, user_message, personality):
+        # Each turn is its own trace (the task was created with a fresh context copy)
+        trace = tracing.begin("WS /ws")
+        stream = reply_stream(user_message, self.user_id, personality)
+        parts = []
+        try:
+            async with user_locks.hold(self.user_id, timeout=Settings.INTERACTIVE_DEADLINE):
+                async for text in stream:
+                    parts.append(text)
+                    await self.frame(t="tok", id=turn_id, d=text)
+            await self.frame(t="end", id=turn_id, d=''.join(parts))
+        except Exception as e:
+            await self.frame(t="err", id=turn_id, d=str(e))
+        finally:
+            await stream.aclose()
+            tracing.finish(trace)
+
+
+def same_origin(scope) -> bool:
+    """Whether a WebSocket handshake comes from this site's own pages.
+
+    Browsers attach the session cookie to cross-site WebSocket handshakes
+    too, so a page elsewhere could chat as the visitor. Its Origin must
+    name this Host (or be listed in WS_ALLOWED_ORIGINS). Non-browser
+    clients send no Origin and carry no browser's cookie, so they pass.
+    """
+    origin = _header(scope, b"origin")
+    if origin is None:
+        return True
+    allowed = {o.strip().rstrip("/").lower() for o in Settings.WS_ALLOWED_ORIGINS.split(",") if o.strip()}
+    if origin.rstrip("/").lower() in allowed:
+        return True
+    host = _header(scope, b"host")
+    return host is not None and urlsplit(origin).netloc.lower() == host.lower()
+
+
+async def chat_socket(scope, receive, send):
+    if (await receive())["type"] != "websocket.connect":
+        return
+    if not same_origin(scope):
+        # Cross-site page: refuse the handshake (403) before it can use the cookie session
+        await send({"type": "websocket.close", "code": 1008})
+        return
+    user_id, cookie_headers = session(scope)
+
+    previous = open_sockets.get(user_id)
+    if previous is None and len(open_sockets) >= Settings.WS_MAX_CONNECTIONS:
+        # Full: refuse the handshake; the page falls back to HTTP streaming
+        await send({"type": "websocket.close", "code": 1013})
+        return
+
+    await send({"type": "websocket.accept", "headers": cookie_headers})
+    socket = open_sockets[user_id] = ChatSocket(receive, send, user_id, open_sockets)
+    if previous is not None:
+        # One connection per session: a reload or second tab takes over
+        await previous.close(4000, "replaced")
+    await socket.run()
+
+
+async def home(scope, receive, send):
+    _, cookie_headers = session(scope)
+    await send_precompressed(scope, send, web.home_page.get(), cookie_headers)
+
+
+async def static_asset(scope, receive, send):
+    await send_precompressed(scope, send, web.assets.get(scope["path"][len(web.assets.prefix):]))
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if web.brain.async_client is not None:
+                await web.brain.async_client.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def timed(handler, route, scope, receive, send):
+    """Run a native route, recording the same request metrics and trace as the Flask hooks"""
+    started = time.perf_counter()
+    status = 500
+    trace = tracing.begin(f"{scope['method']} {scope['path']}", _header(scope, b"x-request-id"))
+
+    async def send_and_record(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            REQUEST_SECONDS.labels(route, scope["method"]).observe(time.perf_counter() - started)
+            message = dict(message, headers=[*message.get("headers", ()),
+                                             (b"x-request-id", trace.request_id.encode())])
+        await send(message)
+
+    try:
+        await handler(scope, receive, send_and_record)
+    finally:
+        tracing.finish(trace)
+        REQUESTS.labels(route, scope["method"], status).inc()
+        if status >= 500:
+            ERRORS.labels("web").inc()
+
+
+ROUTES = {
+    ("GET", "/"): home,
+    ("HEAD", "/"): home,
+    ("POST", "/chat"): chat,
+    ("POST", "/chat/stream"): chat_stream,
+    ("POST", "/chat/batch"): chat_batch,
+}
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(scope, receive, send)
+        return
+    if scope["type"] == "websocket":
+        if scope["path"] == "/ws":
+            await chat_socket(scope, receive, send)
+        else:
+            await send({"type": "websocket.close", "code": 1008})
+        return
+    route = scope.get("path")
+    handler = ROUTES.get((scope.get("method"), route))
+    if handler is None and scope.get("method") in ("GET", "HEAD") \
+            and route.startswith(web.assets.prefix) \
+            and web.assets.get(route[len(web.assets.prefix):]) is not None:
+        # Labelled like the Flask rule so both servers report the same routes
+        handler, route = static_asset, "/static/<path:name>"
+    if handler is not None:
+        await timed(handler, route, scope, receive, send)
+    else:
+        await flask_app(scope, receive, send)
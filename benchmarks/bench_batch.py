@@ -0,0 +1,85 @@
+"""
+Benchmark: scripted evaluation one /chat round trip at a time vs /chat/batch
+
+Sends the same scripted prompts (several turns for each of many users) to
+the web app either as sequential /chat calls, the way evaluation scripts
+did it, or as a single /chat/batch request whose NDJSON results are read as
+they arrive. Runs against the Ollama stub with the app in-process unless
+--url is given.
+
+Usage: python benchmarks/bench_batch.py [--users 40] [--turns 3] [--stub-latency 0.2] [--url URL]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from benchmarks.load_chat import local_app, percentile
+from config.settings import Settings
+
+Settings.OLLAMA_PRELOAD = False
+
+
+def script(users, turns):
+    return [
+        {"user_id": f"eval{u}", "message": f"Question {t} for evaluator {u}: explain something new",
+         "personality": "wise_mentor"}
+        for t in range(turns) for u in range(users)
+    ]
+
+
+def one_by_one(url, items):
+    session = requests.Session()
+    start = time.perf_counter()
+    for item in items:
+        session.post(f"{url}/chat", json=item, timeout=60).raise_for_status()
+    return time.perf_counter() - start
+
+
+def batched(url, items):
+    """Elapsed time and per-item completion times for one /chat/batch request"""
+    start = time.perf_counter()
+    done_at = []
+    with requests.post(f"{url}/chat/batch", json={"items": items}, stream=True, timeout=600) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            result = json.loads(line)
+            if "index" in result:
+                done_at.append(time.perf_counter() - start)
+    return time.perf_counter() - start, done_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="running web app; default: start stub + app in-process")
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--stub-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    items = script(args.users, args.turns)
+    if args.url:
+        app = contextlib.nullcontext((args.url, None))
+    else:
+        app = local_app({"latency": args.stub_latency})
+
+    with contextlib.redirect_stdout(open(os.devnull, "w")), app as (url, _):
+        sequential = one_by_one(url, items)
+        elapsed, done_at = batched(url, items)
+
+    print(f"{len(items)} prompts ({args.users} users x {args.turns} turns), "
+          f"stub latency {args.stub_latency}s, batch concurrency {Settings.BATCH_CONCURRENCY}")
+    print(f"  /chat one by one: {sequential:6.2f} s  {len(items) / sequential:6.1f} prompts/s")
+    print(f"  /chat/batch:      {elapsed:6.2f} s  {len(items) / elapsed:6.1f} prompts/s  "
+          f"(first result after {done_at[0] * 1e3:.0f} ms, median {percentile(sorted(done_at), 50):.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark: desktop app time-to-interactive
+
+Each run is a fresh interpreter, so import costs count. "before window"
+is the work done before Tk can draw anything: the old startup imported
+the brain (transformers, torch), opened memory, loaded and tested the
+model and read the profile first; the new one only imports the GUI.
+With a display it also measures time-to-interactive directly: from
+interpreter start until the main loop first goes idle with the window
+mapped and the entry accepting input, for ChatInterface(brain=...)
+(build everything first) and ChatInterface(brain_factory=...) (window
+first, brain on a background thread), plus when the model became ready.
+
+Usage: python benchmarks/bench_gui_startup.py [--runs 3]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRELUDE = """
+import time
+start = time.perf_counter()
+import json, logging, os, sys
+sys.path.insert(0, {root!r})
+logging.disable(logging.CRITICAL)
+db = os.path.join({tmp!r}, "conversations.db")
+"""
+
+BEFORE_WINDOW = {
+    "sync": """
+from chatbot.brain import ConvoAIBrain
+from chatbot.memory import ConversationMemory
+from gui.chat_interface import ChatInterface
+brain = ConvoAIBrain(ConversationMemory(db))
+brain.memory.get_user_profile("default_user")
+brain.memory.get_conversation_stats("default_user")
+print(json.dumps({"before_window": time.perf_counter() - start}))
+""",
+    "async": """
+from gui.chat_interface import ChatInterface
+print(json.dumps({"before_window": time.perf_counter() - start}))
+""",
+}
+
+INTERACTIVE = """
+import tkinter as tk
+from gui.chat_interface import ChatInterface
+
+def load_brain():
+    from chatbot.brain import ConvoAIBrain
+    from chatbot.memory import ConversationMemory
+    return ConvoAIBrain(ConversationMemory(db), load_model={load_model})
+
+try:
+    if {sync}:
+        app = ChatInterface(brain=load_brain())
+    else:
+        app = ChatInterface(brain_factory=load_brain)
+except tk.TclError as e:
+    print(json.dumps({{"skipped": str(e)}}))
+    raise SystemExit
+
+result = {{}}
+
+def interactive():
+    if not app.root.winfo_ismapped():
+        app.root.after(5, interactive)
+        return
+    result["tti"] = time.perf_counter() - start
+    watch()
+
+def watch():
+    if app.ready:
+        result["model_ready"] = time.perf_counter() - start
+        print(json.dumps(result))
+        app.root.destroy()
+    else:
+        app.root.after(20, watch)
+
+app.root.after_idle(interactive)
+app.root.mainloop()
+"""
+
+
+def child(code, tmp):
+    source = PRELUDE.format(root=ROOT, tmp=tmp) + code
+    out = subprocess.run([sys.executable, "-c", source], capture_output=True, text=True,
+                         cwd=tmp, timeout=900)
+    lines = [line for line in out.stdout.splitlines() if line.startswith("{")]
+    if not lines:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else "no output")
+    return json.loads(lines[-1])
+
+
+def median(runs, key):
+    return statistics.median(run[key] for run in runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    print(f"median of {args.runs} fresh processes")
+    for mode, code in BEFORE_WINDOW.items():
+        runs = [child(code, tmp) for _ in range(args.runs)]
+        print(f"{mode:>5}: {median(runs, 'before_window') * 1e3:8.0f} ms of work before the window can show")
+
+    for mode, sync in (("sync", True), ("async", False)):
+        code = INTERACTIVE.format(sync=sync, load_model=sync)
+        runs = [child(code, tmp) for _ in range(args.runs)]
+        if "skipped" in runs[0]:
+            print(f"time-to-interactive: skipped ({runs[0]['skipped']})")
+            return
+        print(f"{mode:>5}: interactive after {median(runs, 'tti') * 1e3:8.0f} ms, "
+              f"model ready after {median(runs, 'model_ready') * 1e3:8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: drawing a streamed reply in the Tk GUI
+
+A producer thread emits tokens at a fixed rate, like the local model
+streaming a reply. "per-token" schedules one root.after(0, ...) insert per
+token from the producer; "frame" queues tokens and lets a FRAME_MS tick
+drain everything pending into a single insert, as ChatInterface does. A
+10 ms heartbeat on the Tk thread measures how long the event loop is
+kept from other work (input, redraws) while the reply streams.
+
+Needs a display (use xvfb-run on a headless machine).
+
+Usage: python benchmarks/bench_gui_stream.py [--tokens 2000] [--rate 500]
+"""
+
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tkinter as tk
+from tkinter import scrolledtext
+
+from gui.chat_interface import ChatInterface
+
+
+def run(root, mode, tokens, rate):
+    text = scrolledtext.ScrolledText(root, wrap=tk.WORD)
+    text.pack()
+    chunks = queue.SimpleQueue()
+    stats = {"inserts": 0, "first": None, "lag": 0.0, "done": False}
+    started = time.perf_counter()
+
+    def insert(piece):
+        if stats["first"] is None:
+            stats["first"] = time.perf_counter() - started
+        text.insert(tk.END, piece)
+        text.see(tk.END)
+        stats["inserts"] += 1
+
+    def produce():
+        for i in range(tokens):
+            piece = f" word{i}"
+            if mode == "per-token":
+                root.after(0, insert, piece)
+            else:
+                chunks.put(piece)
+            time.sleep(1.0 / rate)
+        stats["done"] = True
+
+    def tick():
+        parts = []
+        while True:
+            try:
+                parts.append(chunks.get_nowait())
+            except queue.Empty:
+                break
+        if parts:
+            insert("".join(parts))
+        if not (stats["done"] and chunks.empty()):
+            root.after(ChatInterface.FRAME_MS, tick)
+
+    expected = [time.perf_counter() + 0.01]
+
+    def heartbeat():
+        now = time.perf_counter()
+        stats["lag"] = max(stats["lag"], now - expected[0])
+        expected[0] = now + 0.01
+        if stats["done"] and (mode == "per-token" or chunks.empty()):
+            root.after(100, root.quit)
+        else:
+            root.after(10, heartbeat)
+
+    threading.Thread(target=produce, daemon=True).start()
+    if mode == "frame":
+        root.after(ChatInterface.FRAME_MS, tick)
+    root.after(10, heartbeat)
+    root.mainloop()
+    elapsed = time.perf_counter() - started
+    text.destroy()
+    return stats, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=500.0, help="tokens per second")
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"skipped: {e}")
+        return
+
+    print(f"{args.tokens} tokens at {args.rate:.0f}/s, frame tick {ChatInterface.FRAME_MS} ms")
+    print(f"{'mode':>10} {'inserts':>8} {'first text ms':>14} {'max loop lag ms':>16} {'total s':>8}")
+    for mode in ("per-token", "frame"):
+        stats, elapsed = run(root, mode, args.tokens, args.rate)
+        print(f"{mode:>10} {stats['inserts']:>8} {stats['first'] * 1e3:14.1f} "
+              f"{stats['lag'] * 1e3:16.1f} {elapsed:8.2f}")
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
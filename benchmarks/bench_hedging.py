@@ -0,0 +1,116 @@
+"""
+Benchmark: tail latency of a single backend vs hedged routing across two
+
+Two Ollama stubs with independent heavy-tailed (lognormal) latency stand in
+for a primary and a secondary backend. The same requests go once to the
+primary brain alone and once through BackendRouter, which hedges to the
+secondary after the primary's observed p95. Reports p50/p95/p99 and how
+many upstream generations each approach cost.
+
+Usage: python benchmarks/bench_hedging.py [--requests 400] [--concurrency 8] [--latency 0.1] [--sigma 1.0]
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from benchmarks.load_chat import percentile
+from benchmarks.ollama_stub import start_stub_server
+from config.settings import Settings
+
+Settings.OLLAMA_PRELOAD = False
+Settings.OLLAMA_ASYNC = False
+
+from chatbot.backend_router import BackendRouter, CannedBackend
+from chatbot.personality_brain import ConvoAIBrain
+
+
+class NullMemory:
+    def add_message(self, *args, **kwargs):
+        pass
+
+
+def make_brain(url):
+    Settings.OLLAMA_URL = url
+    return ConvoAIBrain(NullMemory())
+
+
+def upstream_requests(url):
+    return requests.get(f"{url}/stub/stats", timeout=5).json().get("requests", 0)
+
+
+def measure(generate, count, concurrency):
+    """Latencies of count calls to generate(i) over a thread pool"""
+    def one(i):
+        start = time.perf_counter()
+        generate(i)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return sorted(pool.map(one, range(count)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.1, help="mean stub latency (s)")
+    parser.add_argument("--sigma", type=float, default=1.0, help="lognormal shape; larger = heavier tail")
+    parser.add_argument("--budget", type=float, default=0.1, help="max hedged fraction")
+    args = parser.parse_args()
+
+    stub = dict(latency=args.latency, latency_dist="lognormal", latency_sigma=args.sigma)
+    primary_server, primary_url = start_stub_server(seed=1, **stub)
+    secondary_server, secondary_url = start_stub_server(seed=2, **stub)
+
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        primary = make_brain(primary_url)
+        secondary = make_brain(secondary_url)
+    router = BackendRouter(
+        NullMemory(), [("primary", primary), ("secondary", secondary)],
+        CannedBackend(primary.intent_router, primary.get_fallback),
+        hedge_budget=args.budget, initial_hedge_delay=1.0, workers=args.concurrency * 2
+    )
+
+    # Distinct users and messages so no reply is canned, coalesced or context-cached alike
+    def message(i):
+        return f"Tell me fact number {i} about the ocean", f"user{i}", "wise_mentor"
+
+    def report(label, latencies, upstream):
+        print(f"{label:>10}: " + "  ".join(
+            f"p{p} {percentile(latencies, p) * 1e3:6.0f} ms" for p in (50, 95, 99)
+        ) + f"  | upstream {upstream / args.requests:.2f}x requests")
+
+    # Warm the router's latency histogram so hedging uses the observed p95
+    measure(lambda i: router.route(*message(-i - 1)), 100, args.concurrency)
+
+    before = upstream_requests(primary_url)
+    # Same streaming code path the router uses, just never cancelled
+    single = measure(lambda i: primary.compose_reply(*message(i), threading.Event()),
+                     args.requests, args.concurrency)
+    report("primary", single, upstream_requests(primary_url) - before)
+
+    before = upstream_requests(primary_url) + upstream_requests(secondary_url)
+    hedged = measure(lambda i: router.route(*message(i)), args.requests, args.concurrency)
+    report("hedged", hedged, upstream_requests(primary_url) + upstream_requests(secondary_url) - before)
+
+    stats = router.stats()
+    print(f"hedges fired: {stats['hedged']}, won: {stats['hedge_wins']}, denied by budget: "
+          f"{stats['hedges_denied']}; primary hedge threshold "
+          f"{stats['backends']['primary']['hedge_after_ms']} ms")
+
+    router.shutdown()
+    primary_server.shutdown()
+    secondary_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: cost of serving the home page rendered per request vs prerendered
+
+Compares rendering the page on every request (the old behaviour) with the
+cached, precompressed page: server time per request through the Flask test
+client, and bytes on the wire for a first visit, a gzip visit and a
+revalidation (If-None-Match -> 304).
+
+Usage: python benchmarks/bench_home_page.py [--requests 2000]
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import Settings
+
+Settings.OLLAMA_PRELOAD = False
+
+with contextlib.redirect_stdout(open(os.devnull, "w")):
+    import web_app_with_personalities as web
+
+
+def per_request(client, count, headers=None):
+    """Mean seconds per GET / and the size of the last response body"""
+    start = time.perf_counter()
+    for _ in range(count):
+        response = client.get("/", headers=headers or {})
+    return (time.perf_counter() - start) / count, len(response.data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    client = web.app.test_client()
+    page = web.home_page.get()
+    gzip_headers = {"Accept-Encoding": "gzip, deflate, br"}
+    revalidate = {"Accept-Encoding": "gzip, deflate, br", "If-None-Match": page.etag("gzip")}
+
+    # Old behaviour: every request re-renders (the version never matches)
+    cached_version = web.home_page.version
+    counter = iter(range(10 ** 9))
+    web.home_page.version = lambda: next(counter)
+    rendered, rendered_bytes = per_request(client, args.requests)
+    web.home_page.version = cached_version
+
+    cached, cached_bytes = per_request(client, args.requests)
+    gzipped, gzip_bytes = per_request(client, args.requests, gzip_headers)
+    not_modified, _ = per_request(client, args.requests, revalidate)
+
+    print(f"{'mode':>22} {'us/request':>11} {'body bytes':>11}")
+    print(f"{'render per request':>22} {rendered * 1e6:11.0f} {rendered_bytes:11d}")
+    print(f"{'prerendered':>22} {cached * 1e6:11.0f} {cached_bytes:11d}")
+    print(f"{'prerendered, gzip':>22} {gzipped * 1e6:11.0f} {gzip_bytes:11d}")
+    print(f"{'revalidated (304)':>22} {not_modified * 1e6:11.0f} {0:11d}")
+    sizes = []
+    for name in sorted(web.assets.urls):
+        bodies = web.assets.get(name).bodies
+        sizes.append(f"{name} {len(bodies['identity'])} B ({len(bodies.get('gzip', bodies['identity']))} B gzip)")
+    sizes = ", ".join(sizes)
+    print(f"static assets (cached for a year after first load): {sizes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark: per-turn cost of status output with stdout redirected to a pipe
+
+"print" replays the lines a local-model turn used to print (status, prompt
+size, generated text and one line per stored message) on the request
+thread. "logging" makes the same calls through chatbot.log: at INFO the
+per-turn lines are DEBUG and cost a level check; at DEBUG they are queued
+and written by the listener thread. The pipe's reader is either fast or
+slow (a busy log shipper or terminal), which is when blocking writes hurt.
+Wall time is what the turn loop took; thread CPU is the request thread's
+own work, which is what remains on the request path when the listener
+has a core of its own.
+
+Usage: python benchmarks/bench_logging.py [--turns 20000] [--slow-read-ms 1]
+"""
+
+import argparse
+import contextlib
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.log import configure_logging, stop_logging
+
+REPLY = "That sounds like a great idea! Tell me more about what you have in mind for the weekend."
+logger = logging.getLogger("chatbot.brain")
+memory_logger = logging.getLogger("chatbot.web_memory_fixed")
+
+
+def print_turn(i):
+    print(f"💾 Added user message for web_{i}")
+    print("\n🤖 AI Status: Loaded successfully")
+    print("🤖 Model Ready: True")
+    print("🧠 Using AI model for response generation...")
+    print(f"🧠 AI Prompt: {i % 300} tokens")
+    print(f"🧠 AI Generated: {REPLY}")
+    print(f"💾 Added assistant message for web_{i}")
+
+
+def logging_turn(i):
+    memory_logger.debug("Added %s message for %s", "user", f"web_{i}")
+    logger.debug("Turn for %s (model: %s)", f"web_{i}", "Loaded successfully")
+    logger.debug("Prompt: %d tokens", i % 300)
+    logger.debug("Generated: %s", REPLY)
+    memory_logger.debug("Added %s message for %s", "assistant", f"web_{i}")
+
+
+class Pipe:
+    """Point fd 1 at a pipe drained by a reader thread that sleeps between reads"""
+
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+        self.saved_stdout = os.dup(1)
+        self.slow = 0.0
+        self.bytes = 0
+        self.reader = threading.Thread(target=self._drain, daemon=True)
+        self.reader.start()
+
+    def _drain(self):
+        while True:
+            chunk = os.read(self.read_fd, 4096)
+            if not chunk:
+                return
+            self.bytes += len(chunk)
+            if self.slow:
+                time.sleep(self.slow)
+
+    @contextlib.contextmanager
+    def stdout(self, line_buffering):
+        sys.stdout.flush()
+        os.dup2(self.write_fd, 1)
+        sys.stdout = open(1, "w", buffering=1 if line_buffering else -1, closefd=False)
+        try:
+            yield sys.stdout
+        finally:
+            sys.stdout.flush()
+            sys.stdout = sys.__stdout__
+            os.dup2(self.saved_stdout, 1)
+
+
+def run(pipe, turns, turn, line_buffering, level=None):
+    with pipe.stdout(line_buffering) as stream:
+        if level:
+            configure_logging(level, stream=stream)
+        start = time.perf_counter()
+        cpu = time.thread_time()
+        for i in range(turns):
+            turn(i)
+        cpu = time.thread_time() - cpu
+        elapsed = time.perf_counter() - start
+        drain = time.perf_counter()
+        if level:
+            stop_logging()  # the listener writes out what's queued
+        stream.flush()
+        drain = time.perf_counter() - drain
+    return elapsed / turns * 1e6, cpu / turns * 1e6, drain
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=20000)
+    parser.add_argument("--slow-read-ms", type=float, default=1.0,
+                        help="reader pause per 4 KB read in the slow-reader runs")
+    args = parser.parse_args()
+
+    pipe = Pipe()
+    scenarios = [
+        ("print, block-buffered", print_turn, False, None),
+        ("print, line-buffered", print_turn, True, None),
+        ("logging INFO", logging_turn, True, "INFO"),
+        ("logging DEBUG (queued)", logging_turn, True, "DEBUG"),
+    ]
+    results = []
+    for reader, slow in (("fast", 0.0), ("slow", args.slow_read_ms / 1e3)):
+        pipe.slow = slow
+        for name, turn, line_buffering, level in scenarios:
+            results.append((reader, name, *run(pipe, args.turns, turn, line_buffering, level)))
+
+    print(f"{args.turns} turns per run, stdout -> pipe "
+          f"(slow reader pauses {args.slow_read_ms} ms per 4 KB)")
+    print(f"{'reader':>6} {'output':>24} {'wall us/turn':>13} {'thread CPU us':>14} {'drain s':>8}")
+    for reader, name, per_turn, cpu, drain in results:
+        print(f"{reader:>6} {name:>24} {per_turn:13.1f} {cpu:14.1f} {drain:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
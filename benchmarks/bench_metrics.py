@@ -0,0 +1,86 @@
+"""
+Benchmark: cost of the metrics instrumentation on the hot path
+
+Times counter increments, histogram observations and stage() timers from
+one thread and from several threads hammering the same child (the worst
+case for its lock), plus rendering /metrics with a realistic number of
+series. Compare against the per-turn numbers from the other benchmarks:
+a chat turn records a few dozen observations.
+
+Usage: python benchmarks/bench_metrics.py [--ops 200000] [--threads 4]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.metrics import Registry
+
+
+def per_op_ns(fn, ops, threads):
+    """Wall time per operation (ns) with `threads` threads splitting `ops` calls"""
+    share = ops // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def work():
+        barrier.wait()
+        for _ in range(share):
+            fn()
+
+    pool = [threading.Thread(target=work) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    return (time.perf_counter() - start) / (share * threads) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    registry = Registry()
+    counter = registry.counter("bench_total", "benchmark counter", ["kind"])
+    histogram = registry.histogram("bench_seconds", "benchmark histogram", ["stage"])
+    child_counter = counter.labels("hit")
+    child_histogram = histogram.labels("memory_read")
+
+    operations = {
+        "counter.labels(...).inc()": lambda: counter.labels("hit").inc(),
+        "cached child .inc()": child_counter.inc,
+        "histogram .observe()": lambda: child_histogram.observe(0.003),
+        "with stage timer": lambda: child_histogram.time().__enter__().__exit__(None, None, None),
+    }
+
+    print(f"{args.ops} operations per run")
+    print(f"{'operation':>28} {'1 thread ns':>12} {f'{args.threads} threads ns':>13}")
+    for name, fn in operations.items():
+        single = per_op_ns(fn, args.ops, 1)
+        multi = per_op_ns(fn, args.ops, args.threads)
+        print(f"{name:>28} {single:12.0f} {multi:13.0f}")
+
+    # Roughly what a busy server exports: stages, routes x methods x statuses, caches
+    for stage in ("memory_read", "memory_write", "prompt_build", "tokenize",
+                  "inference", "ollama_http", "fallback"):
+        histogram.labels(stage).observe(0.01)
+    for route in range(20):
+        counter.labels(f"route{route}")
+    runs = 200
+    start = time.perf_counter()
+    for _ in range(runs):
+        text = registry.render()
+    elapsed = (time.perf_counter() - start) / runs
+    samples = sum(1 for line in text.splitlines() if not line.startswith("#"))
+    print(f"render: {elapsed * 1e3:.3f} ms for {len(text)} bytes ({samples} samples)")
+
+
+if __name__ == "__main__":
+    main()
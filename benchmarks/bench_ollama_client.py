@@ -0,0 +1,74 @@
+"""
+Benchmark: per-request overhead of requests.post vs the pooled OllamaClient
+
+Drives a local Ollama stub (no model work) so the numbers are pure HTTP
+overhead: connection setup, request encoding and response parsing. Runs a
+sequential pass and a concurrent pass with a thread pool.
+
+Usage: python benchmarks/bench_ollama_client.py [--requests 2000] [--threads 8]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from benchmarks.ollama_stub import start_stub_server
+from chatbot.ollama_client import OllamaClient
+
+OPTIONS = {"temperature": 0.8, "num_predict": 60}
+
+
+def run(call, count, threads):
+    """Issue count calls, sequentially or over a thread pool; returns seconds"""
+    start = time.perf_counter()
+    if threads <= 1:
+        for _ in range(count):
+            call()
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for future in [pool.submit(call) for _ in range(count)]:
+                future.result()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    server, url = start_stub_server()
+    client = OllamaClient(url, pool_size=args.threads)
+
+    def plain_post():
+        response = requests.post(
+            f"{url}/api/generate",
+            json={"model": "tinyllama", "prompt": "Hello", "stream": False, "options": OPTIONS},
+            timeout=10
+        )
+        response.json()
+
+    def pooled_post():
+        client.generate("Hello", options=OPTIONS)
+
+    print(f"{args.requests} requests against {url}")
+    for threads in (1, args.threads):
+        label = "sequential" if threads == 1 else f"{threads} threads"
+        plain = run(plain_post, args.requests, threads)
+        pooled = run(pooled_post, args.requests, threads)
+        print(f"{label:>11}: requests.post {plain / args.requests * 1e3:6.3f} ms/req | "
+              f"OllamaClient {pooled / args.requests * 1e3:6.3f} ms/req | "
+              f"{plain / pooled:.2f}x")
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
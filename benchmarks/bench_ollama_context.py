@@ -0,0 +1,102 @@
+"""
+Benchmark: cold vs warm chat turns with context reuse, keep_alive and preload
+
+Drives the web brain against the local Ollama stub with a simulated model
+load time and per-token prefill cost:
+
+  cold          first turn, model not loaded
+  preloaded     first turn after the startup preload request
+  fresh prompt  later turns resending the full personality prompt (old behaviour)
+  context       later turns sending only the new message plus Ollama's context
+  idle expiry   a turn after an idle gap longer than the server's default
+                keep_alive, without and with the brain's keep_alive
+
+Usage: python benchmarks/bench_ollama_context.py [--load-time 1.0] [--prefill-ms 5] [--turns 10]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.ollama_stub import start_stub_server
+from config.settings import Settings
+
+Settings.OLLAMA_PRELOAD = False  # the benchmark preloads explicitly
+Settings.OLLAMA_ASYNC = False
+
+from chatbot.personality_brain import ConvoAIBrain
+
+PERSONALITY = "wise"
+MESSAGES = ["What makes a good life?", "Why do you think so?", "How should I start?"]
+
+
+class NullMemory:
+    def add_message(self, *args, **kwargs):
+        pass
+
+
+def make_brain(url, keep_alive):
+    Settings.OLLAMA_URL = url
+    Settings.OLLAMA_KEEP_ALIVE = keep_alive
+    return ConvoAIBrain(NullMemory())
+
+
+def timed_turn(brain, user_id, message):
+    start = time.perf_counter()
+    brain.generate_response(message, user_id, PERSONALITY)
+    return (time.perf_counter() - start) * 1e3
+
+
+def average_turns(brain, user_id, turns, keep_context):
+    """Mean latency of follow-up turns after a first (uncounted) turn"""
+    timed_turn(brain, user_id, MESSAGES[0])
+    total = 0.0
+    for i in range(turns):
+        if not keep_context:
+            brain.forget_user(user_id)
+        total += timed_turn(brain, user_id, MESSAGES[1 + i % 2])
+    return total / turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--load-time", type=float, default=1.0, help="simulated model load seconds")
+    parser.add_argument("--prefill-ms", type=float, default=5.0, help="simulated prefill per prompt word")
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--idle", type=float, default=1.5, help="idle gap; server default keep_alive is half of it")
+    args = parser.parse_args()
+
+    stub = dict(load_time=args.load_time, prefill_per_token=args.prefill_ms / 1e3,
+                default_keep_alive=args.idle / 2)
+
+    server, url = start_stub_server(**stub)
+    brain = make_brain(url, keep_alive="30m")
+    print(f"{'cold first turn':>24}: {timed_turn(brain, 'cold', MESSAGES[0]):8.1f} ms")
+    server.shutdown()
+
+    server, url = start_stub_server(**stub)
+    brain = make_brain(url, keep_alive="30m")
+    brain.preload()
+    print(f"{'preloaded first turn':>24}: {timed_turn(brain, 'preloaded', MESSAGES[0]):8.1f} ms")
+
+    fresh = average_turns(brain, "fresh", args.turns, keep_context=False)
+    reused = average_turns(brain, "context", args.turns, keep_context=True)
+    print(f"{'warm, fresh prompt':>24}: {fresh:8.1f} ms/turn")
+    print(f"{'warm, context reuse':>24}: {reused:8.1f} ms/turn ({fresh / reused:.2f}x)")
+    server.shutdown()
+
+    for label, keep_alive in (("idle, server default", None), ("idle, keep_alive=30m", "30m")):
+        server, url = start_stub_server(**stub)
+        brain = make_brain(url, keep_alive=keep_alive)
+        timed_turn(brain, "idle", MESSAGES[0])
+        time.sleep(args.idle)
+        print(f"{label:>24}: {timed_turn(brain, 'idle', MESSAGES[1]):8.1f} ms "
+              f"(model loads: {server.RequestHandlerClass.model_state.loads})")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: torch generate vs the ONNX Runtime decode loop for the local model
+
+Runs the same prompts through both backends with the sampling parameters
+ConvoAIBrain uses, forcing a fixed number of new tokens so both paths do
+the same amount of work, and reports per-reply latency and tokens/second.
+
+Usage: python benchmarks/bench_onnx_backend.py [--runs 10] [--tokens 50]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+
+from chatbot.brain import ConvoAIBrain
+from chatbot.onnx_backend import OnnxGenerator
+from config.settings import Settings
+
+PROMPTS = [
+    "This is a conversation between a human and an AI assistant.\n"
+    "The AI is Helpful, professional, and warm and responds naturally.\n\n"
+    "Human: Hello, how are you?\nAI:",
+    "This is a conversation between Sam and an AI assistant.\n"
+    "The AI is Thoughtful, gives advice, philosophical and responds naturally.\n\n"
+    "Human: I love hiking in the mountains.\nAI: That sounds wonderful.\n"
+    "Human: What should I pack for a long trail?\nAI:",
+]
+
+
+def time_backend(generate, prompts, runs):
+    """Return per-reply latencies (seconds) for a generate(prompt_ids) callable"""
+    generate(prompts[0])  # warm-up
+    latencies = []
+    for _ in range(runs):
+        for ids in prompts:
+            start = time.perf_counter()
+            generate(ids)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(name, latencies, tokens):
+    total = sum(latencies)
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{name:>6}: mean {statistics.mean(latencies) * 1000:8.1f} ms | "
+          f"p95 {p95 * 1000:8.1f} ms | {tokens * len(latencies) / total:7.1f} tok/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default="distilgpt2")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=Settings.ONNX_THREADS)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model, use_fast=True)
+    model = AutoModelForCausalLM.from_pretrained(args.model, torch_dtype=torch.float32)
+    model.eval()
+
+    prompts = [tokenizer.encode(p) for p in PROMPTS]
+    kwargs = dict(ConvoAIBrain.GENERATION_KWARGS)
+    kwargs.update(max_new_tokens=args.tokens, min_new_tokens=args.tokens)
+
+    def torch_generate(ids):
+        input_ids = torch.tensor([ids], dtype=torch.long)
+        with torch.no_grad():
+            model.generate(
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                pad_token_id=tokenizer.eos_token_id,
+                eos_token_id=tokenizer.eos_token_id,
+                **kwargs
+            )
+
+    onnx = OnnxGenerator(model, args.model, cache_dir=Settings.ONNX_CACHE_DIR, threads=args.threads)
+
+    def onnx_generate(ids):
+        onnx.generate(ids, eos_token_id=tokenizer.eos_token_id, **kwargs)
+
+    print(f"{args.model}: {len(prompts)} prompts x {args.runs} runs, {args.tokens} new tokens each")
+    report("torch", time_backend(torch_generate, prompts, args.runs), args.tokens)
+    report("onnx", time_backend(onnx_generate, prompts, args.runs), args.tokens)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: loading personalities per component vs one shared, hot-reloaded copy
+
+"construct" is what each brain and page used to pay: a PersonalityManager
+of its own, parsing personalities.json again. "shared" is
+PersonalityManager.shared() after the first call. Reads time the
+personalities property, which checks the file for edits at most once per
+check interval (rate-limited) or with a stat on every read (interval 0).
+Finally it times how long an edit to the file takes to show up.
+
+Usage: python benchmarks/bench_personalities.py [--reads 200000] [--personalities 50]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.personality import PersonalityManager
+
+
+def per_call_us(fn, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reads", type=int, default=200000)
+    parser.add_argument("--personalities", type=int, default=50)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "personalities.json")
+    defaults = PersonalityManager(path).personalities
+    template = defaults["friendly_assistant"]
+    with open(path, "w") as f:
+        json.dump({**defaults, **{f"custom_{i}": template for i in range(args.personalities)}}, f)
+    print(f"{os.path.getsize(path) / 1024:.0f} KiB personalities file")
+
+    construct = per_call_us(lambda: PersonalityManager(path), 200)
+    PersonalityManager.shared(path)
+    shared = per_call_us(lambda: PersonalityManager.shared(path), args.reads)
+    print(f"construct: {construct:10.2f} us per manager")
+    print(f"   shared: {shared:10.2f} us per manager")
+
+    for interval in (1.0, 0.0):
+        manager = PersonalityManager(path, check_interval=interval)
+        read = per_call_us(lambda: manager.personalities, args.reads)
+        print(f"read, check every {interval:.0f} s: {read:6.2f} us")
+
+    manager = PersonalityManager(path, check_interval=0.0)
+    changed = []
+    manager.add_listener(changed.append)
+    data = dict(manager.personalities)
+    data["custom_0"] = {**template, "description": "edited"}
+    start = time.perf_counter()
+    with open(path, "w") as f:
+        json.dump(data, f)
+    manager.personalities
+    print(f"edit picked up on the next read: {(time.perf_counter() - start) * 1e3:.2f} ms, "
+          f"version {manager.version}, changed {sorted(changed[0]) if changed else []}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark: per-turn profile extraction, legacy substring scans vs ProfileExtractor
+
+The legacy path is a faithful copy of the old ConvoAIBrain._update_user_profile
+and ConversationMemory._extract_interests matching logic. The first section
+times matching alone and counts messages tagged with an interest, so
+substring false positives ("ai" in "said") show up. The second section times
+the whole per-turn profile update against a scratch SQLite memory, where the
+legacy path re-reads and rewrites the profile on every trigger phrase.
+
+Usage: python benchmarks/bench_profile_extractor.py [--messages 20000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.brain import ConvoAIBrain
+from chatbot.memory import ConversationMemory
+from chatbot.profile_extractor import (
+    ProfileExtractor, NAME_PATTERNS, INTEREST_TRIGGERS, INTEREST_KEYWORDS
+)
+
+TEMPLATES = [
+    "Hello, how are you today?",
+    "My name is {name} and I love {topic}",
+    "I'm {name}, nice to meet you",
+    "I said that again yesterday, didn't I?",
+    "Can you explain how {topic} works in more detail please?",
+    "I enjoy {topic} on weekends with my friends",
+    "What do you think about the weather this week?",
+    "Call me {name}. I am interested in {topic}",
+    "Thanks, that was really helpful!",
+    "My hobby is {topic} but I rarely have time for it these days",
+]
+NAMES = ["Sam", "Alex", "Priya", "Jordan", "Mei", "Omar"]
+TOPICS = ["machine learning", "football", "baking", "video games", "novels",
+          "travel", "piano", "netflix", "painting", "gardening"]
+
+
+def legacy_extract(user_input):
+    """Old per-turn logic: lowercases per pattern and scans with substring checks"""
+    name = None
+    for pattern in ["my name is", "i'm", "call me", "i am"]:
+        if pattern in user_input.lower():
+            words = user_input.lower().split(pattern)[-1].strip().split()
+            if words:
+                candidate = words[0].title()
+                if len(candidate) > 1 and candidate.isalpha():
+                    name = candidate
+                    break
+
+    interests = []
+    for pattern in ["i love", "i like", "i enjoy", "interested in", "my hobby"]:
+        if pattern in user_input.lower():
+            interests = legacy_interests(user_input)
+            break
+    return name, interests
+
+
+def legacy_interests(text):
+    """Old ConversationMemory._extract_interests substring scan"""
+    interests = []
+    text_lower = text.lower()
+    for category, keywords in INTEREST_KEYWORDS.items():
+        if any(keyword in text_lower for keyword in keywords):
+            interests.append(category)
+    return interests
+
+
+def legacy_update_profile(memory, user_id, user_input):
+    """Old per-turn profile update, including its unconditional DB writes"""
+    name, _ = legacy_extract(user_input)
+    if name:
+        memory.update_user_name(user_id, name)
+
+    for pattern in ["i love", "i like", "i enjoy", "interested in", "my hobby"]:
+        if pattern in user_input.lower():
+            profile = memory.get_user_profile(user_id)
+            current = profile.get('interests', [])
+            for interest in legacy_interests(user_input):
+                if interest not in current:
+                    current.append(interest)
+            with sqlite3.connect(memory.db_path) as conn:
+                conn.execute(
+                    "UPDATE user_profiles SET interests = ?, last_seen = CURRENT_TIMESTAMP WHERE user_id = ?",
+                    (json.dumps(current), user_id)
+                )
+            break
+
+
+def time_profile_updates(corpus, update):
+    """Time update(memory, message) over a corpus with a scratch database"""
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = ConversationMemory(os.path.join(tmp, "bench.db"))
+        start = time.perf_counter()
+        for message in corpus:
+            update(memory, message)
+        return time.perf_counter() - start
+
+
+def build_corpus(size, seed=7):
+    rng = random.Random(seed)
+    return [
+        rng.choice(TEMPLATES).format(name=rng.choice(NAMES), topic=rng.choice(TOPICS))
+        for _ in range(size)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--db-messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.messages)
+    extractor = ProfileExtractor(NAME_PATTERNS, INTEREST_TRIGGERS, INTEREST_KEYWORDS)
+
+    start = time.perf_counter()
+    legacy = [legacy_extract(message) for message in corpus]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled = []
+    for message in corpus:
+        hits = extractor.extract(message)
+        compiled.append((hits.name, hits.interests if hits.has_interest_trigger else []))
+    compiled_time = time.perf_counter() - start
+
+    per_msg = lambda seconds: seconds / len(corpus) * 1e6
+    print(f"{len(corpus)} messages")
+    print(f"legacy  : {per_msg(legacy_time):6.2f} us/msg, "
+          f"{sum(1 for _, i in legacy if i)} tagged with interests")
+    print(f"compiled: {per_msg(compiled_time):6.2f} us/msg, "
+          f"{sum(1 for _, i in compiled if i)} tagged with interests")
+    print(f"speedup : {legacy_time / compiled_time:.2f}x")
+
+    false_hits = sum(1 for (_, old), (_, new) in zip(legacy, compiled) if set(old) - set(new))
+    print(f"messages where legacy reported extra categories: {false_hits}")
+
+    # Whole per-turn profile update including SQLite reads/writes
+    db_corpus = corpus[:args.db_messages]
+    brain = ConvoAIBrain.__new__(ConvoAIBrain)
+
+    def compiled_update(memory, message):
+        brain.memory = memory
+        brain._update_user_profile("bench", message, memory.get_user_profile("bench"))
+
+    def legacy_update(memory, message):
+        memory.get_user_profile("bench")  # generate_response reads the profile every turn
+        legacy_update_profile(memory, "bench", message)
+
+    legacy_db = time_profile_updates(db_corpus, legacy_update)
+    compiled_db = time_profile_updates(db_corpus, compiled_update)
+    print(f"\nper-turn profile update with SQLite ({len(db_corpus)} messages)")
+    print(f"legacy  : {legacy_db / len(db_corpus) * 1e3:6.3f} ms/turn")
+    print(f"compiled: {compiled_db / len(db_corpus) * 1e3:6.3f} ms/turn")
+    print(f"speedup : {legacy_db / compiled_db:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: overhead of trace spans and of the stack sampler
+
+Times a span with and without an active request trace, and runs a
+CPU-bound workload (prompt-sized string work, like the request path) with
+and without the stack sampler running, to show what profiling costs the
+process being profiled.
+
+Usage: python benchmarks/bench_tracing.py [--ops 200000] [--seconds 3]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot import tracing
+
+
+def span_ns(ops, active):
+    trace = tracing.begin("bench") if active else None
+    start = time.perf_counter()
+    for _ in range(ops):
+        with tracing.span("memory_read"):
+            pass
+    elapsed = time.perf_counter() - start
+    if trace is not None:
+        trace.spans.clear()
+        tracing.finish(trace)
+    return elapsed / ops * 1e9
+
+
+def workload(seconds):
+    """Iterations of prompt-sized string building completed in `seconds`"""
+    done = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        "\n".join(f"Human: message {i} about something" for i in range(50)).split()
+        done += 1
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    tracing.Settings.TRACE_SLOW_MS = 0
+    print(f"span, no active trace: {span_ns(args.ops, False):6.0f} ns")
+    print(f"span, inside a trace:  {span_ns(args.ops, True):6.0f} ns")
+
+    baseline = workload(args.seconds)
+    path = os.path.join(tempfile.mkdtemp(), "bench.collapsed")
+    sampler = tracing.StackSampler(tracing.Settings.PROFILE_INTERVAL)
+    sampler.start(args.seconds, path)
+    profiled = workload(args.seconds)
+    while sampler.running:
+        time.sleep(0.05)
+    print(f"workload: {baseline / args.seconds:8.0f} it/s unprofiled, "
+          f"{profiled / args.seconds:8.0f} it/s while sampling every "
+          f"{sampler.interval * 1e3:.0f} ms ({(profiled / baseline - 1) * 100:+.1f}%)")
+    print(f"profile: {sampler.last['samples']} samples, {sampler.last['stacks']} distinct stacks -> {path}")
+
+
+if __name__ == "__main__":
+    main()
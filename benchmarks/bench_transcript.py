@@ -0,0 +1,130 @@
+"""
+Benchmark: cost of paging GUI scrollback, and of adding messages to the display
+
+Fills a temporary SQLite memory with one user's long history and times
+fetching a page of it at increasing depths, with the keyset query the
+transcript uses (get_messages_before) against LIMIT/OFFSET, which has to
+step over every newer row first. With a display available it also times
+adding messages to a Tk text widget, unbounded (the old display) and
+through the bounded Transcript window.
+
+Usage: python benchmarks/bench_transcript.py [--messages 100000] [--page 50] [--gui 5000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.memory import ConversationMemory
+
+USER = "bench_user"
+
+
+def fill(memory, count):
+    with memory._connect() as conn:
+        conn.executemany(
+            "INSERT INTO conversations (user_id, role, message) VALUES (?, ?, ?)",
+            ((USER, "user" if i % 2 == 0 else "assistant", f"message {i} " * 8) for i in range(count)),
+        )
+        # Another user's rows interleaved, as in a shared database
+        conn.executemany(
+            "INSERT INTO conversations (user_id, role, message) VALUES (?, ?, ?)",
+            (("other", "user", "noise") for _ in range(count)),
+        )
+
+
+def offset_page(memory, offset, limit):
+    with memory._connect() as conn:
+        return conn.execute(
+            "SELECT id, role, message, timestamp FROM conversations WHERE user_id = ? "
+            "ORDER BY id DESC LIMIT ? OFFSET ?", (USER, limit, offset)
+        ).fetchall()
+
+
+def per_call_ms(fn, runs=20):
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1e3
+
+
+def bench_paging(messages, page):
+    memory = ConversationMemory(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    fill(memory, messages)
+    newest = memory.get_messages_before(USER, None, 1)[0]["id"]
+    with memory._connect() as conn:
+        ids = [row[0] for row in conn.execute(
+            "SELECT id FROM conversations WHERE user_id = ? ORDER BY id DESC", (USER,))]
+
+    print(f"{messages} stored messages, {page} per page")
+    print(f"{'depth':>8} {'keyset ms':>10} {'offset ms':>10}")
+    for depth in (0, 1000, 10000, messages // 2, messages - page):
+        if depth > messages - page:
+            continue
+        cursor = ids[depth - 1] if depth else newest + 1
+        keyset = per_call_ms(lambda: memory.get_messages_before(USER, cursor, page))
+        offset = per_call_ms(lambda: offset_page(memory, depth, page))
+        print(f"{depth:>8} {keyset:10.3f} {offset:10.3f}")
+
+
+def bench_gui(count):
+    import tkinter as tk
+    from tkinter import scrolledtext
+    from gui.transcript import Transcript
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"GUI: skipped ({e})")
+        return
+    root.withdraw()
+
+    def unbounded(text, i):
+        text.config(state=tk.NORMAL)
+        text.insert(tk.END, f"\nYou [12:00]\n", "timestamp")
+        text.insert(tk.END, f"message {i} " * 8 + "\n\n", "user")
+        text.see(tk.END)
+        text.config(state=tk.DISABLED)
+
+    memory = ConversationMemory(os.path.join(tempfile.mkdtemp(), "gui.db"))
+    for name in ("unbounded", "transcript"):
+        text = scrolledtext.ScrolledText(root)
+        text.pack()
+        transcript = Transcript(text, memory, USER) if name == "transcript" else None
+        marks = []
+        start = time.perf_counter()
+        for i in range(count):
+            if transcript is None:
+                unbounded(text, i)
+            else:
+                transcript.append("You", f"message {i} " * 8, "user")
+            root.update()
+            if i % (count // 10) == count // 10 - 1:
+                marks.append(time.perf_counter())
+        total = time.perf_counter() - start
+        last_tenth = (marks[-1] - marks[-2]) / (count // 10) * 1e3
+        print(f"GUI {name:>10}: {total / count * 1e3:.2f} ms/message overall, "
+              f"{last_tenth:.2f} ms/message for the last {count // 10}, "
+              f"{int(text.index('end-1c').split('.')[0])} lines kept")
+        text.destroy()
+    root.destroy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--gui", type=int, default=5000, help="messages to add to the display (0 to skip)")
+    args = parser.parse_args()
+
+    bench_paging(args.messages, args.page)
+    if args.gui:
+        bench_gui(args.gui)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark: per-message cost of the chat transports on the ASGI server
+
+Sends the same sequence of messages one after another over each transport:
+a fresh connection per /chat POST, /chat on a keep-alive session,
+/chat/stream on a keep-alive session, and one persistent /ws WebSocket.
+Canned messages ("hi") take no model time, so they show the transport's
+own overhead; model messages go to the Ollama stub.
+
+Usage: python benchmarks/bench_transport.py [--messages 200] [--stub-latency 0.05]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from websockets.sync.client import connect
+
+from benchmarks.compare_serving import serve
+from benchmarks.load_chat import percentile
+from benchmarks.ollama_stub import start_stub_server
+
+
+def timed(send_one, messages):
+    latencies = []
+    for message in messages:
+        start = time.perf_counter()
+        send_one(message)
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+def fresh_connection(url):
+    def send_one(message):
+        requests.post(f"{url}/chat", json={"message": message, "personality": "wise_mentor"},
+                      headers={"Connection": "close"}, timeout=30).raise_for_status()
+    return send_one
+
+
+def keep_alive(url, endpoint):
+    session = requests.Session()
+
+    def send_one(message):
+        response = session.post(f"{url}{endpoint}", json={"message": message, "personality": "wise_mentor"},
+                                timeout=30)
+        response.raise_for_status()
+        response.content
+    return send_one
+
+
+def websocket(url, sockets):
+    ws = connect(url.replace("http://", "ws://") + "/ws")
+    sockets.append(ws)
+    ws.send(json.dumps({"t": "p", "p": "wise_mentor"}))
+    ids = iter(range(1, 10 ** 9))
+
+    def send_one(message):
+        turn_id = next(ids)
+        ws.send(json.dumps({"t": "msg", "id": turn_id, "m": message}))
+        while True:
+            frame = json.loads(ws.recv())
+            if frame.get("id") == turn_id and frame["t"] in ("end", "err"):
+                return
+    return send_one
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--stub-latency", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=5078)
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub_server(latency=args.stub_latency)
+    env = dict(os.environ, CONVOAI_OLLAMA_URL=stub_url)
+    workloads = {
+        "canned": ["hi"] * args.messages,
+        "model": [f"explain idea {i}" for i in range(args.messages)],
+    }
+
+    print(f"{args.messages} sequential messages per run, stub latency {args.stub_latency}s")
+    print(f"{'transport':>22} {'workload':>8} {'p50 ms':>8} {'p95 ms':>8} {'msg/s':>7}")
+    sockets = []
+    with serve("uvicorn", 1, args.port, env) as url:
+        transports = {
+            "new connection /chat": fresh_connection(url),
+            "keep-alive /chat": keep_alive(url, "/chat"),
+            "keep-alive /chat/stream": keep_alive(url, "/chat/stream"),
+            "websocket /ws": websocket(url, sockets),
+        }
+        for workload, messages in workloads.items():
+            for name, send_one in transports.items():
+                send_one(messages[0])  # warm up
+                latencies = timed(send_one, messages)
+                print(f"{name:>22} {workload:>8} {percentile(latencies, 50) * 1e3:8.2f} "
+                      f"{percentile(latencies, 95) * 1e3:8.2f} {len(latencies) / sum(latencies):7.0f}")
+        for ws in sockets:
+            ws.close()
+
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: Flask threaded server vs the ASGI app under uvicorn (1 and N workers)
+
+Starts the Ollama stub, launches serve.py in each configuration as a
+separate process, and drives /chat with the open-loop load generator at
+increasing request rates. Upstream concurrency (scheduler threads on the
+Flask path, the asyncio client's limit on the ASGI path) is the same for
+every configuration, so the difference is the serving model itself.
+
+Usage: python benchmarks/compare_serving.py [--rates 20,50,100] [--duration 10] [--workers 4]
+                                            [--stub-latency 0.5] [--upstream-concurrency 64]
+"""
+
+import argparse
+import contextlib
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests
+
+from benchmarks.load_chat import LoadGenerator
+from benchmarks.ollama_stub import start_stub_server
+
+
+@contextlib.contextmanager
+def serve(server, workers, port, env):
+    """Run serve.py in a subprocess until the block exits"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "serve.py"), "--server", server,
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 60
+        while True:
+            try:
+                requests.get(f"{url}/status", timeout=1)
+                break
+            except requests.exceptions.RequestException:
+                if process.poll() is not None or time.time() > deadline:
+                    raise RuntimeError(f"{server} server did not start")
+                time.sleep(0.2)
+        yield url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rates", default="20,50,100", help="comma-separated target rps")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=5077)
+    parser.add_argument("--stub-latency", type=float, default=0.5)
+    parser.add_argument("--upstream-concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    rates = [float(rate) for rate in args.rates.split(",")]
+    stub, stub_url = start_stub_server(latency=args.stub_latency, latency_dist="lognormal")
+    db_dir = tempfile.mkdtemp(prefix="convoai-bench-")
+
+    env = dict(
+        os.environ,
+        CONVOAI_OLLAMA_URL=stub_url,
+        CONVOAI_OLLAMA_MAX_CONCURRENCY=str(args.upstream_concurrency),
+        CONVOAI_OLLAMA_POOL_SIZE=str(args.upstream_concurrency),
+        CONVOAI_SCHEDULER_WORKERS=str(args.upstream_concurrency),
+        CONVOAI_SCHEDULER_MAX_QUEUE="4096",
+        CONVOAI_MEMORY_DB_PATH=os.path.join(db_dir, "conversations.db"),
+    )
+
+    configs = [("flask", 1), ("uvicorn", 1), ("uvicorn", args.workers)]
+    print(f"stub latency {args.stub_latency}s lognormal, upstream concurrency "
+          f"{args.upstream_concurrency}, {args.users} users, {args.duration:.0f}s per rate")
+    print(f"{'server':>12} {'rps':>6} {'ok/s':>7} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+
+    for server, workers in configs:
+        with serve(server, workers, args.port, env) as url:
+            for rate in rates:
+                generator = LoadGenerator(url, users=args.users, canned=0.0)
+                elapsed = generator.run(rate, args.duration)
+                s = generator.summary(elapsed)
+                generator.close()
+                print(f"{server + ' x' + str(workers):>12} {rate:6g} {s['ok_rps']:7.1f} "
+                      f"{s['error_rate']:7.1%} {s['p50'] * 1e3:8.0f} {s['p95'] * 1e3:8.0f} "
+                      f"{s['p99'] * 1e3:8.0f}")
+
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Load test: drive the web app's /chat at a target request rate with many users
+
+Open-loop: requests are sent on a fixed (or Poisson) schedule whether or not
+earlier ones have finished, and latency is measured from each request's
+scheduled time, so a slow server shows up as latency instead of silently
+lowering the offered load. Every simulated user has its own HTTP session
+(connection and cookies).
+
+Without --url the harness starts the Ollama stub and the Flask app in this
+process on free ports, so a run needs neither Ollama nor a GPU; the stub
+options below then shape the fake model.
+
+Usage: python benchmarks/load_chat.py [--url http://127.0.0.1:5001] [--rps 20] [--duration 20]
+                                      [--users 50] [--endpoint chat|stream] [--canned 0.2]
+                                      [--stub-latency 0.2] [--stub-latency-dist lognormal]
+                                      [--stub-tokens-per-second 0] [--stub-error-rate 0.0]
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from benchmarks.ollama_stub import LATENCY_DISTRIBUTIONS, start_stub_server
+
+PERSONALITIES = ["friendly_assistant", "curious_explorer", "wise_mentor", "playful_companion"]
+MODEL_MESSAGES = [
+    "Can you explain how rainbows form?",
+    "What should I cook for dinner tonight?",
+    "Tell me something interesting about octopuses",
+    "How do I get better at chess?",
+    "Why is the sky blue?",
+    "Give me a tip for learning Python",
+]
+CANNED_MESSAGES = ["hi", "hello!", "thanks!", "thank you", "bye"]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class LoadGenerator:
+    """Open-loop request schedule against /chat or /chat/stream"""
+
+    def __init__(self, base_url, endpoint="chat", users=50, canned=0.2, timeout=30.0,
+                 max_inflight=256, seed=0):
+        self.base_url = base_url.rstrip("/")
+        self.endpoint = endpoint
+        self.canned = canned
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.sessions = [requests.Session() for _ in range(users)]
+        self.pool = ThreadPoolExecutor(max_workers=max_inflight)
+        self.results = []  # (latency, ttft, error kind or None)
+        self.lock = threading.Lock()
+
+    def _payload(self):
+        message = self.rng.choice(CANNED_MESSAGES if self.rng.random() < self.canned else MODEL_MESSAGES)
+        return {"message": message, "personality": self.rng.choice(PERSONALITIES)}
+
+    def _send(self, session, payload, scheduled):
+        ttft = None
+        error = None
+        try:
+            if self.endpoint == "stream":
+                with session.post(f"{self.base_url}/chat/stream", json=payload,
+                                  timeout=self.timeout, stream=True) as response:
+                    if response.status_code != 200:
+                        error = f"http {response.status_code}"
+                    else:
+                        for line in response.iter_lines():
+                            if ttft is None and line.startswith(b"data:"):
+                                ttft = time.perf_counter() - scheduled
+                            if line.startswith(b"event: error"):
+                                error = "stream error"
+            else:
+                response = session.post(f"{self.base_url}/chat", json=payload, timeout=self.timeout)
+                if response.status_code != 200:
+                    error = f"http {response.status_code}"
+                elif response.json().get("response", "").startswith("Error:"):
+                    error = "app error"
+        except requests.exceptions.Timeout:
+            error = "timeout"
+        except requests.exceptions.RequestException as e:
+            error = type(e).__name__
+
+        latency = time.perf_counter() - scheduled
+        with self.lock:
+            self.results.append((latency, ttft, error))
+
+    def run(self, rps, duration, poisson=False):
+        """Send requests on schedule for duration seconds; returns wall time until all finished"""
+        start = time.perf_counter()
+        next_at = start
+        futures = []
+        i = 0
+        while next_at < start + duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            session = self.sessions[i % len(self.sessions)]
+            futures.append(self.pool.submit(self._send, session, self._payload(), next_at))
+            i += 1
+            next_at += self.rng.expovariate(rps) if poisson else 1.0 / rps
+        for future in futures:
+            future.result()
+        return time.perf_counter() - start
+
+    def summary(self, elapsed):
+        """Throughput, error rate and latency percentiles (seconds) of the finished run"""
+        latencies = sorted(latency for latency, _, _ in self.results)
+        ttfts = sorted(ttft for _, ttft, _ in self.results if ttft is not None)
+        errors = Counter(error for _, _, error in self.results if error)
+        total = len(self.results)
+        failed = sum(errors.values())
+        summary = {
+            "requests": total,
+            "rps": total / elapsed,
+            "ok_rps": (total - failed) / elapsed,
+            "errors": dict(errors),
+            "error_rate": failed / total if total else 0.0,
+            "max": latencies[-1] if latencies else float("nan"),
+        }
+        for p in (50, 95, 99):
+            summary[f"p{p}"] = percentile(latencies, p)
+            if ttfts:
+                summary[f"ttft_p{p}"] = percentile(ttfts, p)
+        return summary
+
+    def report(self, rps, duration, elapsed, out=sys.stdout):
+        s = self.summary(elapsed)
+        print(f"requests: {s['requests']} over {duration:.0f}s (target {rps:g} rps, "
+              f"achieved {s['rps']:.1f} rps, {s['ok_rps']:.1f} ok/s)", file=out)
+        print(f"  errors: {sum(s['errors'].values())} ({s['error_rate']:.1%})"
+              + (f"  {s['errors']}" if s['errors'] else ""), file=out)
+        print("  latency ms: " + "  ".join(
+            f"p{p} {s[f'p{p}'] * 1e3:.0f}" for p in (50, 95, 99)
+        ) + f"  max {s['max'] * 1e3:.0f}", file=out)
+        if "ttft_p50" in s:
+            print("  first token ms: " + "  ".join(
+                f"p{p} {s[f'ttft_p{p}'] * 1e3:.0f}" for p in (50, 95, 99)
+            ), file=out)
+
+    def close(self):
+        self.pool.shutdown()
+        for session in self.sessions:
+            session.close()
+
+
+@contextlib.contextmanager
+def local_app(stub_options):
+    """Start the Ollama stub and the Flask app in-process; yields (app_url, stub_url)"""
+    from werkzeug.serving import make_server
+
+    stub, stub_url = start_stub_server(**stub_options)
+    os.environ["CONVOAI_OLLAMA_URL"] = stub_url
+    # Settings may already have been imported (and read the environment)
+    from config.settings import Settings
+    Settings.OLLAMA_URL = stub_url
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    import web_app_with_personalities
+
+    server = make_server("127.0.0.1", 0, web_app_with_personalities.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}", stub_url
+    finally:
+        server.shutdown()
+        stub.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="running web app; default: start stub + app in-process")
+    parser.add_argument("--endpoint", choices=("chat", "stream"), default="chat")
+    parser.add_argument("--rps", type=float, default=20.0)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--canned", type=float, default=0.2, help="fraction of greetings/thanks")
+    parser.add_argument("--poisson", action="store_true", help="Poisson instead of evenly spaced arrivals")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stub-latency", type=float, default=0.2)
+    parser.add_argument("--stub-latency-dist", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--stub-tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--stub-disconnect-rate", type=float, default=0.0)
+    parser.add_argument("--stub-stall-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    out = sys.stdout
+    stub_options = dict(
+        latency=args.stub_latency, latency_dist=args.stub_latency_dist, seed=args.seed,
+        token_interval=1.0 / args.stub_tokens_per_second if args.stub_tokens_per_second else 0.0,
+        error_rate=args.stub_error_rate, disconnect_rate=args.stub_disconnect_rate,
+        stall_rate=args.stub_stall_rate,
+    )
+
+    with contextlib.ExitStack() as stack:
+        if args.url:
+            base_url, stub_url = args.url, None
+        else:
+            # The app prints a line per stored message; keep the report readable
+            stack.enter_context(contextlib.redirect_stdout(open(os.devnull, "w")))
+            base_url, stub_url = stack.enter_context(local_app(stub_options))
+
+        generator = LoadGenerator(base_url, args.endpoint, args.users, args.canned,
+                                  args.timeout, seed=args.seed)
+        elapsed = generator.run(args.rps, args.duration, args.poisson)
+        generator.report(args.rps, args.duration, elapsed, out=out)
+
+        status = requests.get(f"{base_url}/status", timeout=5).json()
+        print(f"  server: {json.dumps(status, sort_keys=True)}", file=out)
+        if stub_url:
+            print(f"  stub: {requests.get(f'{stub_url}/stub/stats', timeout=5).json()}", file=out)
+        generator.close()
+
+
+if __name__ == "__main__":
+    main()
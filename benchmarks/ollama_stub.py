@@ -0,0 +1,328 @@
+"""
+Minimal local stand-in for the Ollama HTTP API, for benchmarks
+
+Implements /api/generate (streaming NDJSON and non-streaming) and /api/tags
+over HTTP/1.1 with keep-alive, answering after a delay drawn from a latency
+distribution (fixed, uniform, exponential or lognormal around --latency)
+and streaming one word per token interval.
+
+Faults can be injected at given rates: HTTP 500s, dropped connections (or
+streams cut off halfway) and stalls that outlast client read timeouts.
+Random draws come from a seeded generator so runs are reproducible.
+Counters are served at GET /stub/stats.
+
+Optionally models the costs that context reuse and keep_alive avoid: the
+model takes load_time to load and is unloaded keep_alive seconds after the
+last request (default 5m, like Ollama), and each prompt word costs
+prefill_per_token. Tokens passed back in "context" are treated as cached.
+
+Usage: python benchmarks/ollama_stub.py [--port 11434] [--latency 0.0] [--latency-dist fixed]
+                                        [--tokens-per-second 0] [--reply-words 0]
+                                        [--error-rate 0] [--disconnect-rate 0] [--stall-rate 0]
+                                        [--load-time 0.0] [--prefill-per-token 0.0] [--seed 0]
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_keep_alive(value, default: float) -> float:
+    """Ollama keep_alive (seconds or a duration like "30m"/"1h30m") -> seconds; negative = forever"""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        value = value.strip()
+        try:
+            seconds = float(value)
+        except ValueError:
+            sign = -1.0 if value.startswith("-") else 1.0
+            seconds = sign * sum(float(n) * _UNITS[unit] for n, unit in _DURATION.findall(value))
+    return float("inf") if seconds < 0 else seconds
+
+
+def _token_ids(text: str):
+    """Stand-in token ids: one per word"""
+    return [zlib.crc32(word.encode()) % 32000 for word in text.split()]
+
+
+class ModelState:
+    """Whether the stub's "model" is loaded, shared by all handler threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded_until = 0.0
+        self.loads = 0
+
+    def ensure_loaded(self, load_time: float) -> float:
+        """Load the model if it isn't resident; returns the time spent loading"""
+        with self.lock:
+            if time.monotonic() < self.loaded_until:
+                return 0.0
+            if load_time:
+                time.sleep(load_time)
+            self.loads += 1
+            self.loaded_until = float("inf")  # in use; expiry is set when the request ends
+            return load_time
+
+    def release(self, keep_alive: float):
+        with self.lock:
+            self.loaded_until = time.monotonic() + keep_alive
+
+
+class Faults:
+    """Seeded random draws and counters shared by all handler threads"""
+
+    def __init__(self, seed=0):
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.counters = Counter()
+
+    def uniform(self) -> float:
+        with self.lock:
+            return self.rng.random()
+
+    def sample_latency(self, mean: float, dist: str, sigma: float) -> float:
+        """A delay with the given mean drawn from the named distribution"""
+        if mean <= 0:
+            return 0.0
+        with self.lock:
+            if dist == "uniform":
+                return self.rng.uniform(0.0, 2 * mean)
+            if dist == "exponential":
+                return self.rng.expovariate(1.0 / mean)
+            if dist == "lognormal":
+                return self.rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+            return mean
+
+    def count(self, name: str):
+        with self.lock:
+            self.counters[name] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counters)
+
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # like the real (Go) server; avoids 40ms delayed-ACK stalls
+    latency = 0.0
+    latency_dist = "fixed"
+    latency_sigma = 0.5
+    token_interval = 0.0
+    load_time = 0.0
+    prefill_per_token = 0.0
+    default_keep_alive = 300.0
+    error_rate = 0.0
+    disconnect_rate = 0.0
+    stall_rate = 0.0
+    stall_time = 30.0
+    model_state = ModelState()
+    faults = Faults()
+    reply = "This is a stubbed reply from the local stand-in server."
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": "tinyllama:latest"}]})
+        elif self.path == "/stub/stats":
+            self._send_json(self.faults.snapshot())
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        try:
+            self._handle_post()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (e.g. a cancelled hedge); nothing left to answer
+            self.close_connection = True
+
+    def _handle_post(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path != "/api/generate":
+            self._send_json({"error": "not found"}, status=404)
+            return
+
+        self.faults.count("requests")
+        fault = self._draw_fault()
+        if fault == "error":
+            self._send_json({"error": "injected failure"}, status=500)
+            return
+        if fault == "disconnect" and not body.get("stream", True):
+            self.close_connection = True  # drop the connection without answering
+            return
+        if fault == "stall":
+            time.sleep(self.stall_time)
+
+        self.started = time.monotonic()
+        delay = self.faults.sample_latency(self.latency, self.latency_dist, self.latency_sigma)
+        if delay:
+            time.sleep(delay)
+        model = body.get("model", "tinyllama")
+        keep_alive = parse_keep_alive(body.get("keep_alive"), self.default_keep_alive)
+        load_duration = self.model_state.ensure_loaded(self.load_time)
+        try:
+            prompt = body.get("prompt")
+            if not prompt:
+                # No prompt: just load the model (Ollama's preload request)
+                self._send_json({"model": model, "response": "", "done": True,
+                                 "done_reason": "load", "load_duration": load_duration})
+                return
+
+            # Prefill only the new prompt; tokens in "context" are already cached
+            prompt_ids = _token_ids(prompt)
+            if self.prefill_per_token:
+                time.sleep(self.prefill_per_token * len(prompt_ids))
+            final = {
+                "model": model, "done": True, "load_duration": load_duration,
+                "prompt_eval_count": len(prompt_ids),
+                "context": list(body.get("context") or []) + prompt_ids + _token_ids(self.reply),
+            }
+
+            if body.get("stream", True):
+                self._stream_reply(model, final, cut_off=fault == "disconnect")
+            else:
+                if self.token_interval:
+                    time.sleep(self.token_interval * len(self.reply.split()))
+                self._send_json(dict(final, response=self.reply, total_duration=self._elapsed_ns()))
+        finally:
+            self.model_state.release(keep_alive)
+
+    def _draw_fault(self):
+        """None, or which failure to inject into this request"""
+        draw = self.faults.uniform()
+        for name, rate in (("error", self.error_rate), ("disconnect", self.disconnect_rate),
+                           ("stall", self.stall_rate)):
+            if draw < rate:
+                self.faults.count(name)
+                return name
+            draw -= rate
+        return None
+
+    def _stream_reply(self, model, final, cut_off=False):
+        """Send the reply word by word as chunked NDJSON, like Ollama's stream mode"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        words = self.reply.split(" ")
+        for i, word in enumerate(words):
+            if cut_off and i == len(words) // 2:
+                self.close_connection = True  # stream dies mid-reply
+                return
+            if self.token_interval:
+                time.sleep(self.token_interval)
+            text = word if i == 0 else " " + word
+            self._write_chunk({"model": model, "response": text, "done": False})
+        self._write_chunk(dict(final, response="", total_duration=self._elapsed_ns()))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _elapsed_ns(self):
+        """Ollama's total_duration: time spent on the request server-side, in ns"""
+        return int((time.monotonic() - self.started) * 1e9)
+
+    def _write_chunk(self, payload):
+        line = json.dumps(payload).encode() + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+
+    def _send_json(self, payload, status=200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                      token_interval: float = 0.0, load_time: float = 0.0,
+                      prefill_per_token: float = 0.0, default_keep_alive: float = 300.0,
+                      seed: int = 0, reply_words: int = 0, **options):
+    """Start the stub in a background thread; returns (server, base_url)
+
+    Extra keyword options set the matching StubHandler attributes
+    (latency_dist, error_rate, stall_time, ...). The handler class, with its
+    model_state and faults, is available as server.RequestHandlerClass.
+    """
+    unknown = [name for name in options if not hasattr(StubHandler, name)]
+    if unknown:
+        raise TypeError(f"unknown stub options: {', '.join(unknown)}")
+    if options.get("latency_dist", "fixed") not in LATENCY_DISTRIBUTIONS:
+        raise ValueError(f"latency_dist must be one of {LATENCY_DISTRIBUTIONS}")
+
+    attributes = dict(options, **{
+        "latency": latency,
+        "token_interval": token_interval,
+        "load_time": load_time,
+        "prefill_per_token": prefill_per_token,
+        "default_keep_alive": default_keep_alive,
+        "model_state": ModelState(),
+        "faults": Faults(seed),
+    })
+    if reply_words:
+        base = StubHandler.reply.rstrip(".").split()
+        attributes["reply"] = " ".join(base[i % len(base)] for i in range(reply_words)) + "."
+    handler = type("ConfiguredStubHandler", (StubHandler,), attributes)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.0, help="mean seconds before answering")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal shape")
+    parser.add_argument("--token-interval", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="overrides --token-interval")
+    parser.add_argument("--reply-words", type=int, default=0, help="reply length (default: one sentence)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction answered with HTTP 500")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="fraction dropped or cut off")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="fraction that stall first")
+    parser.add_argument("--stall-time", type=float, default=30.0)
+    parser.add_argument("--load-time", type=float, default=0.0)
+    parser.add_argument("--prefill-per-token", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    token_interval = 1.0 / args.tokens_per_second if args.tokens_per_second else args.token_interval
+    server, url = start_stub_server(
+        args.host, args.port, args.latency, token_interval, args.load_time,
+        args.prefill_per_token, seed=args.seed, reply_words=args.reply_words,
+        latency_dist=args.latency_dist, latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate, disconnect_rate=args.disconnect_rate,
+        stall_rate=args.stall_rate, stall_time=args.stall_time
+    )
+    print(f"Ollama stub listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
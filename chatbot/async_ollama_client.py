@@ -0,0 +1,229 @@
+"""
+ConvoAI Async Ollama Client - asyncio access with in-flight request coalescing
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import random
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Union
+
+try:
+    import aiohttp
+
+    HAS_AIOHTTP = True
+    # Failures before the request reached the server, so safe to resend a generation
+    # (ConnectionTimeoutError is aiohttp 3.10+; older versions can't tell connect from read timeouts)
+    _NEVER_SENT = (aiohttp.ClientConnectorError,) + (
+        (aiohttp.ConnectionTimeoutError,) if hasattr(aiohttp, "ConnectionTimeoutError") else ()
+    )
+except ImportError:
+    HAS_AIOHTTP = False
+
+
+class _Flight:
+    """One upstream call and the number of callers waiting on it"""
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncOllamaClient:
+    """asyncio Ollama client with a concurrency limit and single-flight coalescing.
+
+    Identical in-flight requests (same model, prompt and options) share one
+    upstream call. A caller that is cancelled only detaches itself; the
+    upstream call is cancelled when its last waiter goes away. At most
+    max_concurrency generations are sent to Ollama at once, matching the
+    server's parallelism so extra requests queue here instead of there.
+
+    Like OllamaClient, generations that never reached the server
+    (connection refused, connect timeout) are retried with full-jitter
+    backoff; anything after that is not, since Ollama may be working on it.
+    """
+
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "tinyllama",
+                 max_concurrency: int = 4, pool_size: int = 8,
+                 connect_timeout: float = 2.0, read_timeout: float = 10.0,
+                 retries: int = 2, backoff: float = 0.1):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.retries = retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        # Loop-bound objects are created on first use inside the running loop
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, _Flight] = {}
+        self.stats = {"requests": 0, "upstream": 0, "coalesced": 0, "cancelled": 0}
+
+    def _ensure_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(
+                    connect=self.connect_timeout, sock_read=self.read_timeout
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def generate(self, prompt: str, options: Optional[Dict[str, Any]] = None,
+                       **fields) -> Dict[str, Any]:
+        """Non-streaming /api/generate, sharing the upstream call with identical in-flight requests"""
+        payload = {"model": self.model, "prompt": prompt, "stream": False}
+        if options:
+            payload["options"] = options
+        payload.update(fields)
+        key = json.dumps(payload, sort_keys=True)
+
+        self.stats["requests"] += 1
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(self._post_generate(payload)))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda _task: self._forget(key, flight))
+        else:
+            self.stats["coalesced"] += 1
+
+        flight.waiters += 1
+        try:
+            # shield: one waiter's cancellation must not cancel the shared call
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+                self.stats["cancelled"] += 1
+            raise
+        finally:
+            flight.waiters -= 1
+        return dict(result)
+
+    def _forget(self, key: str, flight: _Flight):
+        """Drop a finished flight so later requests go upstream again"""
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if flight.task.cancelled():
+            return
+        # Mark the exception as retrieved when nobody was left to await it
+        flight.task.exception()
+
+    async def _post_generate(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        session = self._ensure_session()
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    self.stats["upstream"] += 1
+                    async with session.post(f"{self.base_url}/api/generate", json=payload) as response:
+                        response.raise_for_status()
+                        return await response.json(content_type=None)
+            except _NEVER_SENT:
+                if attempt >= self.retries:
+                    raise
+            # Full jitter, outside the semaphore so waiting doesn't hold a generation slot
+            await asyncio.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+            attempt += 1
+
+    async def generate_stream(self, prompt: str, options: Optional[Dict[str, Any]] = None,
+                              **fields) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming /api/generate, yielding each NDJSON chunk (not coalesced)"""
+        payload = {"model": self.model, "prompt": prompt, "stream": True}
+        if options:
+            payload["options"] = options
+        payload.update(fields)
+
+        session = self._ensure_session()
+        async with self._semaphore:
+            self.stats["requests"] += 1
+            self.stats["upstream"] += 1
+            # Leaving the block early closes the response, which stops the generation
+            async with session.post(f"{self.base_url}/api/generate", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.content:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    yield chunk
+                    if chunk.get("done"):
+                        break
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class BackgroundLoop:
+    """An asyncio event loop running on a daemon thread, for synchronous callers"""
+
+    def __init__(self, name: str = "convoai-async"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the loop and wait for its result; cancels it on timeout"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+
+class CoalescingOllamaClient:
+    """Drop-in for OllamaClient whose generate() goes through the async client.
+
+    Flask threads call generate() as before; the call runs on a shared
+    background event loop so concurrent duplicates coalesce and the
+    concurrency limit applies across all threads. Streaming and health
+    calls are delegated to the wrapped synchronous client. Each client
+    retries its own requests: generate() retries are the async client's.
+    timeout is in seconds, or a function called for each generate() that
+    returns them (so a caller's own deadline can apply).
+    """
+
+    def __init__(self, sync_client, async_client: AsyncOllamaClient,
+                 loop: Optional[BackgroundLoop] = None,
+                 timeout: Union[float, Callable[[], Optional[float]], None] = None):
+        self.sync_client = sync_client
+        self.async_client = async_client
+        self.loop = loop or BackgroundLoop()
+        self.timeout = timeout
+        self.base_url = sync_client.base_url
+        self.model = sync_client.model
+
+    def generate(self, prompt: str, options: Optional[Dict[str, Any]] = None,
+                 **fields) -> Dict[str, Any]:
+        timeout = self.timeout() if callable(self.timeout) else self.timeout
+        return self.loop.run(self.async_client.generate(prompt, options, **fields), timeout)
+
+    def generate_stream(self, prompt: str, options: Optional[Dict[str, Any]] = None, **fields):
+        return self.sync_client.generate_stream(prompt, options, **fields)
+
+    def preload(self, keep_alive: Optional[str] = None) -> Dict[str, Any]:
+        return self.sync_client.preload(keep_alive)
+
+    def tags(self) -> Dict[str, Any]:
+        return self.sync_client.tags()
+
+    def close(self):
+        self.loop.run(self.async_client.close())
+        self.sync_client.close()
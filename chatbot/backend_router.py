@@ -0,0 +1,322 @@
+"""
+ConvoAI Backend Router - Hedged requests across Ollama, the local model and canned replies
+"""
+
+import bisect
+import contextvars
+import logging
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+from config.settings import Settings
+from .batching import run_batch
+from .scheduler import track_model_use
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram that slowly forgets old samples.
+
+    Buckets grow geometrically from min_latency to max_latency, so any
+    quantile is accurate to within one growth step. Once decay_every
+    samples have been added since the last decay, all counts are halved
+    and recent behaviour dominates.
+    """
+
+    def __init__(self, min_latency: float = 0.001, max_latency: float = 300.0,
+                 growth: float = 1.15, decay_every: int = 1000):
+        steps = int(math.ceil(math.log(max_latency / min_latency) / math.log(growth)))
+        self.bounds = [min_latency * growth ** i for i in range(steps + 1)]
+        self.counts = [0.0] * (len(self.bounds) + 1)
+        self.decay_every = decay_every
+        self._since_decay = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+            self._since_decay += 1
+            if self._since_decay >= self.decay_every:
+                self.counts = [count / 2 for count in self.counts]
+                self._since_decay = 0
+
+    @property
+    def count(self) -> float:
+        with self._lock:
+            return sum(self.counts)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile, or None without samples"""
+        with self._lock:
+            total = sum(self.counts)
+            if not total:
+                return None
+            target = q * total
+            seen = 0.0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= target and count:
+                    return self.bounds[min(index, len(self.bounds) - 1)]
+            return self.bounds[-1]
+
+
+class CannedBackend:
+    """Instant replies: intent matches, and the last-resort personality fallback"""
+
+    name = "canned"
+
+    def __init__(self, intent_router, fallback):
+        self.intent_router = intent_router
+        self.fallback = fallback
+
+    def compose_reply(self, user_input, user_id, personality_name, cancel_event=None):
+        return self.intent_router.respond(personality_name, user_input)
+
+
+class _Attempt:
+    __slots__ = ("name", "backend", "future", "cancel_event", "started", "hedge",
+                 "model_backed", "parent")
+
+    def __init__(self, name, backend, cancel_event, hedge):
+        self.name = name
+        self.backend = backend
+        self.future = None
+        self.cancel_event = cancel_event
+        self.started = time.monotonic()
+        self.hedge = hedge
+        # Set by the backend's model_backed() once it really calls its model
+        self.model_backed = False
+        self.parent = None
+
+
+class BackendRouter:
+    """generate_response() over several brains, hedging slow primaries.
+
+    Each backend is a (name, brain) pair whose brain has
+    compose_reply(user_input, user_id, personality_name, cancel_event)
+    returning a reply without storing anything, or None. Backends are tried
+    in order: the first gets the request; if it has not answered by its
+    observed p95 latency, one hedged request goes to the next backend and
+    whichever answers first wins while the other is cancelled. A backend
+    that fails hands over to the next one straight away. Hedges are capped
+    at hedge_budget of all requests, so extra load stays bounded even when
+    the primary degrades. Intent matches are answered by the canned backend
+    before any model is involved, and its fallback covers total failure.
+    """
+
+    def __init__(self, memory, backends: List[tuple], canned: CannedBackend,
+                 hedge_quantile: float = 0.95, hedge_budget: float = 0.1,
+                 initial_hedge_delay: float = 2.0, min_hedge_delay: float = 0.05,
+                 min_samples: int = 20, timeout: float = 15.0, workers: int = 8):
+        if not backends:
+            raise ValueError("BackendRouter needs at least one backend")
+        self.memory = memory
+        self.backends = backends
+        self.canned = canned
+        self.hedge_quantile = hedge_quantile
+        self.hedge_budget = hedge_budget
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.timeout = timeout
+
+        self.histograms = {name: LatencyHistogram() for name, _ in backends}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backend-router")
+        self._lock = threading.Lock()
+        self._requests = 0.0
+        self._hedges = 0.0
+        self._counters = {name: {"attempts": 0, "wins": 0, "failures": 0, "cancelled": 0}
+                          for name, _ in backends}
+        self._router_counters = {"requests": 0, "hedged": 0, "hedge_wins": 0,
+                                 "hedges_denied": 0, "canned": 0, "fallbacks": 0}
+
+    def generate_response(self, user_input, user_id, personality_name="friendly_assistant"):
+        """Same contract as the brains: store the turn and return the reply"""
+        self.memory.add_message(user_id, "user", user_input)
+        reply = self.canned.compose_reply(user_input, user_id, personality_name)
+        if reply:
+            self._count_router("canned")
+        else:
+            reply = self.route(user_input, user_id, personality_name)
+        if not reply:
+            self._count_router("fallbacks")
+            reply = self.get_fallback(personality_name)
+        self.memory.add_message(user_id, "assistant", reply)
+        return reply
+
+    def get_fallback(self, personality_name="friendly_assistant", reason="no_reply"):
+        return self.canned.fallback(personality_name, reason)
+
+    def generate_batch(self, items, concurrency=None, scheduler=None):
+        """generate_response() for many BatchItems, yielding BatchResults as they complete"""
+        return run_batch(self.generate_response, items, concurrency or Settings.BATCH_CONCURRENCY,
+                         scheduler=scheduler)
+
+    def hedge_delay(self, name: str) -> float:
+        """How long to wait on a backend before hedging: its observed tail latency"""
+        histogram = self.histograms[name]
+        if histogram.count < self.min_samples:
+            return self.initial_hedge_delay
+        return min(max(histogram.quantile(self.hedge_quantile), self.min_hedge_delay), self.timeout)
+
+    def route(self, user_input, user_id, personality_name) -> Optional[str]:
+        """Reply from the fastest healthy backend, or None if all failed or timed out"""
+        self._count_router("requests")
+        deadline = time.monotonic() + self.timeout
+        queue = list(self.backends)
+        attempts: List[_Attempt] = []
+        hedged = False
+
+        attempts.append(self._launch(queue.pop(0), user_input, user_id, personality_name, hedge=False))
+        hedge_at = attempts[0].started + self.hedge_delay(attempts[0].name)
+
+        while True:
+            running = [a for a in attempts if not a.future.done()]
+            now = time.monotonic()
+            wake_at = deadline if hedged or not queue else min(hedge_at, deadline)
+            # An attempt that finished since the last wait (a fast hedge) is read right away
+            if running and len(running) == len(attempts):
+                wait([a.future for a in running], timeout=max(wake_at - now, 0),
+                     return_when=FIRST_COMPLETED)
+
+            for attempt in [a for a in attempts if a.future.done()]:
+                attempts.remove(attempt)
+                reply = self._result(attempt)
+                if reply:
+                    self._finish(attempt, attempts)
+                    return reply
+
+            now = time.monotonic()
+            if not attempts and not queue:
+                return None
+            if now >= deadline:
+                self._cancel(attempts)
+                return None
+            if not attempts:
+                # Everything in flight failed: hand over now rather than at the hedge timer
+                attempts.append(self._launch(queue.pop(0), user_input, user_id,
+                                             personality_name, hedge=False))
+                hedge_at = attempts[0].started + self.hedge_delay(attempts[0].name)
+            elif not hedged and queue and now >= hedge_at:
+                hedged = True
+                if self._hedge_allowed():
+                    attempts.append(self._launch(queue.pop(0), user_input, user_id,
+                                                 personality_name, hedge=True))
+                else:
+                    self._count_router("hedges_denied")
+
+    def _launch(self, backend, user_input, user_id, personality_name, hedge: bool) -> _Attempt:
+        name, brain = backend
+        attempt = _Attempt(name, brain, threading.Event(), hedge)
+        # Each attempt records its spans in the request's trace
+        attempt.future = self._executor.submit(
+            contextvars.copy_context().run, track_model_use, attempt, brain.compose_reply,
+            user_input, user_id, personality_name, attempt.cancel_event
+        )
+        with self._lock:
+            self._counters[name]["attempts"] += 1
+            if hedge:
+                self._hedges += 1
+                self._router_counters["hedged"] += 1
+        return attempt
+
+    def _result(self, attempt: _Attempt) -> Optional[str]:
+        try:
+            reply = attempt.future.result()
+        except Exception:
+            reply = None
+        if not reply:
+            # Failures count toward the tail too: a backend timing out is slow, not absent.
+            # Short-circuits (breaker open, model not loaded) never reached it, so they don't.
+            if attempt.model_backed:
+                self.histograms[attempt.name].record(time.monotonic() - attempt.started)
+            with self._lock:
+                self._counters[attempt.name]["failures"] += 1
+        return reply
+
+    def _finish(self, winner: _Attempt, losers: List[_Attempt]):
+        self.histograms[winner.name].record(time.monotonic() - winner.started)
+        with self._lock:
+            self._counters[winner.name]["wins"] += 1
+            if winner.hedge:
+                self._router_counters["hedge_wins"] += 1
+        self._cancel(losers)
+
+    def _cancel(self, attempts: List[_Attempt]):
+        now = time.monotonic()
+        for attempt in attempts:
+            attempt.cancel_event.set()
+            # The loser took at least this long; keeps its tail estimate honest
+            self.histograms[attempt.name].record(now - attempt.started)
+            with self._lock:
+                self._counters[attempt.name]["cancelled"] += 1
+
+    def _hedge_allowed(self) -> bool:
+        """Keep hedged requests within hedge_budget of all requests (decaying window)"""
+        with self._lock:
+            return self._hedges < self.hedge_budget * self._requests
+
+    def _count_router(self, key: str):
+        with self._lock:
+            self._router_counters[key] += 1
+            if key == "requests":
+                self._requests += 1
+                if self._requests > 1000:
+                    self._requests /= 2
+                    self._hedges /= 2
+
+    def stats(self) -> Dict[str, Any]:
+        """Routing counters plus per-backend attempts, wins and latency quantiles"""
+        with self._lock:
+            stats = dict(self._router_counters)
+            backends = {name: dict(counters) for name, counters in self._counters.items()}
+        for name, counters in backends.items():
+            histogram = self.histograms[name]
+            for q in (0.5, 0.95, 0.99):
+                value = histogram.quantile(q)
+                counters[f"p{int(q * 100)}_ms"] = round(value * 1000, 1) if value is not None else None
+            counters["hedge_after_ms"] = round(self.hedge_delay(name) * 1000, 1)
+        stats["backends"] = backends
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def router_from_settings(memory, ollama_brain) -> Optional[BackendRouter]:
+    """BackendRouter for Settings.WEB_BACKENDS, or None when Ollama is the only backend"""
+    names = [name.strip() for name in Settings.WEB_BACKENDS.split(",") if name.strip()]
+    if names in ([], ["ollama"]):
+        return None
+
+    backends = []
+    for name in names:
+        if name == "ollama":
+            backends.append(("ollama", ollama_brain))
+        elif name == "local":
+            from .brain import ConvoAIBrain as LocalBrain
+            backends.append(("local", LocalBrain(memory)))
+        else:
+            logger.warning("Unknown backend '%s' in WEB_BACKENDS - skipping", name)
+
+    if [name for name, _ in backends] in ([], ["ollama"]):
+        if not backends:
+            logger.error("WEB_BACKENDS=%r names no known backend (ollama, local) - "
+                         "serving /chat from Ollama alone", Settings.WEB_BACKENDS)
+        return None
+
+    logger.info("Routing /chat across: %s", ", ".join(name for name, _ in backends))
+    return BackendRouter(
+        memory,
+        backends,
+        CannedBackend(ollama_brain.intent_router, ollama_brain.get_fallback),
+        hedge_quantile=Settings.HEDGE_QUANTILE,
+        hedge_budget=Settings.HEDGE_BUDGET,
+        initial_hedge_delay=Settings.HEDGE_INITIAL_DELAY,
+        timeout=Settings.INTERACTIVE_DEADLINE,
+        workers=Settings.ROUTER_WORKERS
+    )
@@ -0,0 +1,222 @@
+"""
+ConvoAI Batch Helpers - Bulk chat items run concurrently, each user's turns in order
+"""
+
+import asyncio
+import contextvars
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from .scheduler import BATCH
+
+
+class BatchItem(NamedTuple):
+    index: int
+    user_id: str
+    message: str
+    personality: str
+
+
+class BatchResult(NamedTuple):
+    index: int
+    response: Optional[str]
+    error: Optional[str]
+    elapsed_ms: float
+
+    def to_dict(self) -> Dict:
+        result = {"index": self.index, "response": self.response,
+                  "elapsed_ms": round(self.elapsed_ms, 1)}
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+def parse_batch(raw_items, user_prefix: str = "", default_user: str = "batch",
+                default_personality: str = "friendly_assistant",
+                max_items: Optional[int] = None) -> List[BatchItem]:
+    """BatchItems from a list of {user_id, message, personality} dicts.
+
+    user_prefix keeps batch conversations apart from real sessions. Raises
+    ValueError for anything that isn't a list of items with a message.
+    """
+    if not isinstance(raw_items, list):
+        raise ValueError("'items' must be a list")
+    if max_items is not None and len(raw_items) > max_items:
+        raise ValueError(f"at most {max_items} items per batch")
+
+    items = []
+    for index, raw in enumerate(raw_items):
+        if not isinstance(raw, dict) or not isinstance(raw.get("message"), str):
+            raise ValueError(f"item {index} needs a 'message' string")
+        items.append(BatchItem(
+            index,
+            user_prefix + str(raw.get("user_id") or default_user),
+            raw["message"],
+            raw.get("personality") or default_personality,
+        ))
+    return items
+
+
+def by_user(items: List[BatchItem]) -> List[List[BatchItem]]:
+    """Items grouped per user, each group in submission order"""
+    chains: Dict[str, List[BatchItem]] = {}
+    for item in items:
+        chains.setdefault(item.user_id, []).append(item)
+    return list(chains.values())
+
+
+def waves(items: List[BatchItem], size: int) -> Iterator[List[BatchItem]]:
+    """Groups of up to size items with at most one per user, so a user's
+    later turn is only generated once their earlier reply is in memory"""
+    pending = [list(chain) for chain in by_user(items)]
+    while pending:
+        wave = []
+        for chain in pending:
+            if len(wave) == size:
+                break
+            wave.append(chain.pop(0))
+        pending = [chain for chain in pending if chain]
+        # Users left out of a full wave go first next time
+        pending.sort(key=lambda chain: chain[0].index)
+        yield wave
+
+
+def _answer(generate_response: Callable, item: BatchItem) -> BatchResult:
+    start = time.perf_counter()
+    try:
+        response, error = generate_response(item.message, item.user_id, item.personality), None
+    except Exception as e:
+        response, error = None, str(e)
+    return BatchResult(item.index, response, error, (time.perf_counter() - start) * 1000)
+
+
+def _rejected():
+    raise RuntimeError("overloaded: not scheduled before the batch deadline")
+
+
+def _result(future: Future, item: BatchItem) -> BatchResult:
+    try:
+        return future.result()
+    except Exception as e:
+        return BatchResult(item.index, None, str(e), 0.0)
+
+
+def schedule_batch(scheduler, generate_response: Callable, items: List[BatchItem],
+                   concurrency: int, emit: Callable[[BatchResult], None]) -> Callable[[], None]:
+    """Run items as BATCH-priority jobs on a shared InferenceScheduler.
+
+    Each user's items are submitted one at a time, the next once the
+    previous is answered, and at most concurrency users have a job queued
+    or running. Queue priority doesn't preempt a running job, so that is
+    also capped at one less than the scheduler's workers: an interactive
+    chat always finds a worker free. Items the scheduler sheds (queue full, deadline missed)
+    come back as errors. emit(result) is called from worker threads.
+    Returns a cancel() that stops submitting and drops queued items; an
+    item already running finishes, but nothing after it starts.
+    """
+    context = contextvars.copy_context()
+    chains = deque(iter(chain) for chain in by_user(items))
+    pending = set()
+    lock = threading.Lock()
+    cancelled = threading.Event()
+
+    def next_item(chain):
+        """The chain's next item, or the first of the next chain not yet started"""
+        with lock:
+            while True:
+                if chain is not None:
+                    item = next(chain, None)
+                    if item is not None:
+                        return chain, item
+                if not chains:
+                    return None, None
+                chain = chains.popleft()
+
+    def advance(chain):
+        # A loop rather than recursion: shed items resolve at once, and a chain can be long
+        while not cancelled.is_set():
+            chain, item = next_item(chain)
+            if item is None:
+                return
+            # Each job runs in a copy of the request's context, so its spans join the request's trace
+            future = context.copy().run(scheduler.submit, _answer, generate_response, item,
+                                        priority=BATCH, fallback=_rejected)
+            if not future.done():
+                with lock:
+                    pending.add(future)
+                future.add_done_callback(lambda f, chain=chain, item=item: finished(f, chain, item))
+                return
+            emit(_result(future, item))
+
+    def finished(future, chain, item):
+        with lock:
+            pending.discard(future)
+        if future.cancelled():
+            return
+        emit(_result(future, item))
+        advance(chain)
+
+    def cancel():
+        cancelled.set()
+        with lock:
+            queued = list(pending)
+        for future in queued:
+            future.cancel()
+
+    for _ in range(max(1, min(concurrency, scheduler.workers - 1))):
+        advance(None)
+    return cancel
+
+
+def run_batch(generate_response: Callable, items: List[BatchItem],
+              concurrency: int = 4, scheduler=None) -> Iterator[BatchResult]:
+    """Results of generate_response(message, user_id, personality) for every item,
+    yielded as each completes. Up to concurrency users are served at once,
+    on scheduler at BATCH priority if given (else on threads of its own);
+    closing the iterator early stops each user's chain after its current item."""
+    results = queue.Queue()
+    if scheduler is not None:
+        cancel = schedule_batch(scheduler, generate_response, items, concurrency, results.put)
+        try:
+            for _ in range(len(items)):
+                yield results.get()
+        finally:
+            cancel()
+        return
+
+    cancelled = threading.Event()
+
+    def run_chain(chain):
+        for item in chain:
+            if cancelled.is_set():
+                return
+            results.put(_answer(generate_response, item))
+
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch")
+    try:
+        for chain in by_user(items):
+            pool.submit(contextvars.copy_context().run, run_chain, chain)
+        for _ in range(len(items)):
+            yield results.get()
+    finally:
+        cancelled.set()
+        pool.shutdown(wait=False)
+
+
+async def scheduled_batch_async(scheduler, generate_response: Callable, items: List[BatchItem],
+                                concurrency: int = 4) -> AsyncIterator[BatchResult]:
+    """run_batch() on a scheduler, for coroutines: results arrive without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    results = asyncio.Queue()
+    cancel = schedule_batch(scheduler, generate_response, items, concurrency,
+                            lambda result: loop.call_soon_threadsafe(results.put_nowait, result))
+    try:
+        for _ in range(len(items)):
+            yield await results.get()
+    finally:
+        cancel()
+
@@ -2,55 +2,158 @@
 ConvoAI Brain - M1 Mac Compatible AI Model
 """
 
+import contextvars
+import logging
 import random
 import threading
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
 from .memory import ConversationMemory
 from .personality import PersonalityManager
+from .prompt_builder import PromptBuilder
+from .onnx_backend import OnnxGenerator, HAS_ONNXRUNTIME
+from .profile_extractor import default_extractor
+from .batching import BatchItem, BatchResult, waves
+from .metrics import ERRORS, FALLBACKS, MODEL_LOADED, STAGE_SECONDS, stage
+from .scheduler import model_backed
+from .tracing import add_span, trace
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
 
 try:
-    from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+    from transformers import (
+        AutoTokenizer, AutoModelForCausalLM, StoppingCriteria, StoppingCriteriaList,
+        TextIteratorStreamer, pipeline
+    )
     import torch
 
+    class _CancelCriteria(StoppingCriteria):
+        """Stop model.generate as soon as a cancel event is set"""
+
+        def __init__(self, cancel_event: threading.Event):
+            self.cancel_event = cancel_event
+
+        def __call__(self, input_ids, scores, **kwargs) -> bool:
+            return self.cancel_event.is_set()
+
     HAS_TRANSFORMERS = True
-    print("✅ Transformers library loaded successfully")
 except ImportError as e:
     HAS_TRANSFORMERS = False
-    print(f"❌ Transformers import failed: {e}")
+    logger.warning("Transformers import failed: %s", e)
+
+
+class _ReplyCleaner:
+    """_clean_ai_response() for a reply that arrives in pieces.
+
+    feed() returns only text that is certain to survive cleaning: the reply
+    ends at the first newline or Human:/AI: label, and trailing punctuation
+    (or a possible label start) waits for the next words. Nothing is shown
+    while the reply is under 3 characters or could still be an echo of the
+    user's message; finish() then returns None and the caller substitutes.
+    """
+    STOPS = ("Human:", "AI:", "\n")
+    TRIM = ".,!?;: \t\r\n"
+
+    def __init__(self, user_input: str):
+        self.user_input = user_input.lower().strip()
+        self.raw = ""
+        self.emitted = 0
+        self.done = False
+        self.quoted = False
+
+    def _candidate(self) -> str:
+        text = self.raw.lstrip()
+        cut = min((i for i in (text.find(stop) for stop in self.STOPS) if i != -1), default=-1)
+        if cut != -1:
+            self.done = True
+            text = text[:cut]
+        text = text.lstrip(self.TRIM)
+        # A reply wrapped in quotes loses them; the closing one waits for finish()
+        self.quoted = text.startswith('"')
+        return text[1:] if self.quoted else text
+
+    def feed(self, text: str) -> str:
+        if self.done:
+            return ""
+        self.raw += text
+        safe = self._candidate()
+        if not self.done:
+            # Hold back what could be the start of a label split across chunks
+            for stop in self.STOPS[:2]:
+                for size in range(len(stop) - 1, 0, -1):
+                    if safe.endswith(stop[:size]):
+                        safe = safe[:-size]
+                        break
+        safe = safe.rstrip(self.TRIM + ('"' if self.quoted else ""))
+        if len(safe) < 3 or self.user_input.startswith(safe.lower()) or len(safe) <= self.emitted:
+            return ""
+        text, self.emitted = safe[self.emitted:], len(safe)
+        return text
+
+    def finish(self) -> Optional[str]:
+        """The rest of the cleaned reply, or None if it has to be replaced"""
+        final = self._candidate().rstrip(self.TRIM)
+        if self.quoted and final.endswith('"'):
+            final = final[:-1].rstrip(self.TRIM)
+        if len(final) < 3 or final.lower() == self.user_input:
+            return None
+        return final[self.emitted:]
 
 
 class ConvoAIBrain:
-    def __init__(self, memory: ConversationMemory):
+    MAX_NEW_TOKENS = 50
+
+    # Sampling parameters shared by the torch and ONNX backends
+    GENERATION_KWARGS = {
+        "max_new_tokens": MAX_NEW_TOKENS,
+        "min_new_tokens": 5,
+        "temperature": 0.8,
+        "top_p": 0.9,
+        "top_k": 50,
+        "do_sample": True,
+        "repetition_penalty": 1.1,
+        "no_repeat_ngram_size": 3,
+    }
+
+    def __init__(self, memory: ConversationMemory, load_model: bool = True):
         self.memory = memory
-        self.personality_manager = PersonalityManager()
+        self.personality_manager = PersonalityManager.shared()
+        self.personality_manager.add_listener(self._on_personalities_changed)
         self.current_personality = "friendly_assistant"
         self.model = None
         self.tokenizer = None
         self.generator = None
+        self.prompt_builder = None
+        self.onnx_generator = None
         self.use_pipeline = False
         self.model_loaded = False
         self.loading_status = "Not started"
+        MODEL_LOADED.labels("local").set_function(lambda: self.model_loaded)
+
+        logger.info("Local brain initializing")
 
-        print("🧠 ConvoAI Brain initializing with AI model...")
+        if load_model:
+            self.load_model()
 
+    def load_model(self):
+        """Load and test the local model (seconds to minutes); loading_status tracks progress"""
         if HAS_TRANSFORMERS:
             self._load_reliable_model()
         else:
-            print("❌ Cannot load AI model - transformers not available")
+            logger.error("Cannot load the local model: transformers is not installed")
+            self.loading_status = "Unavailable: transformers is not installed"
 
     def _load_reliable_model(self):
         """Load AI model with M1 Mac compatibility"""
         try:
-            self.loading_status = "Loading..."
-            print("🚀 Loading M1-compatible AI model...")
+            self.loading_status = "Loading tokenizer..."
 
             # Use a smaller, M1-friendly model
             model_name = "distilgpt2"
-            print(f"📥 Loading {model_name} (optimized for M1 Macs)")
+            logger.info("Loading %s", model_name)
 
             # Load tokenizer with specific settings
-            print("📝 Loading tokenizer...")
             self.tokenizer = AutoTokenizer.from_pretrained(
                 model_name,
                 clean_up_tokenization_spaces=False,
@@ -61,10 +164,10 @@ class ConvoAIBrain:
             if self.tokenizer.pad_token is None:
                 self.tokenizer.add_special_tokens({'pad_token': '[PAD]'})
 
-            print("✅ Tokenizer ready")
+            logger.debug("Tokenizer ready")
+            self.loading_status = "Loading model weights..."
 
             # Load model with M1-specific settings
-            print("🧠 Loading AI model with M1 compatibility...")
             self.model = AutoModelForCausalLM.from_pretrained(
                 model_name,
                 torch_dtype=torch.float32,
@@ -79,33 +182,69 @@ class ConvoAIBrain:
 
             # Set to eval mode
             self.model.eval()
-            print("✅ Model ready")
+            logger.debug("Model weights ready")
+
+            # Prompt builder caches token ids per message and header
+            self.prompt_builder = PromptBuilder(
+                self.tokenizer,
+                context_window=self._model_context_window(),
+                max_new_tokens=self.MAX_NEW_TOKENS
+            )
+
+            if Settings.INFERENCE_BACKEND == "onnx":
+                self.loading_status = "Preparing ONNX backend..."
+                self._load_onnx_backend(model_name)
 
             # Test the model with proper attention mask
-            print("🧪 Testing AI model...")
+            self.loading_status = "Testing model..."
             test_response = self._test_model_safe()
             if test_response:
-                print(f"🧪 Test successful: {test_response[:50]}...")
+                logger.debug("Model test reply: %.50s", test_response)
                 self.model_loaded = True
                 self.loading_status = "Loaded successfully"
-                print("=" * 60)
-                print("🎉 AI MODEL LOADED AND WORKING!")
-                print("=" * 60)
+                logger.info("Local model %s loaded", model_name)
             else:
                 raise Exception("Model test failed")
 
         except Exception as e:
-            print(f"❌ Model loading failed: {e}")
+            logger.error("Model loading failed: %s", e)
             self.loading_status = f"Failed: {e}"
             self.model_loaded = False
 
             # Try even smaller model
             self._try_tiny_model()
 
+    def _load_onnx_backend(self, model_name: str):
+        """Switch generation to ONNX Runtime, keeping torch if that fails"""
+        if not HAS_ONNXRUNTIME:
+            logger.warning("ONNX backend requested but onnxruntime is not installed - using torch")
+            return
+        try:
+            self.onnx_generator = OnnxGenerator(
+                self.model,
+                model_name,
+                cache_dir=Settings.ONNX_CACHE_DIR,
+                threads=Settings.ONNX_THREADS
+            )
+            logger.info("ONNX Runtime backend ready")
+        except Exception as e:
+            logger.warning("ONNX backend failed, using torch: %s", e)
+            self.onnx_generator = None
+
+    def _model_context_window(self) -> int:
+        """Get the model's maximum sequence length in tokens"""
+        config = self.model.config
+        for attr in ("n_positions", "max_position_embeddings", "n_ctx"):
+            value = getattr(config, attr, None)
+            if value:
+                return value
+        return 1024
+
     def _try_tiny_model(self):
         """Try the absolute smallest working model"""
         try:
-            print("🔄 Trying minimal model for M1 compatibility...")
+            logger.info("Trying the gpt2 pipeline instead")
+            self.loading_status = "Loading fallback model..."
 
             # Use pipeline which handles everything automatically
             self.generator = pipeline(
@@ -121,13 +260,13 @@ class ConvoAIBrain:
             if test:
                 self.model_loaded = True
                 self.loading_status = "Pipeline model loaded"
-                print("✅ Minimal AI model working!")
+                logger.info("Pipeline model loaded")
                 self.use_pipeline = True
             else:
                 raise Exception("Pipeline test failed")
 
         except Exception as e:
-            print(f"❌ All models failed: {e}")
+            logger.error("All models failed: %s", e)
             self.model_loaded = False
             self.loading_status = "All models failed"
             self.use_pipeline = False
@@ -161,14 +300,14 @@ class ConvoAIBrain:
             return response[len(prompt):].strip()
 
         except Exception as e:
-            print(f"❌ Model test failed: {e}")
+            logger.error("Model test failed: %s", e)
             return None
 
+    @trace("generate_response")
     def generate_response(self, user_input: str, user_id: str = "default") -> str:
         """Generate intelligent response using AI model"""
 
-        print(f"\n🤖 AI Status: {self.loading_status}")
-        print(f"🤖 Model Ready: {self.model_loaded}")
+        logger.debug("Turn for %s (model: %s)", user_id, self.loading_status)
 
         # Store user message
         self.memory.add_message(user_id, "user", user_input)
@@ -179,133 +318,392 @@ class ConvoAIBrain:
 
         # Generate response
         if self.model_loaded:
-            print("🧠 Using AI model for response generation...")
             response = self._generate_ai_response(user_input, context, user_profile)
         else:
-            print("⚠️ AI model not ready - this shouldn't happen!")
+            logger.warning("Local model not loaded - answering without it")
+            FALLBACKS.labels("model_not_loaded").inc()
             response = "Sorry, my AI brain is still loading. Give me a moment and try again!"
 
         # Store response
         self.memory.add_message(user_id, "assistant", response)
-        self._update_user_profile(user_id, user_input)
+        self._update_user_profile(user_id, user_input, user_profile)
+
+        return response
+
+    def generate_response_stream(self, user_input: str, user_id: str = "default",
+                                 cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """Yield the reply in chunks as the model produces them; stores the full reply once at the end.
+
+        Nothing is stored for a reply that is cancelled or abandoned midway.
+        """
+        self.memory.add_message(user_id, "user", user_input)
+        if not self.model_loaded:
+            logger.warning("Local model not loaded - answering without it")
+            FALLBACKS.labels("model_not_loaded").inc()
+            response = "Sorry, my AI brain is still loading. Give me a moment and try again!"
+            self.memory.add_message(user_id, "assistant", response)
+            yield response
+            return
 
+        context = self.memory.get_recent_context(user_id, limit=4)
+        user_profile = self.memory.get_user_profile(user_id)
+        cleaner = _ReplyCleaner(user_input)
+        parts = []
+        try:
+            for text in self._stream_ai_response(user_input, context, user_profile, cancel_event):
+                text = cleaner.feed(text)
+                if text:
+                    parts.append(text)
+                    yield text
+                if cleaner.done:
+                    break
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            tail = cleaner.finish()
+        except Exception:
+            logger.exception("Streaming generation failed")
+            ERRORS.labels("local_model").inc()
+            tail = "" if parts else "I'm having trouble with my AI processing right now. Could you try rephrasing that?"
+        if tail is None:
+            tail = self._clean_ai_response(cleaner.raw, user_input)
+        if tail:
+            parts.append(tail)
+            yield tail
+
+        self.memory.add_message(user_id, "assistant", "".join(parts))
+        self._update_user_profile(user_id, user_input, user_profile)
+
+    def compose_reply(self, user_input: str, user_id: str = "default", personality_name: str = None,
+                      cancel_event: Optional[threading.Event] = None) -> Optional[str]:
+        """Generate a reply without storing anything; None if the model can't answer or was cancelled"""
+        if not self.model_loaded:
+            return None
+        context = self.memory.get_recent_context(user_id, limit=4)
+        user_profile = self.memory.get_user_profile(user_id)
+        response = self._generate_ai_response(user_input, context, user_profile, personality_name, cancel_event)
+        if cancel_event is not None and cancel_event.is_set():
+            return None
         return response
 
-    def _generate_ai_response(self, user_input: str, context: List[Dict], user_profile: Dict) -> str:
+    def generate_batch(self, items: List[BatchItem], batch_size: int = None) -> Iterator[BatchResult]:
+        """Answer many BatchItems, running the model on up to batch_size prompts at once.
+
+        A batch holds at most one item per user, so a user's later turns are
+        generated after their earlier replies are stored. The ONNX and
+        pipeline backends still generate one prompt at a time.
+        """
+        batch_size = batch_size or Settings.LOCAL_BATCH_SIZE
+        for wave in waves(items, batch_size):
+            start = time.perf_counter()
+            contexts, profiles = [], []
+            for item in wave:
+                self.memory.add_message(item.user_id, "user", item.message)
+                contexts.append(self.memory.get_recent_context(item.user_id, limit=4))
+                profiles.append(self.memory.get_user_profile(item.user_id))
+
+            error = None
+            if not self.model_loaded:
+                responses, error = [None] * len(wave), "model not loaded"
+            else:
+                try:
+                    responses = self._generate_batch_responses(wave, contexts, profiles)
+                except Exception as e:
+                    logger.exception("Batch generation failed")
+                    ERRORS.labels("local_model").inc()
+                    responses, error = [None] * len(wave), str(e)
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            for item, profile, response in zip(wave, profiles, responses):
+                if response is not None:
+                    self.memory.add_message(item.user_id, "assistant", response)
+                    self._update_user_profile(item.user_id, item.message, profile)
+                yield BatchResult(item.index, response, error, elapsed_ms)
+
+    def _generate_batch_responses(self, wave: List[BatchItem], contexts: List[List[Dict]],
+                                  profiles: List[Dict]) -> List[str]:
+        """Replies for one wave: a single padded generate() call on the torch model"""
+        if self.onnx_generator is not None or self.use_pipeline:
+            return [self._generate_ai_response(item.message, context, profile, item.personality)
+                    for item, context, profile in zip(wave, contexts, profiles)]
+
+        prompts = [
+            self.prompt_builder.build(
+                self._build_conversation_header(profile, item.personality),
+                self._prior_context(context, item.message),
+                item.message
+            )
+            for item, context, profile in zip(wave, contexts, profiles)
+        ]
+        logger.debug("Batch of %d prompts, up to %d tokens", len(prompts), max(map(len, prompts)))
+
+        responses = []
+        for item, new_ids in zip(wave, self._generate_ids_batch(prompts)):
+            text = self.tokenizer.decode(new_ids, skip_special_tokens=True).strip()
+            responses.append(self._clean_ai_response(text, item.message))
+        return responses
+
+    @stage("inference")
+    def _generate_ids_batch(self, prompts: List[List[int]]) -> List[List[int]]:
+        """New token ids for several prompts from one left-padded generate() call"""
+        pad_id = self.tokenizer.pad_token_id
+        eos_id = self.tokenizer.eos_token_id
+        width = max(len(ids) for ids in prompts)
+
+        # Left padding keeps every prompt's last token in the final column
+        input_ids = torch.tensor([[pad_id] * (width - len(ids)) + ids for ids in prompts], dtype=torch.long)
+        attention_mask = torch.tensor([[0] * (width - len(ids)) + [1] * len(ids) for ids in prompts],
+                                      dtype=torch.long)
+        with torch.no_grad():
+            outputs = self.model.generate(
+                input_ids,
+                attention_mask=attention_mask,
+                pad_token_id=pad_id,
+                eos_token_id=eos_id,
+                **self.GENERATION_KWARGS
+            )
+
+        new_ids = []
+        for row in outputs[:, width:].tolist():
+            # Rows that finished early are padded out to the longest one
+            for stop in (eos_id, pad_id):
+                if stop in row:
+                    row = row[:row.index(stop)]
+            new_ids.append(row)
+        return new_ids
+
+    def _generate_ai_response(self, user_input: str, context: List[Dict], user_profile: Dict,
+                              personality_name: str = None,
+                              cancel_event: Optional[threading.Event] = None) -> str:
         """Generate response using either direct model or pipeline"""
+        model_backed()
         try:
             if hasattr(self, 'use_pipeline') and self.use_pipeline:
-                return self._generate_pipeline_response(user_input, context, user_profile)
+                return self._generate_pipeline_response(user_input, context, user_profile, personality_name)
             else:
-                return self._generate_direct_response(user_input, context, user_profile)
-        except Exception as e:
-            print(f"❌ AI generation error: {e}")
+                return self._generate_direct_response(user_input, context, user_profile,
+                                                      personality_name, cancel_event)
+        except Exception:
+            logger.exception("Generation failed")
+            ERRORS.labels("local_model").inc()
             return f"I'm having some technical difficulties. Let me try a different approach: What would you like to talk about regarding '{user_input}'?"
 
-    def _generate_pipeline_response(self, user_input: str, context: List[Dict], user_profile: Dict) -> str:
+    def _stream_ai_response(self, user_input: str, context: List[Dict], user_profile: Dict,
+                            cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """Yield raw reply text as it is generated (the pipeline only has it all at once)"""
+        if self.use_pipeline:
+            yield self._generate_pipeline_response(user_input, context, user_profile)
+            return
+
+        header = self._build_conversation_header(user_profile)
+        prompt_ids = self.prompt_builder.build(header, self._prior_context(context, user_input), user_input)
+        logger.debug("Prompt: %d tokens", len(prompt_ids))
+
+        started = time.perf_counter()
+        try:
+            if self.onnx_generator is not None:
+                yield from self._stream_onnx_text(prompt_ids, cancel_event)
+            else:
+                yield from self._stream_torch_text(prompt_ids, cancel_event)
+        finally:
+            elapsed = time.perf_counter() - started
+            STAGE_SECONDS.labels("inference").observe(elapsed)
+            add_span("inference", elapsed)
+
+    def _stream_onnx_text(self, prompt_ids: List[int],
+                          cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """Decode the ONNX generator's tokens as they come"""
+        new_ids = []
+        shown = ""
+        for token in self.onnx_generator.generate_tokens(
+            prompt_ids,
+            eos_token_id=self.tokenizer.eos_token_id,
+            **self.GENERATION_KWARGS
+        ):
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            new_ids.append(token)
+            text = self.tokenizer.decode(new_ids, skip_special_tokens=True)
+            # Wait out tokens that end partway through a multi-byte character
+            if text.startswith(shown) and not text.endswith("\ufffd"):
+                if len(text) > len(shown):
+                    yield text[len(shown):]
+                shown = text
+
+    def _stream_torch_text(self, prompt_ids: List[int],
+                           cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """Run model.generate on a helper thread and yield its text through a streamer"""
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        # Stops generation when the consumer stops reading, as well as on cancel
+        abandoned = threading.Event()
+        criteria = [_CancelCriteria(abandoned)]
+        if cancel_event is not None:
+            criteria.append(_CancelCriteria(cancel_event))
+        input_ids = torch.tensor([prompt_ids], dtype=torch.long)
+        kwargs = dict(
+            attention_mask=torch.ones_like(input_ids),
+            pad_token_id=self.tokenizer.pad_token_id,
+            eos_token_id=self.tokenizer.eos_token_id,
+            stopping_criteria=StoppingCriteriaList(criteria),
+            streamer=streamer,
+            **self.GENERATION_KWARGS
+        )
+
+        def generate():
+            try:
+                with torch.no_grad():
+                    self.model.generate(input_ids, **kwargs)
+            except Exception:
+                logger.exception("Streaming generation failed")
+                ERRORS.labels("local_model").inc()
+                streamer.end()
+
+        worker = threading.Thread(target=contextvars.copy_context().run, args=(generate,),
+                                  name="local-generate", daemon=True)
+        worker.start()
+        try:
+            for text in streamer:
+                if text:
+                    yield text
+        finally:
+            abandoned.set()
+            worker.join()
+
+    def _generate_pipeline_response(self, user_input: str, context: List[Dict], user_profile: Dict,
+                                    personality_name: str = None) -> str:
         """Generate using pipeline (safer for M1)"""
         try:
             # Build conversation context
-            prompt = self._build_conversation_context(user_input, context, user_profile)
+            with stage("prompt_build"):
+                prompt = self._build_conversation_context(user_input, context, user_profile, personality_name)
 
-            result = self.generator(
-                prompt,
-                max_new_tokens=40,
-                temperature=0.8,
-                do_sample=True,
-                return_full_text=False,
-                pad_token_id=50256  # GPT-2 pad token
-            )
+            with stage("inference"):
+                result = self.generator(
+                    prompt,
+                    max_new_tokens=40,
+                    temperature=0.8,
+                    do_sample=True,
+                    return_full_text=False,
+                    pad_token_id=50256  # GPT-2 pad token
+                )
 
             response = result[0]['generated_text'].strip()
             response = self._clean_ai_response(response, user_input)
 
             if len(response) > 3:
-                print(f"🧠 Pipeline generated: {response}")
+                logger.debug("Pipeline reply: %s", response)
                 return response
             else:
                 return f"That's interesting about '{user_input}'. Tell me more!"
 
-        except Exception as e:
-            print(f"❌ Pipeline generation error: {e}")
+        except Exception:
+            logger.exception("Pipeline generation failed")
+            ERRORS.labels("local_model").inc()
             return f"You mentioned '{user_input}' - I'd love to hear your thoughts on that!"
 
-    def _generate_direct_response(self, user_input: str, context: List[Dict], user_profile: Dict) -> str:
+    def _generate_direct_response(self, user_input: str, context: List[Dict], user_profile: Dict,
+                                  personality_name: str = None,
+                                  cancel_event: Optional[threading.Event] = None) -> str:
         """Generate response using direct model access"""
         try:
-            # Build intelligent conversation prompt
-            prompt = self._build_conversation_context(user_input, context, user_profile)
-            print(f"🧠 AI Prompt: {prompt[:100]}...")
-
-            # Encode with proper attention mask
-            encoded = self.tokenizer(
-                prompt,
-                return_tensors='pt',
-                padding=True,
-                truncation=True,
-                max_length=400
+            # Assemble prompt from cached token ids within the token budget
+            header = self._build_conversation_header(user_profile, personality_name)
+            prompt_ids = self.prompt_builder.build(
+                header, self._prior_context(context, user_input), user_input
             )
+            logger.debug("Prompt: %d tokens", len(prompt_ids))
 
-            # Generate with good parameters for conversation
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    encoded['input_ids'],
-                    attention_mask=encoded['attention_mask'],
-                    max_new_tokens=50,
-                    min_new_tokens=5,
-                    temperature=0.8,
-                    top_p=0.9,
-                    top_k=50,
-                    do_sample=True,
-                    pad_token_id=self.tokenizer.pad_token_id,
-                    eos_token_id=self.tokenizer.eos_token_id,
-                    repetition_penalty=1.1,
-                    no_repeat_ngram_size=3
-                )
-
-            # Decode the response
-            full_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-
-            # Extract just the AI's response
-            ai_response = self._extract_ai_response(full_text, prompt)
+            new_ids = self._generate_ids(prompt_ids, cancel_event)
+            if cancel_event is not None and cancel_event.is_set():
+                return ""
+            ai_response = self.tokenizer.decode(new_ids, skip_special_tokens=True).strip()
 
-            print(f"🧠 AI Generated: {ai_response}")
+            logger.debug("Generated: %s", ai_response)
 
             # Validate and clean the response
             cleaned_response = self._clean_ai_response(ai_response, user_input)
 
             if len(cleaned_response.strip()) < 3:
-                print("⚠️ AI response too short, regenerating...")
+                logger.debug("Reply too short, regenerating")
                 return self._regenerate_response(user_input, context, user_profile)
 
             return cleaned_response
 
-        except Exception as e:
-            print(f"❌ Direct AI generation error: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Direct generation failed")
+            ERRORS.labels("local_model").inc()
             return "I'm having trouble with my AI processing right now. Could you try rephrasing that?"
 
-    def _build_conversation_context(self, user_input: str, context: List[Dict], user_profile: Dict) -> str:
-        """Build intelligent conversation prompt"""
+    @stage("inference")
+    def _generate_ids(self, prompt_ids: List[int],
+                      cancel_event: Optional[threading.Event] = None) -> List[int]:
+        """Generate new token ids with the configured backend, stopping early if cancelled"""
+        if self.onnx_generator is not None:
+            new_ids = []
+            for token in self.onnx_generator.generate_tokens(
+                prompt_ids,
+                eos_token_id=self.tokenizer.eos_token_id,
+                **self.GENERATION_KWARGS
+            ):
+                new_ids.append(token)
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+            return new_ids
+
+        extra = {}
+        if cancel_event is not None:
+            extra["stopping_criteria"] = StoppingCriteriaList([_CancelCriteria(cancel_event)])
+
+        input_ids = torch.tensor([prompt_ids], dtype=torch.long)
+        with torch.no_grad():
+            outputs = self.model.generate(
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                pad_token_id=self.tokenizer.pad_token_id,
+                eos_token_id=self.tokenizer.eos_token_id,
+                **self.GENERATION_KWARGS,
+                **extra
+            )
+
+        # Keep only the newly generated tokens
+        return outputs[0][len(prompt_ids):].tolist()
+
+    def _on_personalities_changed(self, changed):
+        # Headers embed personality descriptions; edited ones would only linger in the cache
+        if self.prompt_builder is not None:
+            self.prompt_builder.clear_headers()
+
+    def _build_conversation_header(self, user_profile: Dict, personality_name: str = None) -> str:
+        """Build the personality/user header that opens every prompt"""
 
         # Get personality info
-        personality = self.personality_manager.get_personality(self.current_personality)
+        personality = self.personality_manager.get_personality(personality_name or self.current_personality)
         personality_desc = personality.get("description", "helpful and friendly")
 
-        # Build context-aware prompt
         if user_profile.get("name"):
-            prompt = f"This is a conversation between {user_profile['name']} and an AI assistant.\n"
+            header = f"This is a conversation between {user_profile['name']} and an AI assistant.\n"
         else:
-            prompt = "This is a conversation between a human and an AI assistant.\n"
+            header = "This is a conversation between a human and an AI assistant.\n"
+
+        header += f"The AI is {personality_desc} and responds naturally.\n\n"
+        return header
 
-        prompt += f"The AI is {personality_desc} and responds naturally.\n\n"
+    def _prior_context(self, context: List[Dict], user_input: str) -> List[Dict]:
+        """Drop the current message if it is already the newest stored one"""
+        if context and context[-1]['role'] == "user" and context[-1]['message'] == user_input:
+            return context[:-1]
+        return context
+
+    def _build_conversation_context(self, user_input: str, context: List[Dict], user_profile: Dict,
+                                    personality_name: str = None) -> str:
+        """Build intelligent conversation prompt"""
+
+        # Build context-aware prompt
+        prompt = self._build_conversation_header(user_profile, personality_name)
 
         # Add recent context
         if context:
-            for msg in context[-3:]:
-                role = "Human" if msg['role'] == "user" else "AI"
-                prompt += f"{role}: {msg['message']}\n"
+            for msg in self._prior_context(context, user_input)[-3:]:
+                prompt += PromptBuilder.format_line(msg['role'], msg['message'])
 
         # Add current input
         prompt += f"Human: {user_input}\n"
@@ -391,26 +789,32 @@ class ConvoAIBrain:
         except:
             return f"You mentioned '{user_input}' - I'd love to hear more about your thoughts on that!"
 
-    def _update_user_profile(self, user_id: str, user_input: str):
-        """Update user profile based on conversation"""
+    def _update_user_profile(self, user_id: str, user_input: str, user_profile: Dict = None):
+        """Update user profile based on conversation, writing only what changed"""
+        hits = default_extractor.extract(user_input)
+        profile = user_profile or {}
 
         # Extract name
-        name_patterns = ["my name is", "i'm", "call me", "i am"]
-        for pattern in name_patterns:
-            if pattern in user_input.lower():
-                words = user_input.lower().split(pattern)[-1].strip().split()
-                if words:
-                    name = words[0].title()
-                    if len(name) > 1 and name.isalpha():
-                        self.memory.update_user_name(user_id, name)
-                        break
-
-        # Extract interests
-        interest_patterns = ["i love", "i like", "i enjoy", "interested in", "my hobby"]
-        for pattern in interest_patterns:
-            if pattern in user_input.lower():
-                self.memory.add_user_interest(user_id, user_input)
-                break
+        if hits.name and hits.name != profile.get("name"):
+            self.memory.update_user_name(user_id, hits.name)
+
+        # Extract interests (already extracted above: memory gets them, not the raw text)
+        if hits.has_interest_trigger and hits.interests:
+            known = profile.get("interests") or []
+            new_interests = [interest for interest in hits.interests if interest not in known]
+            if new_interests:
+                self.memory.add_user_interests(user_id, new_interests,
+                                               known if user_profile is not None else None)
+
+    def get_fallback(self, personality_name: str = None, reason: str = "no_reply") -> str:
+        """Get a quick canned reply in the current personality's voice"""
+        FALLBACKS.labels(reason).inc()
+        with stage("fallback"):
+            personality = self.personality_manager.get_personality(personality_name or self.current_personality)
+            responses = personality.get("responses")
+            if responses:
+                return random.choice(responses)
+            return "I'm a bit busy right now. Could you try again in a moment?"
 
     def switch_personality(self, personality_name: str):
         """Switch to different personality"""
@@ -0,0 +1,152 @@
+"""
+ConvoAI Circuit Breaker - Skip a failing backend instead of waiting on it
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Track a backend's errors and latency and short-circuit calls while it is down.
+
+    CLOSED: calls go through. After failure_threshold consecutive failures
+    (errors, or calls slower than slow_call_threshold) the breaker OPENs and
+    callers go straight to their fallback. While open, a background thread
+    runs the health probe every probe_interval seconds once recovery_timeout
+    has passed; when it succeeds the breaker goes HALF_OPEN and lets a single
+    trial call through. A successful trial closes the breaker, a failed one
+    opens it again.
+    """
+
+    def __init__(self, name: str = "backend", failure_threshold: int = 3,
+                 recovery_timeout: float = 5.0, probe: Optional[Callable[[], Any]] = None,
+                 probe_interval: float = 2.0, slow_call_threshold: float = 0.0,
+                 window: int = 100):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.probe = probe
+        self.probe_interval = probe_interval
+        self.slow_call_threshold = slow_call_threshold
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._probe_thread: Optional[threading.Thread] = None
+        self._outcomes = deque(maxlen=window)  # (ok, latency) of recent calls
+        self._counters = {"calls": 0, "failures": 0, "short_circuited": 0, "trips": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow_request(self) -> bool:
+        """True if a call may go to the backend now"""
+        with self._lock:
+            if self._state == OPEN and self.probe is None:
+                # No health probe: move to half-open on the recovery timer alone
+                if time.monotonic() - self._opened_at >= self.recovery_timeout:
+                    self._state = HALF_OPEN
+
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+
+            self._counters["short_circuited"] += 1
+            return False
+
+    def record_success(self, latency: float):
+        """Report a completed call and how long it took"""
+        if self.slow_call_threshold and latency > self.slow_call_threshold:
+            self.record_failure(latency)
+            return
+        with self._lock:
+            self._counters["calls"] += 1
+            self._outcomes.append((True, latency))
+            self._consecutive_failures = 0
+            self._trial_in_flight = False
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                logger.info("%s circuit closed - backend recovered", self.name)
+
+    def record_failure(self, latency: Optional[float] = None):
+        """Report a failed (or too slow) call"""
+        with self._lock:
+            self._counters["calls"] += 1
+            self._counters["failures"] += 1
+            self._outcomes.append((False, latency))
+            self._consecutive_failures += 1
+            self._trial_in_flight = False
+            if self._state == HALF_OPEN or (
+                self._state == CLOSED and self._consecutive_failures >= self.failure_threshold
+            ):
+                self._trip()
+
+    def release(self):
+        """Give back a trial slot without a verdict (e.g. the caller went away)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def _trip(self):
+        """Open the circuit and start probing for recovery (lock held)"""
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._counters["trips"] += 1
+        logger.warning("%s circuit open after %d failures - using fallbacks",
+                       self.name, self._consecutive_failures)
+
+        if self.probe is not None and not (self._probe_thread and self._probe_thread.is_alive()):
+            self._probe_thread = threading.Thread(
+                target=self._probe_loop, name=f"{self.name}-health-probe", daemon=True
+            )
+            self._probe_thread.start()
+
+    def _probe_loop(self):
+        """Background health checks while open; half-open on the first success"""
+        time.sleep(self.recovery_timeout)
+        while True:
+            with self._lock:
+                if self._state != OPEN:
+                    return
+            try:
+                self.probe()
+            except Exception:
+                time.sleep(self.probe_interval)
+                continue
+
+            with self._lock:
+                if self._state == OPEN:
+                    self._state = HALF_OPEN
+                    self._trial_in_flight = False
+            return
+
+    def stats(self) -> Dict[str, Any]:
+        """State, counters, recent error rate and latency"""
+        with self._lock:
+            outcomes = list(self._outcomes)
+            stats = dict(self._counters)
+            stats.update({
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "open_for_s": round(time.monotonic() - self._opened_at, 1) if self._state != CLOSED else 0.0,
+            })
+
+        latencies = sorted(latency for ok, latency in outcomes if ok)
+        stats["error_rate"] = round(sum(1 for ok, _ in outcomes if not ok) / len(outcomes), 3) if outcomes else 0.0
+        stats["latency_p50_ms"] = round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None
+        stats["latency_p95_ms"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1) if latencies else None
+        return stats
@@ -0,0 +1,163 @@
+"""
+ConvoAI Intent Router - Precompiled fast path for canned personality replies
+"""
+
+import random
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .metrics import CANNED_REPLIES
+
+# Used for a personality's "greetings" pool when it defines no explicit greeting intent
+GREETING_PATTERNS = ["hello", "hi", "hey", "hiya", "howdy", "greetings", "yo",
+                     "good morning", "good afternoon", "good evening"]
+GREETING_MAX_WORDS = 4
+
+
+class Intent(NamedTuple):
+    name: str
+    patterns: List[str]
+    responses: List[str]
+    max_words: Optional[int]  # longer messages go to the model even if a pattern matches
+
+
+def _phrase_pattern(phrase: str) -> str:
+    """Regex for a phrase as whole words, tolerant of extra spaces"""
+    words = [re.escape(word) for word in phrase.lower().split()]
+    return r"(?<!\w)" + r"\s+".join(words) + r"(?!\w)"
+
+
+class IntentRouter:
+    """Match messages to canned intents, one compiled regex per personality.
+
+    Rules come from each personality's "intents" section in
+    personalities.json, plus a greeting intent built from its "greetings"
+    pool. Every intent becomes a named group of a single alternation, so a
+    message is scanned once no matter how many intents a personality has.
+    Hits are counted per personality and intent; misses are messages that
+    still need the model.
+    """
+
+    def __init__(self):
+        self._intents: Dict[str, List[Intent]] = {}
+        self._matchers: Dict[str, Tuple[re.Pattern, Dict[str, Intent]]] = {}
+        self._lock = threading.Lock()
+        self._hits = Counter()
+        self._misses = 0
+
+    @classmethod
+    def from_personalities(cls, personalities: Dict[str, Any]) -> "IntentRouter":
+        """Build and compile a router from personality definitions"""
+        router = cls()
+        for personality_name, config in personalities.items():
+            router.load_personality(personality_name, config)
+        router.compile()
+        return router
+
+    def load_personality(self, personality_name: str, config: Dict[str, Any]):
+        """Register the intents defined by one personality config"""
+        intents = config.get("intents", {})
+        for name, rule in intents.items():
+            self.add_intent(personality_name, name, rule.get("patterns", [name]),
+                            rule.get("responses", []), rule.get("max_words"))
+        if "greeting" not in intents and config.get("greetings"):
+            self.add_intent(personality_name, "greeting", GREETING_PATTERNS,
+                            config["greetings"], GREETING_MAX_WORDS)
+
+    def reload_personalities(self, personalities: Dict[str, Any], names: Iterable[str]):
+        """Rebuild only the named personalities' intents from their current configs"""
+        for personality_name in names:
+            # Built aside and swapped in, so matching never sees a half-loaded personality
+            fresh = IntentRouter()
+            if personality_name in personalities:
+                fresh.load_personality(personality_name, personalities[personality_name])
+            intents = fresh._intents.get(personality_name)
+            with self._lock:
+                if intents:
+                    self._intents[personality_name] = intents
+                else:
+                    self._intents.pop(personality_name, None)
+                self._matchers.pop(personality_name, None)
+            self._matcher(personality_name)
+
+    def add_intent(self, personality_name: str, name: str, patterns: Iterable[str],
+                   responses: Iterable[str], max_words: Optional[int] = None):
+        """Add (or replace) an intent; the personality is recompiled on next use"""
+        intent = Intent(name, list(patterns), list(responses), max_words)
+        if not intent.patterns or not intent.responses:
+            return
+        with self._lock:
+            intents = [i for i in self._intents.get(personality_name, []) if i.name != name]
+            intents.append(intent)
+            self._intents[personality_name] = intents
+            self._matchers.pop(personality_name, None)
+
+    def compile(self):
+        """Compile the matcher for every personality now rather than on first message"""
+        for personality_name in list(self._intents):
+            self._matcher(personality_name)
+
+    def _matcher(self, personality_name: str):
+        matcher = self._matchers.get(personality_name)
+        if matcher is not None:
+            return matcher
+        with self._lock:
+            intents = self._intents.get(personality_name)
+            if not intents:
+                return None
+            groups = {}
+            alternatives = []
+            for index, intent in enumerate(intents):
+                group = f"i{index}"
+                groups[group] = intent
+                alternatives.append(
+                    f"(?P<{group}>" + "|".join(_phrase_pattern(p) for p in intent.patterns) + ")"
+                )
+            matcher = (re.compile("|".join(alternatives)), groups)
+            self._matchers[personality_name] = matcher
+            return matcher
+
+    def match(self, personality_name: str, text: str) -> Optional[Intent]:
+        """The first intent matching the message, or None"""
+        matcher = self._matcher(personality_name)
+        if matcher is not None:
+            pattern, groups = matcher
+            text = text.lower()
+            word_count = None
+            for found in pattern.finditer(text):
+                intent = groups[found.lastgroup]
+                if intent.max_words is not None:
+                    if word_count is None:
+                        word_count = len(text.split())
+                    if word_count > intent.max_words:
+                        continue
+                with self._lock:
+                    self._hits[(personality_name, intent.name)] += 1
+                CANNED_REPLIES.labels(personality_name).inc()
+                return intent
+
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def respond(self, personality_name: str, text: str) -> Optional[str]:
+        """A canned reply for the message, or None if it needs the model"""
+        intent = self.match(personality_name, text)
+        return random.choice(intent.responses) if intent else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-intent hit counts and how much traffic skipped the model"""
+        with self._lock:
+            hits = {f"{personality}/{intent}": count
+                    for (personality, intent), count in self._hits.most_common()}
+            misses = self._misses
+        total_hits = sum(hits.values())
+        total = total_hits + misses
+        return {
+            "hits": hits,
+            "total_hits": total_hits,
+            "misses": misses,
+            "hit_rate": round(total_hits / total, 3) if total else 0.0,
+        }
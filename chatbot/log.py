@@ -0,0 +1,110 @@
+"""
+ConvoAI Logging - Leveled, structured logging written by a background thread
+
+Modules log through logging.getLogger(__name__) with %-style arguments.
+Records below the configured level cost a level check; the rest are put
+on a queue as they are, and one listener thread formats and writes them,
+so request threads never block on a slow terminal or pipe.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Optional, TextIO
+
+from config.settings import Settings
+from . import tracing
+
+# LogRecord attributes; anything else on a record came from extra={...}
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue records unformatted: %-formatting happens on the listener thread.
+
+    The stock QueueHandler formats in the caller so records can be pickled;
+    an in-process queue doesn't need that. Only tag the request id, which
+    lives in the caller's context. Don't mutate objects after logging them.
+    """
+
+    def prepare(self, record):
+        trace = tracing.current()
+        if trace is not None:
+            record.request_id = trace.request_id
+        return record
+
+
+class StructuredFormatter(logging.Formatter):
+    """`time LEVEL logger: message key=value ...`, or one JSON object per line"""
+
+    def __init__(self, json_lines: bool = False):
+        super().__init__()
+        self.json_lines = json_lines
+
+    def format(self, record):
+        message = record.getMessage()
+        fields = {key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS}
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+
+        if self.json_lines:
+            payload = {"ts": round(record.created, 3), "level": record.levelname,
+                       "logger": record.name, "msg": message, **fields}
+            if record.exc_text:
+                payload["exc"] = record.exc_text
+            return json.dumps(payload, default=str)
+
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+        line = f"{stamp}.{int(record.msecs):03d} {record.levelname:<7} {record.name}: {message}"
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+def configure_logging(level: Optional[str] = None, stream: Optional[TextIO] = None,
+                      json_lines: Optional[bool] = None) -> logging.handlers.QueueListener:
+    """Send all logging through a queue to one writer thread (once per process)"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+        writer = logging.StreamHandler(stream or sys.stderr)
+        writer.setFormatter(StructuredFormatter(
+            Settings.LOG_FORMAT == "json" if json_lines is None else json_lines
+        ))
+        # Skip per-record work the formatter never shows (see "Optimization" in the logging HOWTO)
+        logging._srcfile = None
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
+        records = queue.SimpleQueue()
+        root = logging.getLogger()
+        root.addHandler(_DeferredQueueHandler(records))
+        root.setLevel((level or Settings.LOG_LEVEL).upper())
+        _listener = logging.handlers.QueueListener(records, writer)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _listener
+
+
+def stop_logging():
+    """Write out everything still queued and stop the writer thread"""
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if isinstance(handler, _DeferredQueueHandler):
+                root.removeHandler(handler)
+        _listener = None
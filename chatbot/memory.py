@@ -4,25 +4,50 @@ ConvoAI Memory System - Conversation memory and user profiles
 
 import sqlite3
 import json
+import logging
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 import os
+from .profile_extractor import default_extractor
+from .metrics import stage
 
+logger = logging.getLogger(__name__)
 
 class ConversationMemory:
-    def __init__(self, db_path: str = "data/conversations.db"):
+    # Seconds a writer waits for another process's write lock before failing
+    BUSY_TIMEOUT = 10.0
+
+    def __init__(self, db_path: str = "data/conversations.db", wal: bool = False):
         self.db_path = db_path
+        self._evict_listeners = []
         self._ensure_data_directory()
+        if wal:
+            self._enable_wal()
         self._initialize_database()
-        print("💾 Memory system initialized!")
+        logger.info("SQLite memory ready at %s", self.db_path)
+
+    def add_evict_listener(self, callback):
+        """Call callback(user_id) after a user's data is cleared"""
+        self._evict_listeners.append(callback)
 
     def _ensure_data_directory(self):
         """Create data directory if it doesn't exist"""
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
 
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection that waits on locks held by other processes"""
+        return sqlite3.connect(self.db_path, timeout=self.BUSY_TIMEOUT)
+
+    def _enable_wal(self):
+        """Write-ahead logging: readers don't block the writer, so several
+        server processes can share one database file (the mode is persistent)"""
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+
     def _initialize_database(self):
         """Initialize SQLite database with required tables"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
 
             # Conversations table
@@ -103,24 +128,34 @@ class ConversationMemory:
                                )
                            ''')
 
+            # Per-user history reads (recent context, transcript paging) walk this index
+            cursor.execute('''
+                           CREATE INDEX IF NOT EXISTS idx_conversations_user
+                               ON conversations (user_id, id)
+                           ''')
+
             conn.commit()
 
-    def add_message(self, user_id: str, role: str, message: str, session_id: str = None):
-        """Add a message to conversation history"""
-        with sqlite3.connect(self.db_path) as conn:
+    @stage("memory_write")
+    def add_message(self, user_id: str, role: str, message: str, session_id: str = None) -> int:
+        """Add a message to conversation history; returns its id"""
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                            INSERT INTO conversations (user_id, role, message, session_id)
                            VALUES (?, ?, ?, ?)
                            ''', (user_id, role, message, session_id))
+            message_id = cursor.lastrowid
             conn.commit()
 
         # Update user's last seen time
         self._update_user_last_seen(user_id)
+        return message_id
 
+    @stage("memory_read")
     def get_recent_context(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent conversation context for a user"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                            SELECT role, message, timestamp
@@ -140,9 +175,47 @@ class ConversationMemory:
 
             return list(reversed(messages))  # Return in chronological order
 
+    @stage("memory_read")
+    def get_messages_before(self, user_id: str, before_id: Optional[int] = None,
+                            limit: int = 50) -> List[Dict[str, Any]]:
+        """One page of history older than before_id (newest page if None), oldest first.
+
+        Keyset pagination on the (user_id, id) index: each page costs the
+        same however far back it is, unlike LIMIT/OFFSET.
+        """
+        if before_id is None:
+            before_id = 2 ** 63 - 1
+        with self._connect() as conn:
+            rows = conn.execute('''
+                                SELECT id, role, message, timestamp
+                                FROM conversations
+                                WHERE user_id = ? AND id < ?
+                                ORDER BY id DESC
+                                    LIMIT ?
+                                ''', (user_id, before_id, limit)).fetchall()
+        return [self._history_row(row) for row in reversed(rows)]
+
+    @stage("memory_read")
+    def get_messages_after(self, user_id: str, after_id: int, limit: int = 50) -> List[Dict[str, Any]]:
+        """One page of history newer than after_id, oldest first"""
+        with self._connect() as conn:
+            rows = conn.execute('''
+                                SELECT id, role, message, timestamp
+                                FROM conversations
+                                WHERE user_id = ? AND id > ?
+                                ORDER BY id
+                                    LIMIT ?
+                                ''', (user_id, after_id, limit)).fetchall()
+        return [self._history_row(row) for row in rows]
+
+    @staticmethod
+    def _history_row(row) -> Dict[str, Any]:
+        return {'id': row[0], 'role': row[1], 'message': row[2], 'timestamp': row[3]}
+
+    @stage("memory_read")
     def get_user_profile(self, user_id: str) -> Dict[str, Any]:
         """Get user profile information"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                            SELECT name, interests, preferences, first_seen, last_seen
@@ -170,9 +243,10 @@ class ConversationMemory:
                     'last_seen': datetime.now().isoformat()
                 }
 
+    @stage("memory_write")
     def update_user_name(self, user_id: str, name: str):
         """Update user's name"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                            UPDATE user_profiles
@@ -183,69 +257,62 @@ class ConversationMemory:
 
             if cursor.rowcount == 0:
                 # User doesn't exist, create profile
-                self._create_user_profile(user_id, name=name)
+                self._create_user_profile(user_id, name=name, cursor=cursor)
 
             conn.commit()
 
     def add_user_interest(self, user_id: str, interest_text: str):
         """Extract and add user interests from text"""
-        profile = self.get_user_profile(user_id)
-        current_interests = profile.get('interests', [])
-
-        # Simple interest extraction (you could make this more sophisticated)
-        potential_interests = self._extract_interests(interest_text)
-
-        for interest in potential_interests:
-            if interest not in current_interests:
-                current_interests.append(interest)
+        self.add_user_interests(user_id, self._extract_interests(interest_text))
+
+    @stage("memory_write")
+    def add_user_interests(self, user_id: str, interests: List[str],
+                           current: Optional[List[str]] = None):
+        """Add already-extracted interests; current is the profile's list if the caller has it"""
+        if not interests:
+            return
+        if current is None:
+            current = self.get_user_profile(user_id).get('interests', [])
+        new_interests = [i for i in interests if i not in current]
+
+        # Nothing new: skip the write
+        if not new_interests:
+            return
 
         # Update profile
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                            UPDATE user_profiles
                            SET interests = ?,
                                last_seen = CURRENT_TIMESTAMP
                            WHERE user_id = ?
-                           ''', (json.dumps(current_interests), user_id))
+                           ''', (json.dumps(list(current) + new_interests), user_id))
             conn.commit()
 
     def _extract_interests(self, text: str) -> List[str]:
-        """Extract potential interests from text"""
-        interests = []
-        text_lower = text.lower()
-
-        # Common interest keywords and patterns
-        interest_patterns = {
-            'sports': ['football', 'soccer', 'basketball', 'tennis', 'swimming', 'running', 'gym'],
-            'technology': ['programming', 'coding', 'ai', 'machine learning', 'computers', 'software'],
-            'music': ['music', 'guitar', 'piano', 'singing', 'concerts', 'bands'],
-            'reading': ['books', 'reading', 'novels', 'literature'],
-            'cooking': ['cooking', 'baking', 'recipes', 'food'],
-            'travel': ['travel', 'traveling', 'vacation', 'countries'],
-            'movies': ['movies', 'films', 'cinema', 'netflix'],
-            'games': ['games', 'gaming', 'video games', 'board games']
-        }
-
-        for category, keywords in interest_patterns.items():
-            if any(keyword in text_lower for keyword in keywords):
-                interests.append(category)
-
-        return interests
-
-    def _create_user_profile(self, user_id: str, name: str = None):
-        """Create a new user profile"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        """Extract potential interests from text (word-boundary aware)"""
+        return default_extractor.extract_interests(text)
+
+    def _create_user_profile(self, user_id: str, name: str = None, cursor=None):
+        """Create a new user profile.
+
+        Callers inside a write transaction pass their cursor: a second
+        connection would wait on that transaction's lock until it times out.
+        """
+        if cursor is not None:
             cursor.execute('''
                 INSERT OR REPLACE INTO user_profiles (user_id, name, interests, preferences)
                 VALUES (?, ?, ?, ?)
             ''', (user_id, name, json.dumps([]), json.dumps({})))
+            return
+        with self._connect() as conn:
+            self._create_user_profile(user_id, name, conn.cursor())
             conn.commit()
 
     def _update_user_last_seen(self, user_id: str):
         """Update user's last seen timestamp"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                            UPDATE user_profiles
@@ -254,13 +321,14 @@ class ConversationMemory:
                            ''', (user_id,))
 
             if cursor.rowcount == 0:
-                self._create_user_profile(user_id)
+                self._create_user_profile(user_id, cursor=cursor)
 
             conn.commit()
 
+    @stage("memory_read")
     def get_conversation_stats(self, user_id: str) -> Dict[str, Any]:
         """Get conversation statistics for a user"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
 
             # Total messages
@@ -281,13 +349,19 @@ class ConversationMemory:
                 'has_history': total_messages > 0
             }
 
+    @stage("memory_write")
     def clear_user_data(self, user_id: str):
         """Clear all data for a specific user"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM conversations WHERE user_id = ?', (user_id,))
             cursor.execute('DELETE FROM user_profiles WHERE user_id = ?', (user_id,))
             cursor.execute('DELETE FROM personality_memory WHERE user_id = ?', (user_id,))
             conn.commit()
 
-        print(f"🗑️ Cleared all data for user: {user_id}")
\ No newline at end of file
+        logger.info("Cleared all data for user %s", user_id)
+        for callback in self._evict_listeners:
+            try:
+                callback(user_id)
+            except Exception:
+                logger.exception("User eviction listener failed")
\ No newline at end of file
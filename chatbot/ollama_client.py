@@ -0,0 +1,143 @@
+"""
+ConvoAI Ollama Client - Pooled keep-alive HTTP access to the Ollama server
+"""
+
+import json
+import random
+import time
+from typing import Any, Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, MaxRetryError, NewConnectionError
+
+# Gateway-style statuses worth retrying for idempotent (GET) calls
+_RETRY_STATUSES = {502, 503, 504}
+
+
+def _never_sent(error: requests.exceptions.RequestException) -> bool:
+    """True if the request failed before reaching the server (connect refused or timed out).
+
+    requests raises ConnectionError for these and also for a connection
+    dropped mid-response, after Ollama may already have done the work; only
+    urllib3's pre-send errors (in e.args[0]) make a POST safe to resend.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError) or not error.args:
+        return False
+    reason = error.args[0]
+    if isinstance(reason, MaxRetryError):
+        reason = reason.reason
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+class OllamaClient:
+    """Shared HTTP client for the Ollama API.
+
+    One requests.Session with a sized connection pool is reused for every
+    call, so chat turns ride on kept-alive connections instead of opening a
+    new TCP connection each time. The session is configured once and never
+    mutated afterwards; urllib3's pool hands each thread its own connection,
+    so a single client can be shared by all Flask worker threads.
+
+    Requests that never reached the server (connection refused, connect
+    timeout) are retried with full-jitter exponential backoff. Anything
+    else (read timeouts, dropped responses, 502/503/504) is only retried
+    for GET calls: the server may already be generating, and resending
+    would double the load on a busy server.
+
+    With OLLAMA_ASYNC, non-streaming generate() goes through
+    AsyncOllamaClient, which applies the same rule to its own requests;
+    this client's retries then cover streaming, preload and tags.
+    """
+
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "tinyllama",
+                 pool_size: int = 8, connect_timeout: float = 2.0, read_timeout: float = 10.0,
+                 retries: int = 2, backoff: float = 0.1):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+
+    def generate(self, prompt: str, options: Optional[Dict[str, Any]] = None,
+                 **fields) -> Dict[str, Any]:
+        """Run a non-streaming /api/generate call and return the decoded JSON"""
+        payload = {"model": self.model, "prompt": prompt, "stream": False}
+        if options:
+            payload["options"] = options
+        payload.update(fields)
+
+        response = self._request("POST", "/api/generate", idempotent=False, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    def generate_stream(self, prompt: str, options: Optional[Dict[str, Any]] = None,
+                        **fields) -> Iterator[Dict[str, Any]]:
+        """Run a streaming /api/generate call, yielding each NDJSON chunk as it arrives"""
+        payload = {"model": self.model, "prompt": prompt, "stream": True}
+        if options:
+            payload["options"] = options
+        payload.update(fields)
+
+        response = self._request("POST", "/api/generate", idempotent=False, json=payload, stream=True)
+        try:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                yield chunk
+                if chunk.get("done"):
+                    break
+        finally:
+            # Closing early also tells Ollama to stop generating
+            response.close()
+
+    def preload(self, keep_alive: Optional[str] = None, load_timeout: float = 120.0) -> Dict[str, Any]:
+        """Load the model into memory without generating (a generate call with no prompt)"""
+        payload = {"model": self.model}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        # Loading from disk can take far longer than a normal read timeout
+        response = self._request("POST", "/api/generate", idempotent=False, json=payload,
+                                 timeout=(self.timeout[0], load_timeout))
+        response.raise_for_status()
+        return response.json()
+
+    def tags(self) -> Dict[str, Any]:
+        """List locally available models (cheap health check)"""
+        response = self._request("GET", "/api/tags", idempotent=True)
+        response.raise_for_status()
+        return response.json()
+
+    def _request(self, method: str, path: str, idempotent: bool, **kwargs) -> requests.Response:
+        """Send a request, retrying safe failures with jittered backoff"""
+        url = f"{self.base_url}{path}"
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, **kwargs)
+                if not (idempotent and response.status_code in _RETRY_STATUSES and attempt < self.retries):
+                    return response
+                response.close()
+            except requests.exceptions.RequestException as e:
+                # Read timeouts, dropped responses: the server may still be working on it
+                if attempt >= self.retries or not (idempotent or _never_sent(e)):
+                    raise
+
+            # Full jitter: sleep a random slice of the exponential window
+            time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+            attempt += 1
+
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
@@ -0,0 +1,259 @@
+"""
+ConvoAI ONNX Backend - ONNX Runtime decode loop for the local model
+"""
+
+import inspect
+import logging
+import os
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+    import onnxruntime as ort
+
+    HAS_ONNXRUNTIME = True
+except ImportError:
+    HAS_ONNXRUNTIME = False
+
+logger = logging.getLogger(__name__)
+
+
+class OnnxGenerator:
+    """Serve a GPT-2 style causal LM through ONNX Runtime.
+
+    The model is exported once with past-key-value inputs/outputs and cached
+    on disk. Decoding feeds only the newest token each step and keeps the
+    key/value cache as ONNX Runtime values bound through IO binding, so it
+    is never copied back into numpy between steps.
+    """
+
+    def __init__(self, model, model_name: str, cache_dir: str = "data/onnx",
+                 threads: int = 0, seed: Optional[int] = None):
+        config = model.config
+        self.n_layer = config.n_layer
+        self.n_head = config.n_head
+        self.head_dim = config.n_embd // config.n_head
+
+        safe_name = model_name.replace("/", "_")
+        self.model_path = os.path.join(cache_dir, f"{safe_name}-v{config.vocab_size}-with-past.onnx")
+        if not os.path.exists(self.model_path):
+            logger.info("Exporting %s to ONNX (one time)", model_name)
+            os.makedirs(cache_dir, exist_ok=True)
+            self._export(model, self.model_path)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            self.model_path, options, providers=["CPUExecutionProvider"]
+        )
+
+        self.past_names = [f"past.{i}.{kind}" for i in range(self.n_layer) for kind in ("key", "value")]
+        self.output_names = [output.name for output in self.session.get_outputs()]
+        self.rng = np.random.default_rng(seed)
+
+    def _export(self, model, path: str):
+        """Export the model with flattened past-key-value inputs and outputs"""
+        import torch
+
+        wrapper = _decoder_with_past(model).eval()
+        past_len, seq_len = 2, 3
+        dummy_ids = torch.ones((1, seq_len), dtype=torch.long)
+        dummy_mask = torch.ones((1, past_len + seq_len), dtype=torch.long)
+        dummy_positions = torch.arange(past_len, past_len + seq_len, dtype=torch.long).unsqueeze(0)
+        dummy_past = [
+            torch.zeros((1, self.n_head, past_len, self.head_dim), dtype=torch.float32)
+            for _ in range(2 * self.n_layer)
+        ]
+
+        past_names = [f"past.{i}.{kind}" for i in range(self.n_layer) for kind in ("key", "value")]
+        present_names = [f"present.{i}.{kind}" for i in range(self.n_layer) for kind in ("key", "value")]
+        dynamic_axes = {
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "total_sequence"},
+            "position_ids": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch", 1: "sequence"},
+        }
+        for name in past_names:
+            dynamic_axes[name] = {0: "batch", 2: "past_sequence"}
+        for name in present_names:
+            dynamic_axes[name] = {0: "batch", 2: "total_sequence"}
+
+        export_kwargs = {}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            export_kwargs["dynamo"] = False
+
+        tmp_path = path + ".tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                wrapper,
+                (dummy_ids, dummy_mask, dummy_positions, *dummy_past),
+                tmp_path,
+                input_names=["input_ids", "attention_mask", "position_ids", *past_names],
+                output_names=["logits", *present_names],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+                **export_kwargs
+            )
+        os.replace(tmp_path, path)
+
+    def generate(self, prompt_ids: List[int], **kwargs) -> List[int]:
+        """Generate new token ids for a prompt (same parameters as model.generate)"""
+        return list(self.generate_tokens(prompt_ids, **kwargs))
+
+    def generate_tokens(self, prompt_ids: List[int], max_new_tokens: int = 50,
+                        min_new_tokens: int = 0, temperature: float = 1.0,
+                        top_p: float = 1.0, top_k: int = 0,
+                        repetition_penalty: float = 1.0, no_repeat_ngram_size: int = 0,
+                        do_sample: bool = True, eos_token_id: Optional[int] = None,
+                        **_ignored) -> Iterator[int]:
+        """Yield new token ids one decode step at a time"""
+        sequence = list(prompt_ids)
+        total_len = len(sequence) + max_new_tokens
+        attention_mask = np.ones((1, total_len), dtype=np.int64)
+        seen = set(sequence)
+        banned_ngrams = _NgramIndex(no_repeat_ngram_size, sequence)
+
+        binding = self.session.io_binding()
+        past = [
+            ort.OrtValue.ortvalue_from_numpy(
+                np.zeros((1, self.n_head, 0, self.head_dim), dtype=np.float32)
+            )
+            for _ in self.past_names
+        ]
+        step_ids = np.asarray([sequence], dtype=np.int64)
+        past_len = 0
+
+        for step in range(max_new_tokens):
+            seq_len = step_ids.shape[1]
+            positions = np.arange(past_len, past_len + seq_len, dtype=np.int64)[None, :]
+
+            binding.bind_cpu_input("input_ids", step_ids)
+            binding.bind_cpu_input("attention_mask", attention_mask[:, :past_len + seq_len])
+            binding.bind_cpu_input("position_ids", positions)
+            for name, value in zip(self.past_names, past):
+                binding.bind_ortvalue_input(name, value)
+            for name in self.output_names:
+                binding.bind_output(name, "cpu")
+
+            self.session.run_with_iobinding(binding)
+            outputs = binding.get_outputs()
+            binding.clear_binding_inputs()
+            binding.clear_binding_outputs()
+
+            # Only the last position's logits are needed for the next token
+            logits = outputs[0].numpy()[0, -1].astype(np.float32, copy=True)
+            past = outputs[1:]
+            past_len += seq_len
+
+            token = self._next_token(
+                logits, seen, banned_ngrams.banned(sequence), step, min_new_tokens,
+                temperature, top_p, top_k, repetition_penalty, do_sample, eos_token_id
+            )
+            if eos_token_id is not None and token == eos_token_id:
+                return
+
+            sequence.append(token)
+            seen.add(token)
+            banned_ngrams.add(sequence)
+            yield token
+
+            step_ids = np.asarray([[token]], dtype=np.int64)
+
+    def _next_token(self, logits: "np.ndarray", seen: Set[int], banned: Set[int],
+                    step: int, min_new_tokens: int, temperature: float, top_p: float,
+                    top_k: int, repetition_penalty: float, do_sample: bool,
+                    eos_token_id: Optional[int]) -> int:
+        """Pick the next token, applying processors in model.generate's order"""
+        if repetition_penalty != 1.0 and seen:
+            ids = np.fromiter(seen, dtype=np.int64)
+            scores = logits[ids]
+            logits[ids] = np.where(scores < 0, scores * repetition_penalty, scores / repetition_penalty)
+        if banned:
+            logits[list(banned)] = -np.inf
+        if eos_token_id is not None and step < min_new_tokens:
+            logits[eos_token_id] = -np.inf
+
+        if not do_sample:
+            return int(np.argmax(logits))
+
+        # Top-k first so the remaining work runs on a handful of candidates
+        if 0 < top_k < logits.shape[0]:
+            candidates = np.argpartition(logits, -top_k)[-top_k:]
+        else:
+            candidates = np.arange(logits.shape[0])
+        scores = logits[candidates] / max(temperature, 1e-5)
+
+        order = np.argsort(-scores)
+        candidates, scores = candidates[order], scores[order]
+        probs = np.exp(scores - scores[0])
+        probs /= probs.sum()
+
+        if top_p < 1.0:
+            # Keep the smallest prefix whose mass reaches top_p (at least one token)
+            keep = int(np.searchsorted(np.cumsum(probs), top_p)) + 1
+            candidates, probs = candidates[:keep], probs[:keep]
+            probs = probs / probs.sum()
+
+        return int(candidates[self.rng.choice(len(candidates), p=probs)])
+
+
+class _NgramIndex:
+    """Track seen n-grams to block repeats (no_repeat_ngram_size)"""
+
+    def __init__(self, n: int, sequence: List[int]):
+        self.n = n
+        self.ngrams: Dict[Tuple[int, ...], Set[int]] = {}
+        if n > 0:
+            for end in range(n, len(sequence) + 1):
+                self._record(sequence[end - n:end])
+
+    def _record(self, ngram: List[int]):
+        self.ngrams.setdefault(tuple(ngram[:-1]), set()).add(ngram[-1])
+
+    def add(self, sequence: List[int]):
+        if self.n > 0 and len(sequence) >= self.n:
+            self._record(sequence[-self.n:])
+
+    def banned(self, sequence: List[int]) -> Set[int]:
+        if self.n <= 0 or len(sequence) < self.n - 1:
+            return set()
+        return self.ngrams.get(tuple(sequence[len(sequence) - self.n + 1:]), set())
+
+
+def _decoder_with_past(model):
+    """Wrap a causal LM so past key/values are flat positional inputs/outputs"""
+    import torch
+
+    try:
+        from transformers import DynamicCache
+    except ImportError:
+        DynamicCache = None
+
+    class DecoderWithPast(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, input_ids, attention_mask, position_ids, *past):
+            past_key_values = tuple((past[i], past[i + 1]) for i in range(0, len(past), 2))
+            if DynamicCache is not None and hasattr(DynamicCache, "from_legacy_cache"):
+                past_key_values = DynamicCache.from_legacy_cache(past_key_values)
+
+            outputs = self.inner(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                position_ids=position_ids,
+                past_key_values=past_key_values,
+                use_cache=True,
+                return_dict=True
+            )
+
+            presents = outputs.past_key_values
+            if hasattr(presents, "to_legacy_cache"):
+                presents = presents.to_legacy_cache()
+            flat = [tensor for layer in presents for tensor in layer]
+            return (outputs.logits, *flat)
+
+    return DecoderWithPast(model)
@@ -2,25 +2,153 @@
 ConvoAI Personality System - Different chatbot personalities
 """
 
+import hashlib
 import json
+import logging
 import os
-from typing import Dict, List, Any
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# Phrases for the canned "thanks"/"goodbye" intents (see intent_router.py)
+THANKS_PATTERNS = ["thank you", "thanks", "thank u", "thx", "ty", "much appreciated"]
+GOODBYE_PATTERNS = ["bye", "goodbye", "bye bye", "see you", "see ya", "good night", "farewell"]
 
 
 class PersonalityManager:
-    def __init__(self, personalities_file: str = "data/personalities.json"):
+    """Personality configs from a JSON file, picked up again when the file changes.
+
+    Use PersonalityManager.shared() so every brain and page in the process
+    reads one parsed copy. Reads stat the file at most once per
+    check_interval and only re-read it when its mtime or size moved; the
+    contents are hashed so a touch without an edit changes nothing. A real
+    change swaps in a new dict, bumps version and calls the listeners with
+    the names that were added, changed or removed. Writes go to a temp
+    file renamed over the original, so readers never see half a file.
+    """
+
+    _shared: Dict[str, "PersonalityManager"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, personalities_file: str = Settings.PERSONALITIES_FILE,
+                 check_interval: float = Settings.PERSONALITIES_CHECK_INTERVAL):
         self.personalities_file = personalities_file
-        self.personalities = self._load_personalities()
-        print("🎭 Personality system loaded!")
+        self.check_interval = check_interval
+        # Bumped on every change so caches built from personalities know to rebuild
+        self._version = 0
+        self._listeners: List[Callable[[Set[str]], None]] = []
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._digest: Optional[str] = None
+        self._next_check = 0.0
+        self._personalities = self._load_personalities()
+        logger.debug("Loaded %d personalities", len(self._personalities))
+
+    @classmethod
+    def shared(cls, personalities_file: str = Settings.PERSONALITIES_FILE) -> "PersonalityManager":
+        """The process-wide manager for a personalities file"""
+        key = os.path.abspath(personalities_file)
+        with cls._shared_lock:
+            manager = cls._shared.get(key)
+            if manager is None:
+                manager = cls._shared[key] = cls(personalities_file)
+            return manager
+
+    @property
+    def personalities(self) -> Dict[str, Any]:
+        """Current configs by name; treat as read-only (changes replace the whole dict)"""
+        self.refresh()
+        return self._personalities
+
+    @property
+    def version(self) -> int:
+        self.refresh()
+        return self._version
+
+    def add_listener(self, callback: Callable[[Set[str]], None]):
+        """Call callback(changed_names) after every change, on the thread that noticed it"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Re-read the file if it changed on disk; True if personalities changed"""
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        with self._lock:
+            if not force and now < self._next_check:
+                return False
+            self._next_check = now + self.check_interval
+            signature = self._stat()
+            if signature is None or signature == self._signature:
+                return False
+            try:
+                with open(self.personalities_file, 'rb') as f:
+                    data = f.read()
+            except OSError as e:
+                logger.warning("Error reading personalities: %s", e)
+                return False
+            self._signature = signature
+            digest = hashlib.sha1(data).hexdigest()
+            if digest == self._digest:
+                return False
+            try:
+                personalities = json.loads(data)
+            except ValueError as e:
+                # Likely caught mid-edit; keep serving the last good copy
+                logger.warning("Error loading personalities, keeping the previous ones: %s", e)
+                return False
+            self._digest = digest
+            changed = self._replace(personalities)
+            listeners = list(self._listeners)
+        if changed:
+            logger.info("Reloaded personalities from %s (changed: %s)",
+                        self.personalities_file, ", ".join(sorted(changed)))
+            self._notify(listeners, changed)
+        return bool(changed)
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.personalities_file)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _replace(self, personalities: Dict[str, Any]) -> Set[str]:
+        """Swap in new configs (lock held); the names that differ"""
+        old = self._personalities
+        changed = {name for name in old.keys() | personalities.keys()
+                   if old.get(name) != personalities.get(name)}
+        self._personalities = personalities
+        if changed:
+            self._version += 1
+        return changed
+
+    @staticmethod
+    def _notify(listeners, changed: Set[str]):
+        for callback in listeners:
+            try:
+                callback(changed)
+            except Exception:
+                logger.exception("Personality change listener failed")
 
     def _load_personalities(self) -> Dict[str, Any]:
         """Load personalities from JSON file or create default ones"""
         if os.path.exists(self.personalities_file):
             try:
-                with open(self.personalities_file, 'r') as f:
-                    return json.load(f)
+                signature = self._stat()
+                with open(self.personalities_file, 'rb') as f:
+                    data = f.read()
+                personalities = json.loads(data)
+                self._signature, self._digest = signature, hashlib.sha1(data).hexdigest()
+                return personalities
             except Exception as e:
-                print(f"⚠️ Error loading personalities: {e}")
+                logger.warning("Error loading personalities, using defaults: %s", e)
                 return self._create_default_personalities()
         else:
             personalities = self._create_default_personalities()
@@ -59,6 +187,24 @@ class PersonalityManager:
                     "How else can I assist you today?",
                     "What other questions do you have?"
                 ],
+                "intents": {
+                    "thanks": {
+                        "patterns": THANKS_PATTERNS,
+                        "max_words": 6,
+                        "responses": [
+                            "Aww, you're so welcome! It makes me happy to help! 💕",
+                            "My absolute pleasure, friend!"
+                        ]
+                    },
+                    "goodbye": {
+                        "patterns": GOODBYE_PATTERNS,
+                        "max_words": 5,
+                        "responses": [
+                            "Goodbye! It was lovely chatting with you! 😊",
+                            "Take care! Come back anytime!"
+                        ]
+                    }
+                },
                 "personality_traits": {
                     "helpfulness": 0.9,
                     "curiosity": 0.7,
@@ -96,6 +242,24 @@ class PersonalityManager:
                     "Tell me more! What's your experience with...?",
                     "That reminds me - have you ever...?"
                 ],
+                "intents": {
+                    "thanks": {
+                        "patterns": THANKS_PATTERNS,
+                        "max_words": 6,
+                        "responses": [
+                            "Anytime! Figuring things out together is the best part! 🤔",
+                            "You're welcome! Now I'm curious what you'll discover next!"
+                        ]
+                    },
+                    "goodbye": {
+                        "patterns": GOODBYE_PATTERNS,
+                        "max_words": 5,
+                        "responses": [
+                            "Bye! Go find something fascinating and tell me about it!",
+                            "See you! I'll be wondering about our chat until then! 🔭"
+                        ]
+                    }
+                },
                 "personality_traits": {
                     "helpfulness": 0.8,
                     "curiosity": 0.95,
@@ -134,6 +298,24 @@ class PersonalityManager:
                     "What lessons have you learned from this?",
                     "How might you apply this understanding?"
                 ],
+                "intents": {
+                    "thanks": {
+                        "patterns": THANKS_PATTERNS,
+                        "max_words": 6,
+                        "responses": [
+                            "Gratitude is itself a kind of wisdom. You are welcome.",
+                            "It is my pleasure to walk this path with you."
+                        ]
+                    },
+                    "goodbye": {
+                        "patterns": GOODBYE_PATTERNS,
+                        "max_words": 5,
+                        "responses": [
+                            "Farewell, my friend. May your journey be a thoughtful one. 🧙‍♂️",
+                            "Until we meet again. Reflect well on what we discussed."
+                        ]
+                    }
+                },
                 "personality_traits": {
                     "helpfulness": 0.85,
                     "curiosity": 0.8,
@@ -174,6 +356,24 @@ class PersonalityManager:
                     "Anything else exciting happening?",
                     "What other adventures are you up to?"
                 ],
+                "intents": {
+                    "thanks": {
+                        "patterns": THANKS_PATTERNS,
+                        "max_words": 6,
+                        "responses": [
+                            "No problemo, superstar! 🌟",
+                            "Anytime, dude! High five! ✋"
+                        ]
+                    },
+                    "goodbye": {
+                        "patterns": GOODBYE_PATTERNS,
+                        "max_words": 5,
+                        "responses": [
+                            "Later, gator! 🐊",
+                            "Bye bye! Don't do anything I wouldn't do! 😜"
+                        ]
+                    }
+                },
                 "personality_traits": {
                     "helpfulness": 0.8,
                     "curiosity": 0.6,
@@ -186,17 +386,30 @@ class PersonalityManager:
         return personalities
 
     def _save_personalities(self, personalities: Dict[str, Any]):
-        """Save personalities to JSON file"""
+        """Save personalities to JSON file, atomically (temp file + rename)"""
+        directory = os.path.dirname(self.personalities_file) or "."
         try:
-            os.makedirs(os.path.dirname(self.personalities_file), exist_ok=True)
-            with open(self.personalities_file, 'w') as f:
-                json.dump(personalities, f, indent=2)
+            os.makedirs(directory, exist_ok=True)
+            data = json.dumps(personalities, indent=2).encode("utf-8")
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".personalities-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.personalities_file)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            # Our own write is not an outside edit to reload
+            self._signature, self._digest = self._stat(), hashlib.sha1(data).hexdigest()
         except Exception as e:
-            print(f"⚠️ Error saving personalities: {e}")
+            logger.error("Error saving personalities: %s", e)
 
     def get_personality(self, personality_name: str) -> Dict[str, Any]:
         """Get a specific personality configuration"""
-        return self.personalities.get(personality_name, self.personalities["friendly_assistant"])
+        personalities = self.personalities
+        return personalities.get(personality_name, personalities["friendly_assistant"])
 
     def available_personalities(self) -> List[str]:
         """Get list of available personality names"""
@@ -211,7 +424,11 @@ class PersonalityManager:
         }
 
     def add_custom_personality(self, name: str, config: Dict[str, Any]):
-        """Add a custom personality"""
-        self.personalities[name] = config
-        self._save_personalities(self.personalities)
-        print(f"✅ Added custom personality: {name}")
\ No newline at end of file
+        """Add (or replace) a custom personality and save the file"""
+        self.refresh(force=True)
+        with self._lock:
+            changed = self._replace({**self._personalities, name: config})
+            self._save_personalities(self._personalities)
+            listeners = list(self._listeners)
+        self._notify(listeners, changed)
+        logger.info("Added custom personality %s", name)
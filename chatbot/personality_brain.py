@@ -1,18 +1,134 @@
 """
 Personality-aware brain that actually uses personality selection
 """
-import requests
+import asyncio
+import contextvars
 import json
-import random
-from .personality import PersonalityManager
+import logging
+import threading
+import time
+from collections import OrderedDict
+from .personality import PersonalityManager, THANKS_PATTERNS
+from .intent_router import IntentRouter, GREETING_PATTERNS, GREETING_MAX_WORDS
+from .ollama_client import OllamaClient
+from .async_ollama_client import AsyncOllamaClient, CoalescingOllamaClient, HAS_AIOHTTP
+from .circuit_breaker import CircuitBreaker, OPEN
+from .batching import run_batch
+from .metrics import ERRORS, FALLBACKS, MODEL_LOADED, STAGE_SECONDS, cache_lookup, stage
+from .scheduler import job_timeout, model_backed
+from .tracing import add_span, trace
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds between Ollama failure warnings while the breaker is open (failures still count)
+FAILURE_LOG_INTERVAL = 30.0
+
+
+class _LabelStripper:
+    """Drop a leading "Assistant:" label from streamed text without delaying the rest"""
+    LABEL = "Assistant:"
+
+    def __init__(self):
+        self.pending = ""
+        self.started = False
+
+    def feed(self, text):
+        """Cleaned text to emit for this chunk (may be empty while holding back)"""
+        if self.started:
+            return text
+        # Hold back leading text until it can't be an "Assistant:" label
+        self.pending += text
+        text = self.pending.lstrip()
+        if not text or self.LABEL.startswith(text):
+            return ""
+        if text.startswith(self.LABEL):
+            text = text[len(self.LABEL):].lstrip()
+        self.started = True
+        return text
+
+    def flush(self):
+        """A short reply still held back when the stream ended"""
+        if not self.started and self.pending.strip() not in ("", self.LABEL):
+            return self.pending.strip()
+        return ""
+
 
 class ConvoAIBrain:
     def __init__(self, memory):
         self.memory = memory
-        self.ollama_url = "http://localhost:11434"
-        self.model = "tinyllama"
-        self.personality_manager = PersonalityManager()
-        print("🧠 Personality-aware brain initialized!")
+        self.ollama_url = Settings.OLLAMA_URL
+        self.model = Settings.OLLAMA_MODEL
+        self.client = OllamaClient(
+            self.ollama_url,
+            self.model,
+            pool_size=Settings.OLLAMA_POOL_SIZE,
+            connect_timeout=Settings.OLLAMA_CONNECT_TIMEOUT,
+            read_timeout=Settings.OLLAMA_READ_TIMEOUT,
+            retries=Settings.OLLAMA_RETRIES
+        )
+        if Settings.OLLAMA_ASYNC and HAS_AIOHTTP:
+            # Concurrent identical prompts share one upstream generation
+            self.client = CoalescingOllamaClient(
+                self.client,
+                AsyncOllamaClient(
+                    self.ollama_url,
+                    self.model,
+                    max_concurrency=Settings.OLLAMA_MAX_CONCURRENCY,
+                    pool_size=Settings.OLLAMA_POOL_SIZE,
+                    connect_timeout=Settings.OLLAMA_CONNECT_TIMEOUT,
+                    read_timeout=Settings.OLLAMA_READ_TIMEOUT,
+                    retries=Settings.OLLAMA_RETRIES
+                ),
+                # A batch job waits as long as BATCH_DEADLINE allows, a chat its own deadline
+                timeout=lambda: job_timeout(Settings.INTERACTIVE_DEADLINE)
+            )
+        # Separate asyncio client for the ASGI server; bound to that server's event loop
+        self.async_client = AsyncOllamaClient(
+            self.ollama_url,
+            self.model,
+            max_concurrency=Settings.OLLAMA_MAX_CONCURRENCY,
+            pool_size=Settings.OLLAMA_POOL_SIZE,
+            connect_timeout=Settings.OLLAMA_CONNECT_TIMEOUT,
+            read_timeout=Settings.OLLAMA_READ_TIMEOUT,
+            retries=Settings.OLLAMA_RETRIES
+        ) if HAS_AIOHTTP else None
+        # While Ollama is down, replies come straight from the fallbacks
+        self.breaker = CircuitBreaker(
+            "ollama",
+            failure_threshold=Settings.BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=Settings.BREAKER_RECOVERY_TIMEOUT,
+            probe=self.client.tags,
+            probe_interval=Settings.BREAKER_PROBE_INTERVAL,
+            slow_call_threshold=Settings.BREAKER_SLOW_CALL
+        )
+        self.keep_alive = Settings.OLLAMA_KEEP_ALIVE
+        # Set once Ollama has answered (or preloaded); the breaker says whether it still is
+        self.model_ready = False
+        MODEL_LOADED.labels("ollama").set_function(
+            lambda: self.model_ready and self.breaker.state != OPEN
+        )
+
+        # Ollama's returned context per (user, personality), least recently used first
+        self._contexts = OrderedDict()
+        self._contexts_lock = threading.Lock()
+        # Ollama failure warnings: every one while the breaker is closed, then one per interval
+        self._failure_log_lock = threading.Lock()
+        self._next_failure_log = 0.0
+        self._suppressed_failures = 0
+        if hasattr(memory, "add_evict_listener"):
+            # A user's Ollama context goes when memory drops the conversation it continues
+            memory.add_evict_listener(self.forget_user)
+
+        self.personality_manager = PersonalityManager.shared()
+        logger.info("Ollama brain ready (%s at %s)", self.model, self.ollama_url)
+
+        # Ollama sampling options
+        self.ollama_options = {
+            "temperature": 0.8,  # Higher for more personality
+            "max_tokens": 60,
+            "num_predict": 60
+        }
         
         # Personality-specific response styles
         self.personality_prompts = {
@@ -26,97 +142,449 @@ class ConvoAIBrain:
             'technical': "You are a technical, precise, and analytical assistant. Focus on facts and details."
         }
         
-        # Personality-specific smart responses
-        self.personality_responses = {
-            'friendly_assistant': {
-                'hello': ["Hello there! I'm so happy to chat with you today! 😊", "Hi! How wonderful to meet you!"],
-                'thank you': ["Aww, you're so welcome! It makes me happy to help! 💕", "My absolute pleasure, friend!"]
-            },
+        # Canned intents for the built-in personalities that have no entry in
+        # personalities.json; those define their own "intents" section
+        self.personality_intents = {
             'professional': {
-                'hello': ["Good day. How may I assist you?", "Hello. I'm here to help with your inquiries."],
-                'thank you': ["You're welcome. Is there anything else I can help you with?", "Certainly. Happy to assist."]
+                'greeting': {'patterns': GREETING_PATTERNS, 'max_words': GREETING_MAX_WORDS,
+                             'responses': ["Good day. How may I assist you?", "Hello. I'm here to help with your inquiries."]},
+                'thanks': {'patterns': THANKS_PATTERNS, 'max_words': 6,
+                           'responses': ["You're welcome. Is there anything else I can help you with?", "Certainly. Happy to assist."]}
             },
             'creative': {
-                'hello': ["Greetings, fellow creator! Ready to explore some amazing ideas? ✨", "Hello, beautiful soul! Let's paint some magic with words! 🎨"],
-                'thank you': ["You're absolutely wonderful! Keep that creative spirit flowing! 🌟", "The pleasure is all mine, creative genius!"]
+                'greeting': {'patterns': GREETING_PATTERNS, 'max_words': GREETING_MAX_WORDS,
+                             'responses': ["Greetings, fellow creator! Ready to explore some amazing ideas? ✨", "Hello, beautiful soul! Let's paint some magic with words! 🎨"]},
+                'thanks': {'patterns': THANKS_PATTERNS, 'max_words': 6,
+                           'responses': ["You're absolutely wonderful! Keep that creative spirit flowing! 🌟", "The pleasure is all mine, creative genius!"]}
             },
             'enthusiastic': {
-                'hello': ["HEY THERE! OH WOW, this is going to be AMAZING! 🚀", "HELLO! I'm SO EXCITED to help you today! ⚡"],
-                'thank you': ["YOU'RE AWESOME! This was FANTASTIC! 🎉", "YES! I LOVE helping amazing people like you! 💥"]
+                'greeting': {'patterns': GREETING_PATTERNS, 'max_words': GREETING_MAX_WORDS,
+                             'responses': ["HEY THERE! OH WOW, this is going to be AMAZING! 🚀", "HELLO! I'm SO EXCITED to help you today! ⚡"]},
+                'thanks': {'patterns': THANKS_PATTERNS, 'max_words': 6,
+                           'responses': ["YOU'RE AWESOME! This was FANTASTIC! 🎉", "YES! I LOVE helping amazing people like you! 💥"]}
             }
         }
-    
+
+        # Answers matching intents without a model call
+        self.intent_router = IntentRouter.from_personalities(self._intent_configs())
+        self.personality_manager.add_listener(self._on_personalities_changed)
+
+        # Personality-based fallbacks when Ollama can't answer
+        self.fallbacks = {
+            'friendly_assistant': "I'd love to help you with that! Could you tell me a bit more? 😊",
+            'professional': "I'd be happy to assist. Could you provide additional details?",
+            'creative': "Oh, what an intriguing topic! Let's explore this together! ✨",
+            'enthusiastic': "WOW! That sounds AMAZING! Tell me more! 🚀",
+            'casual': "Cool question! Want to chat more about it?",
+            'wise': "Ah, an interesting inquiry indeed. Please, share more of your thoughts.",
+            'humorous': "Ha! Good question! I'm all ears (well, metaphorically speaking) 😄",
+            'technical': "Please provide more specific parameters for optimal assistance."
+        }
+
+        if Settings.OLLAMA_PRELOAD:
+            # Load the model in the background so the first chat turn doesn't pay for it
+            threading.Thread(target=self.preload, name="ollama-preload", daemon=True).start()
+
+    def _intent_configs(self):
+        """Intent sources per personality: personalities.json over the built-in ones"""
+        return {
+            **{name: {'intents': intents} for name, intents in self.personality_intents.items()},
+            **self.personality_manager.personalities
+        }
+
+    def _on_personalities_changed(self, changed):
+        # Recompile just the edited personalities, in place (the backend router shares this router)
+        self.intent_router.reload_personalities(self._intent_configs(), changed)
+
+    def _canned_reply(self, personality_name, user_input):
+        """An intent's canned reply, after picking up any personalities.json edits"""
+        self.personality_manager.refresh()
+        return self.intent_router.respond(personality_name, user_input)
+
+    def preload(self):
+        """Ask Ollama to load the model now and keep it resident for keep_alive"""
+        try:
+            self.client.preload(self.keep_alive)
+            self.model_ready = True
+            logger.info("Ollama model %s loaded (keep_alive=%s)", self.model, self.keep_alive)
+            return True
+        except Exception as e:
+            logger.warning("Could not preload Ollama model: %s", e)
+            return False
+
+    def forget_user(self, user_id):
+        """Drop the stored Ollama context for every personality of a user"""
+        with self._contexts_lock:
+            for key in [key for key in self._contexts if key[0] == user_id]:
+                del self._contexts[key]
+
+    def _get_context(self, user_id, personality_name):
+        with self._contexts_lock:
+            key = (user_id, personality_name)
+            context = self._contexts.get(key)
+            if context is not None:
+                self._contexts.move_to_end(key)
+        cache_lookup("ollama_context", context is not None)
+        return context
+
+    def _store_context(self, user_id, personality_name, context):
+        """Remember the context for the next turn; start over once it outgrows the window"""
+        key = (user_id, personality_name)
+        with self._contexts_lock:
+            if not context or len(context) > Settings.OLLAMA_CONTEXT_MAX_TOKENS:
+                self._contexts.pop(key, None)
+                return
+            self._contexts[key] = context
+            self._contexts.move_to_end(key)
+            while len(self._contexts) > Settings.OLLAMA_CONTEXT_USERS:
+                self._contexts.popitem(last=False)
+
+    def _request_fields(self, context):
+        """Extra /api/generate fields: keep the model loaded, continue from context"""
+        fields = {}
+        if self.keep_alive:
+            fields["keep_alive"] = self.keep_alive
+        if context:
+            fields["context"] = context
+        return fields
+
+    def get_fallback(self, personality_name="friendly_assistant", reason="no_reply"):
+        """Get the canned fallback reply for a personality"""
+        FALLBACKS.labels(reason).inc()
+        with stage("fallback"):
+            return self.fallbacks.get(personality_name, "I'm here to help! What would you like to know?")
+
+    def _log_ollama_failure(self, what):
+        """Warn with the cause of the exception being handled (call from an except block)"""
+        now = time.monotonic()
+        with self._failure_log_lock:
+            if self.breaker.state == OPEN and now < self._next_failure_log:
+                self._suppressed_failures += 1
+                return
+            suppressed, self._suppressed_failures = self._suppressed_failures, 0
+            self._next_failure_log = now + FAILURE_LOG_INTERVAL
+        if suppressed:
+            logger.warning("Ollama %s failed (and %d times since the last warning)", what, suppressed,
+                           exc_info=True)
+        else:
+            logger.warning("Ollama %s failed", what, exc_info=True)
+
+    def _fallback_reason(self):
+        return "breaker_open" if self.breaker.state == OPEN else "no_reply"
+
+    def _record_inference(self, result):
+        """Ollama's own generation time for a finished request, separate from the HTTP round trip"""
+        self.model_ready = True
+        if result.get('total_duration'):
+            seconds = result['total_duration'] / 1e9
+            STAGE_SECONDS.labels("inference").observe(seconds)
+            add_span("inference", seconds)
+
+    @trace("generate_response")
     def generate_response(self, user_input, user_id, personality_name="friendly_assistant"):
         """Generate response with actual personality influence"""
         try:
             # Store user input
             self.memory.add_message(user_id, "user", user_input)
             
-            # Check for personality-specific smart responses
-            user_lower = user_input.lower().strip()
-            if personality_name in self.personality_responses:
-                personality_smart = self.personality_responses[personality_name]
-                for key, responses in personality_smart.items():
-                    if key in user_lower:
-                        response = random.choice(responses)
-                        self.memory.add_message(user_id, "assistant", response)
-                        return response
-            
-            # Get personality prompt
-            personality_prompt = self.personality_prompts.get(
-                personality_name, 
-                "You are a helpful assistant."
-            )
-            
-            # Create personality-influenced prompt
-            prompt = f"{personality_prompt}\n\nUser: {user_input}\nAssistant:"
-            
-            # Try Ollama with personality
-            try:
-                payload = {
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.8,  # Higher for more personality
-                        "max_tokens": 60,
-                        "num_predict": 60
-                    }
-                }
-                
-                response = requests.post(
-                    f"{self.ollama_url}/api/generate",
-                    json=payload,
-                    timeout=10
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    ai_response = result.get('response', '').strip()
-                    ai_response = ai_response.replace("Assistant:", "").strip()
-                    
-                    if len(ai_response) > 3:
-                        self.memory.add_message(user_id, "assistant", ai_response)
-                        return ai_response
+            # Canned replies for greetings, thanks etc. skip the model entirely
+            response = self._canned_reply(personality_name, user_input)
+            if response:
+                self.memory.add_message(user_id, "assistant", response)
+                return response
             
-            except Exception:
-                pass
+            # Try Ollama with personality, unless the breaker says it's down
+            ai_response = self.compose_reply(user_input, user_id, personality_name)
+            if ai_response:
+                self.memory.add_message(user_id, "assistant", ai_response)
+                return ai_response
             
             # Personality-based fallback
-            fallbacks = {
-                'friendly_assistant': "I'd love to help you with that! Could you tell me a bit more? 😊",
-                'professional': "I'd be happy to assist. Could you provide additional details?",
-                'creative': "Oh, what an intriguing topic! Let's explore this together! ✨",
-                'enthusiastic': "WOW! That sounds AMAZING! Tell me more! 🚀",
-                'casual': "Cool question! Want to chat more about it?",
-                'wise': "Ah, an interesting inquiry indeed. Please, share more of your thoughts.",
-                'humorous': "Ha! Good question! I'm all ears (well, metaphorically speaking) 😄",
-                'technical': "Please provide more specific parameters for optimal assistance."
-            }
-            
-            fallback = fallbacks.get(personality_name, "I'm here to help! What would you like to know?")
+            fallback = self.get_fallback(personality_name, self._fallback_reason())
             self.memory.add_message(user_id, "assistant", fallback)
             return fallback
             
-        except Exception as e:
+        except Exception:
+            ERRORS.labels("brain").inc()
+            logger.exception("Turn failed for %s", user_id)
             return "I'm experiencing some technical difficulties. Please try again."
+
+    def compose_reply(self, user_input, user_id, personality_name="friendly_assistant", cancel_event=None):
+        """Ask Ollama for a reply without storing anything; None if it can't answer or was cancelled"""
+        if not self.breaker.allow_request():
+            return None
+        model_backed()
+
+        # Follow-up turns continue from Ollama's context and send only the new message
+        context = self._get_context(user_id, personality_name)
+        prompt = self._build_prompt(user_input, personality_name, followup=context is not None)
+
+        started = time.monotonic()
+        try:
+            if cancel_event is None:
+                with stage("ollama_http"):
+                    result = self.client.generate(
+                        prompt, options=self.ollama_options, **self._request_fields(context)
+                    )
+                self._record_inference(result)
+                self._store_context(user_id, personality_name, result.get('context'))
+                ai_response = result.get('response', '')
+            else:
+                # Stream so that cancelling stops Ollama at the next token
+                parts = []
+                stream = self._stream_ollama(
+                    prompt, context,
+                    on_context=lambda ctx: self._store_context(user_id, personality_name, ctx)
+                )
+                try:
+                    for text in stream:
+                        if cancel_event.is_set():
+                            self.breaker.release()
+                            return None
+                        parts.append(text)
+                finally:
+                    stream.close()
+                ai_response = "".join(parts)
+            self.breaker.record_success(time.monotonic() - started)
+        except Exception:
+            ERRORS.labels("ollama").inc()
+            self._log_ollama_failure("generate")
+            self.breaker.record_failure(time.monotonic() - started)
+            return None
+
+        ai_response = ai_response.strip().replace("Assistant:", "").strip()
+        return ai_response if len(ai_response) > 3 else None
+
+    def generate_batch(self, items, concurrency=None, scheduler=None):
+        """generate_response() for many BatchItems, yielding BatchResults as they complete.
+
+        Requests to Ollama are pipelined over the pooled client; each user's
+        items still run in order so later turns see the earlier replies.
+        With a scheduler, items queue there at BATCH priority behind chats.
+        """
+        return run_batch(self.generate_response, items, concurrency or Settings.BATCH_CONCURRENCY,
+                         scheduler=scheduler)
+
+    def generate_response_stream(self, user_input, user_id, personality_name="friendly_assistant"):
+        """Yield the reply in chunks as Ollama produces them; stores the full reply once at the end"""
+        self.memory.add_message(user_id, "user", user_input)
+
+        response = self._canned_reply(personality_name, user_input)
+        if response:
+            self.memory.add_message(user_id, "assistant", response)
+            yield response
+            return
+
+        parts = []
+        reply = ""
+        if self.breaker.allow_request():
+            started = time.monotonic()
+            first_token = None
+            verdict = None
+            context = self._get_context(user_id, personality_name)
+            prompt = self._build_prompt(user_input, personality_name, followup=context is not None)
+            try:
+                for text in self._stream_ollama(
+                    prompt, context,
+                    on_context=lambda ctx: self._store_context(user_id, personality_name, ctx)
+                ):
+                    if first_token is None:
+                        first_token = time.monotonic()
+                    parts.append(text)
+                    yield text
+                verdict = True
+            except Exception:
+                ERRORS.labels("ollama").inc()
+                verdict = False
+                self._log_ollama_failure("stream")
+            finally:
+                # Also runs when the client disconnects mid-stream. Streams are
+                # judged on time to first token, not on how long the reply is.
+                latency = (first_token or time.monotonic()) - started
+                if verdict is True or (verdict is None and parts):
+                    self.breaker.record_success(latency)
+                elif verdict is False:
+                    self.breaker.record_failure(latency)
+                else:
+                    self.breaker.release()
+                reply = "".join(parts).strip()
+                if reply:
+                    self.memory.add_message(user_id, "assistant", reply)
+
+        if not reply:
+            fallback = self.get_fallback(personality_name, self._fallback_reason())
+            self.memory.add_message(user_id, "assistant", fallback)
+            yield fallback
+
+    @stage("prompt_build")
+    def _build_prompt(self, user_input, personality_name, followup=False):
+        """Create the personality-influenced Ollama prompt"""
+        if followup:
+            # The personality instructions are already part of the returned context
+            return f"User: {user_input}\nAssistant:"
+        personality_prompt = self.personality_prompts.get(
+            personality_name, 
+            "You are a helpful assistant."
+        )
+        return f"{personality_prompt}\n\nUser: {user_input}\nAssistant:"
+
+    def _stream_ollama(self, prompt, context=None, on_context=None):
+        """Yield cleaned reply text from Ollama's streaming API"""
+        stripper = _LabelStripper()
+        stream = self.client.generate_stream(
+            prompt, options=self.ollama_options, **self._request_fields(context)
+        )
+        started = time.perf_counter()
+        try:
+            for chunk in stream:
+                if chunk.get('done'):
+                    self._record_inference(chunk)
+                    if on_context is not None:
+                        # The final chunk carries the context for the next turn
+                        on_context(chunk.get('context'))
+                text = stripper.feed(chunk.get('response', ''))
+                if text:
+                    yield text
+        finally:
+            elapsed = time.perf_counter() - started
+            STAGE_SECONDS.labels("ollama_http").observe(elapsed)
+            add_span("ollama_http", elapsed)
+
+        # Stream ended while still holding back a short reply
+        tail = stripper.flush()
+        if tail:
+            yield tail
+
+    # Async variants for the ASGI server: same behaviour over the asyncio client,
+    # so a waiting chat costs a coroutine instead of a thread
+
+    async def _remember(self, user_id, role, message):
+        """Store a message without blocking the event loop (memory may be SQLite)"""
+        await asyncio.get_running_loop().run_in_executor(
+            None, contextvars.copy_context().run, self.memory.add_message, user_id, role, message
+        )
+
+    async def generate_response_async(self, user_input, user_id, personality_name="friendly_assistant"):
+        """Async generate_response()"""
+        try:
+            with trace("generate_response"):
+                await self._remember(user_id, "user", user_input)
+
+                response = self._canned_reply(personality_name, user_input)
+                if not response:
+                    response = await self.compose_reply_async(user_input, user_id, personality_name)
+                if not response:
+                    response = self.get_fallback(personality_name, self._fallback_reason())
+
+                await self._remember(user_id, "assistant", response)
+                return response
+
+        except Exception:
+            ERRORS.labels("brain").inc()
+            logger.exception("Turn failed for %s", user_id)
+            return "I'm experiencing some technical difficulties. Please try again."
+
+    async def compose_reply_async(self, user_input, user_id, personality_name="friendly_assistant"):
+        """Async compose_reply(); cancelling the task cancels the Ollama call"""
+        if self.async_client is None or not self.breaker.allow_request():
+            return None
+        model_backed()
+
+        context = self._get_context(user_id, personality_name)
+        prompt = self._build_prompt(user_input, personality_name, followup=context is not None)
+
+        started = time.monotonic()
+        try:
+            with stage("ollama_http"):
+                result = await self.async_client.generate(
+                    prompt, options=self.ollama_options, **self._request_fields(context)
+                )
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception:
+            ERRORS.labels("ollama").inc()
+            self._log_ollama_failure("generate")
+            self.breaker.record_failure(time.monotonic() - started)
+            return None
+        self.breaker.record_success(time.monotonic() - started)
+        self._record_inference(result)
+        self._store_context(user_id, personality_name, result.get('context'))
+
+        ai_response = result.get('response', '').strip().replace("Assistant:", "").strip()
+        return ai_response if len(ai_response) > 3 else None
+
+    async def generate_response_stream_async(self, user_input, user_id, personality_name="friendly_assistant"):
+        """Async generate_response_stream(): yields chunks, stores the full reply once"""
+        await self._remember(user_id, "user", user_input)
+
+        response = self._canned_reply(personality_name, user_input)
+        if response:
+            await self._remember(user_id, "assistant", response)
+            yield response
+            return
+
+        parts = []
+        if self.async_client is not None and self.breaker.allow_request():
+            context = self._get_context(user_id, personality_name)
+            prompt = self._build_prompt(user_input, personality_name, followup=context is not None)
+            started = time.monotonic()
+            first_token = None
+            verdict = None
+            try:
+                async for text in self._stream_ollama_async(
+                    prompt, context,
+                    on_context=lambda ctx: self._store_context(user_id, personality_name, ctx)
+                ):
+                    if first_token is None:
+                        first_token = time.monotonic()
+                    parts.append(text)
+                    yield text
+                verdict = True
+            except Exception:
+                ERRORS.labels("ollama").inc()
+                verdict = False
+                self._log_ollama_failure("stream")
+            finally:
+                # Also runs when the client disconnects mid-stream
+                latency = (first_token or time.monotonic()) - started
+                if verdict is True or (verdict is None and parts):
+                    self.breaker.record_success(latency)
+                elif verdict is False:
+                    self.breaker.record_failure(latency)
+                else:
+                    self.breaker.release()
+                reply = "".join(parts).strip()
+                if reply:
+                    await self._remember(user_id, "assistant", reply)
+
+        if not "".join(parts).strip():
+            fallback = self.get_fallback(personality_name, self._fallback_reason())
+            await self._remember(user_id, "assistant", fallback)
+            yield fallback
+
+    async def _stream_ollama_async(self, prompt, context=None, on_context=None):
+        """Async _stream_ollama()"""
+        stripper = _LabelStripper()
+        stream = self.async_client.generate_stream(
+            prompt, options=self.ollama_options, **self._request_fields(context)
+        )
+        started = time.perf_counter()
+        try:
+            async for chunk in stream:
+                if chunk.get('done'):
+                    self._record_inference(chunk)
+                    if on_context is not None:
+                        on_context(chunk.get('context'))
+                text = stripper.feed(chunk.get('response', ''))
+                if text:
+                    yield text
+        finally:
+            elapsed = time.perf_counter() - started
+            STAGE_SECONDS.labels("ollama_http").observe(elapsed)
+            add_span("ollama_http", elapsed)
+            await stream.aclose()
+
+        tail = stripper.flush()
+        if tail:
+            yield tail
@@ -0,0 +1,121 @@
+"""
+ConvoAI Profile Extractor - Single-pass name and interest matching
+"""
+
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+NAME_PATTERNS = ["my name is", "i'm", "call me", "i am"]
+
+INTEREST_TRIGGERS = ["i love", "i like", "i enjoy", "interested in", "my hobby"]
+
+INTEREST_KEYWORDS = {
+    'sports': ['football', 'soccer', 'basketball', 'tennis', 'swimming', 'running', 'gym'],
+    'technology': ['programming', 'coding', 'ai', 'machine learning', 'computers', 'software'],
+    'music': ['music', 'guitar', 'piano', 'singing', 'concerts', 'bands'],
+    'reading': ['books', 'reading', 'novels', 'literature'],
+    'cooking': ['cooking', 'baking', 'recipes', 'food'],
+    'travel': ['travel', 'traveling', 'vacation', 'countries'],
+    'movies': ['movies', 'films', 'cinema', 'netflix'],
+    'games': ['games', 'gaming', 'video games', 'board games']
+}
+
+
+class ProfileHits(NamedTuple):
+    name: Optional[str]
+    interests: List[str]
+    has_interest_trigger: bool
+
+
+def _alternation(phrases: List[str]) -> str:
+    """Compile phrases into a prefix-factored (trie) regex alternation.
+
+    Python's re engine tries alternatives one by one, so sharing prefixes
+    ("i(?:'m| am| l(?:ike|ove))") keeps failed positions cheap. Spaces in a
+    phrase match any run of whitespace.
+    """
+    trie: Dict = {}
+    for phrase in phrases:
+        node = trie
+        for char in " ".join(phrase.lower().split()):
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return _trie_pattern(trie)
+
+
+def _trie_pattern(node: Dict) -> str:
+    """Render one trie node as a regex fragment"""
+    branches = []
+    optional = "" in node
+    for char, child in sorted(node.items()):
+        if char == "":
+            continue
+        token = r"\s+" if char == " " else re.escape(char)
+        branches.append(token + _trie_pattern(child))
+
+    if not branches:
+        return ""
+    if len(branches) == 1 and not optional:
+        return branches[0]
+    pattern = "(?:" + "|".join(branches) + ")"
+    return pattern + "?" if optional else pattern
+
+
+class ProfileExtractor:
+    """Find names, interest triggers and interest keywords in one regex pass.
+
+    All phrases are compiled into a single word-boundary anchored pattern run
+    over the lowercased text, so "ai" matches "AI" but not "said". The
+    name alternative captures the following word through a lookahead, which
+    leaves that word free to match an interest phrase as well.
+    """
+
+    def __init__(self, name_patterns: List[str] = None, interest_triggers: List[str] = None,
+                 interest_keywords: Dict[str, List[str]] = None):
+        name_patterns = name_patterns or NAME_PATTERNS
+        interest_triggers = interest_triggers or INTEREST_TRIGGERS
+        interest_keywords = interest_keywords or INTEREST_KEYWORDS
+
+        self.categories = list(interest_keywords)
+        self._keyword_category = {}
+        for category, keywords in interest_keywords.items():
+            for keyword in keywords:
+                self._keyword_category.setdefault(" ".join(keyword.lower().split()), category)
+
+        self._pattern = re.compile(
+            r"\b(?:"
+            rf"(?P<name>(?:{_alternation(name_patterns)})\s+(?=(?P<name_word>[^\W\d_]+)))"
+            rf"|(?P<trigger>{_alternation(interest_triggers)})"
+            rf"|(?P<keyword>{_alternation(list(self._keyword_category))})"
+            r")\b"
+        )
+
+    def extract(self, text: str) -> ProfileHits:
+        """Scan text once for a name, interest triggers and interest categories"""
+        name = None
+        has_trigger = False
+        found = set()
+
+        for match in self._pattern.finditer(text.lower()):
+            kind = match.lastgroup
+            if kind == "name":
+                if name is None:
+                    word = match.group("name_word")
+                    if len(word) > 1:
+                        name = word.title()
+            elif kind == "trigger":
+                has_trigger = True
+            else:
+                found.add(self._keyword_category[" ".join(match.group("keyword").split())])
+
+        # Report categories in their declared order
+        interests = [category for category in self.categories if category in found]
+        return ProfileHits(name, interests, has_trigger)
+
+    def extract_interests(self, text: str) -> List[str]:
+        """Interest categories mentioned in text"""
+        return self.extract(text).interests
+
+
+# Shared, precompiled instance used by the brains and memory
+default_extractor = ProfileExtractor()
@@ -0,0 +1,117 @@
+"""
+ConvoAI Prompt Builder - Token-budget-aware prompt assembly
+"""
+
+import threading
+from collections import OrderedDict
+from typing import List, Dict
+
+from .metrics import cache_lookup, stage
+
+
+class PromptBuilder:
+    """Assemble prompts from cached token ids instead of re-tokenizing history.
+
+    Every prompt piece (personality header, one line per stored message, the
+    trailing "AI:" cue) is tokenized once and cached by its rendered text, so
+    a turn only pays tokenization for the lines it has never seen before.
+    When the prompt does not fit the budget, the oldest context lines are
+    dropped first; the header and the current "Human: ... AI:" cue are kept.
+    """
+
+    RESPONSE_CUE = "AI:"
+
+    def __init__(self, tokenizer, context_window: int, max_new_tokens: int,
+                 max_cached_lines: int = 4096, max_cached_headers: int = 256):
+        self.tokenizer = tokenizer
+        self.max_new_tokens = max_new_tokens
+        self.budget = max(context_window - max_new_tokens, 1)
+        self.max_cached_lines = max_cached_lines
+        self.max_cached_headers = max_cached_headers
+
+        self._header_cache: Dict[str, List[int]] = {}
+        self._line_cache: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._lock = threading.Lock()  # caches are shared by concurrent generations
+        self._cue_ids = self._encode(self.RESPONSE_CUE)
+
+    @stage("tokenize")
+    def _encode(self, text: str) -> List[int]:
+        """Tokenize a single prompt piece"""
+        return self.tokenizer.encode(text, add_special_tokens=False)
+
+    def header_ids(self, header: str) -> List[int]:
+        """Get token ids for a personality/user header"""
+        ids = self._header_cache.get(header)
+        cache_lookup("prompt_headers", ids is not None)
+        if ids is None:
+            ids = self._encode(header)
+            with self._lock:
+                if len(self._header_cache) >= self.max_cached_headers:
+                    self._header_cache.clear()
+                self._header_cache[header] = ids
+        return ids
+
+    def line_ids(self, role: str, message: str) -> List[int]:
+        """Get token ids for one conversation line, LRU-cached"""
+        line = self.format_line(role, message)
+        with self._lock:
+            ids = self._line_cache.get(line)
+            if ids is not None:
+                self._line_cache.move_to_end(line)
+        cache_lookup("prompt_lines", ids is not None)
+        if ids is not None:
+            return ids
+
+        ids = self._encode(line)
+        with self._lock:
+            self._line_cache[line] = ids
+            if len(self._line_cache) > self.max_cached_lines:
+                self._line_cache.popitem(last=False)
+        return ids
+
+    @staticmethod
+    def format_line(role: str, message: str) -> str:
+        """Render a stored message the way it appears in the prompt"""
+        speaker = "Human" if role == "user" else "AI"
+        return f"{speaker}: {message}\n"
+
+    @stage("prompt_build")
+    def build(self, header: str, context: List[Dict], user_input: str) -> List[int]:
+        """Build prompt token ids that fit within the token budget"""
+        head = self.header_ids(header)
+        current = self.line_ids("user", user_input)
+        tail = current + self._cue_ids
+
+        remaining = self.budget - len(head) - len(tail)
+        if remaining < 0:
+            # Header plus current message alone overflow: keep the end of
+            # the message so the "AI:" cue always survives.
+            room = self.budget - len(self._cue_ids)
+            body = (head + current)[-room:] if room > 0 else []
+            return body + self._cue_ids
+
+        # Walk context newest-first, keeping lines while they fit
+        kept: List[List[int]] = []
+        for msg in reversed(context):
+            ids = self.line_ids(msg['role'], msg['message'])
+            if len(ids) > remaining:
+                break
+            kept.append(ids)
+            remaining -= len(ids)
+
+        prompt_ids = list(head)
+        for ids in reversed(kept):
+            prompt_ids.extend(ids)
+        prompt_ids.extend(tail)
+        return prompt_ids
+
+    def clear_headers(self):
+        """Drop cached header token ids (personality descriptions changed)"""
+        with self._lock:
+            self._header_cache.clear()
+
+    def clear(self):
+        """Drop all cached token ids"""
+        with self._lock:
+            self._header_cache.clear()
+            self._line_cache.clear()
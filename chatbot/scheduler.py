@@ -0,0 +1,429 @@
+"""
+ConvoAI Inference Scheduler - Bounded priority queue in front of the brains
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional
+
+from .tracing import add_span
+
+# Priority classes (lower runs first)
+INTERACTIVE = 0
+BATCH = 1
+
+# The job running in this context, for model_backed()
+_current_job: contextvars.ContextVar = contextvars.ContextVar("scheduler_job", default=None)
+
+
+def model_backed():
+    """Mark the current scheduler job as one that ran the model.
+
+    Only marked jobs feed the service-time estimate: canned replies and
+    open-breaker fallbacks take microseconds and would make admission
+    control think a model call is far cheaper than it is.
+    """
+    job = _current_job.get()
+    while job is not None:
+        job.model_backed = True
+        job = job.parent
+
+
+def job_timeout(default: Optional[float] = None) -> Optional[float]:
+    """The time budget the current scheduler job was submitted with (its priority's
+    timeout unless the caller chose one), or default outside a job"""
+    job = _current_job.get()
+    while job is not None and not isinstance(job, _Job):
+        job = job.parent
+    return job.deadline - job.queued if job is not None else default
+
+
+def track_model_use(tracker, fn: Callable, *args, **kwargs):
+    """Call fn with tracker (an object with model_backed and parent attributes) as the
+    current job: model_backed() inside marks it, and the job the call runs in"""
+    tracker.parent = _current_job.get()
+    token = _current_job.set(tracker)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _current_job.reset(token)
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "priority", "deadline", "fallback", "future",
+                 "context", "queued", "model_backed", "parent")
+
+    def __init__(self, fn, args, kwargs, priority, deadline, fallback):
+        # Runs in the submitter's context, so the request's trace follows it onto the worker
+        self.context = contextvars.copy_context()
+        self.queued = time.monotonic()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.deadline = deadline
+        self.fallback = fallback
+        self.future = Future()
+        self.model_backed = False
+        self.parent = None
+
+
+class InferenceScheduler:
+    """Run brain calls on a fixed worker pool with admission control.
+
+    Jobs wait in a bounded priority queue. A job is rejected up front, and
+    answered with its fallback, when the queue is full or when the observed
+    service time says it would finish after its deadline. Jobs that expire
+    while queued are answered with their fallback instead of being run.
+
+    Coroutine functions go through submit_async() instead: they run on the
+    caller's event loop, at most async_slots at a time, and wait for a slot
+    in a queue of their own with the same bound, priorities and deadlines.
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 32,
+                 timeouts: Optional[Dict[int, float]] = None, name: str = "inference",
+                 async_slots: int = 4):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeouts = timeouts or {INTERACTIVE: 15.0, BATCH: 120.0}
+        self.async_slots = async_slots
+
+        self._queue = []
+        self._depth_by_priority: Dict[int, int] = {}
+        # Coroutine jobs waiting for a slot: (priority, seq, job, slot future)
+        self._async_queue = []
+        self._async_running = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = 0
+        self._service_time: Optional[float] = None
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "rejected": 0,
+            "expired": 0,
+            "late": 0,
+            "failed": 0,
+        }
+        self._shutdown = False
+
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn: Callable, *args, priority: int = INTERACTIVE,
+               timeout: Optional[float] = None, fallback: Optional[Callable[[], Any]] = None,
+               **kwargs) -> Future:
+        """Queue a call and return a Future with its result (or fallback)"""
+        now = time.monotonic()
+        if timeout is None:
+            timeout = self.timeouts.get(priority, self.timeouts[INTERACTIVE])
+        job = _Job(fn, args, kwargs, priority, now + timeout, fallback)
+
+        with self._cond:
+            self._stats["submitted"] += 1
+            evicted = None
+            if self._shutdown or not self._meets_deadline(job, now):
+                admitted = False
+            elif len(self._queue) < self.max_queue:
+                admitted = True
+            else:
+                # Full queue: shed the newest lower-priority job instead
+                evicted = self._evict_lower_priority(priority)
+                admitted = evicted is not None
+
+            if admitted:
+                heapq.heappush(self._queue, (priority, next(self._seq), job))
+                self._depth_by_priority[priority] = self._depth_by_priority.get(priority, 0) + 1
+                self._cond.notify()
+            else:
+                self._stats["rejected"] += 1
+            if evicted is not None:
+                self._stats["rejected"] += 1
+
+        if evicted is not None:
+            self._resolve_with_fallback(evicted)
+        if not admitted:
+            self._resolve_with_fallback(job)
+        return job.future
+
+    def run(self, fn: Callable, *args, priority: int = INTERACTIVE,
+            timeout: Optional[float] = None, fallback: Optional[Callable[[], Any]] = None,
+            **kwargs) -> Any:
+        """Submit a call and wait for it, returning the fallback if it misses its deadline"""
+        if timeout is None:
+            timeout = self.timeouts.get(priority, self.timeouts[INTERACTIVE])
+        future = self.submit(fn, *args, priority=priority, timeout=timeout,
+                             fallback=fallback, **kwargs)
+        return self.result(future, timeout, fallback)
+
+    def result(self, future: Future, timeout: float, fallback: Optional[Callable[[], Any]] = None) -> Any:
+        """Wait up to timeout for a submitted job, returning the fallback if it is late or fails.
+
+        A late job is not stopped: it still finishes (and stores its turn) on
+        its worker. Callers serializing per user should keep their lock until
+        the future is done, not just until this returns.
+        """
+        try:
+            return future.result(timeout=max(timeout, 0.0))
+        except FutureTimeout:
+            self._count_late()
+            if fallback is None:
+                raise
+            return fallback()
+        except Exception:
+            if fallback is None:
+                raise
+            return fallback()
+
+    async def result_async(self, future: Future, timeout: float,
+                           fallback: Optional[Callable[[], Any]] = None) -> Any:
+        """result() for coroutines: waits without blocking the event loop"""
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), max(timeout, 0.0))
+        except asyncio.TimeoutError:
+            self._count_late()
+            if fallback is None:
+                raise
+            return fallback()
+        except Exception:
+            if fallback is None:
+                raise
+            return fallback()
+
+    def _count_late(self):
+        with self._cond:
+            self._stats["late"] += 1
+
+    def _meets_deadline(self, job: _Job, now: float) -> bool:
+        """Estimate whether a job would finish before its deadline (lock held)"""
+        # Jobs that will run before this one: same-or-higher priority queued, plus running
+        ahead = self._running + sum(
+            depth for prio, depth in self._depth_by_priority.items() if prio <= job.priority
+        )
+        return self._finishes_in_time(job, now, ahead, self.workers)
+
+    def _finishes_in_time(self, job: _Job, now: float, ahead: int, lanes: int) -> bool:
+        if self._service_time is None:
+            return True
+        estimated_finish = now + (ahead // lanes + 1) * self._service_time
+        return estimated_finish <= job.deadline
+
+    def _evict_lower_priority(self, priority: int) -> Optional[_Job]:
+        """Remove the newest queued job with a lower priority class (lock held)"""
+        worst = max(self._queue, key=lambda item: (item[0], item[1]), default=None)
+        if worst is None or worst[0] <= priority:
+            return None
+        self._queue.remove(worst)
+        heapq.heapify(self._queue)
+        self._depth_by_priority[worst[0]] -= 1
+        return worst[2]
+
+    # Coroutine jobs
+
+    def submit_async(self, fn: Callable, *args, priority: int = INTERACTIVE,
+                     timeout: Optional[float] = None, fallback: Optional[Callable[[], Any]] = None,
+                     **kwargs) -> "asyncio.Task":
+        """Queue a coroutine function call from the event loop; returns a Task with its
+        result (or fallback). Collect it with result_async() like a submit() Future."""
+        if timeout is None:
+            timeout = self.timeouts.get(priority, self.timeouts[INTERACTIVE])
+        job = _Job(fn, args, kwargs, priority, time.monotonic() + timeout, fallback)
+        return asyncio.ensure_future(self._run_async(job))
+
+    async def _run_async(self, job: _Job):
+        slot = asyncio.get_running_loop().create_future()
+        with self._cond:
+            self._stats["submitted"] += 1
+            admitted, evicted = self._admit_async(job, slot, job.queued)
+            if not admitted or evicted is not None:
+                self._stats["rejected"] += 1
+        if evicted is not None:
+            _hand_over(evicted, False)
+        if not admitted:
+            return job.fallback() if job.fallback else None
+
+        if not slot.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(slot), job.deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                # Expired while queued; if a slot was handed over just now, pass it on
+                if not self._leave_async_queue(job) and await slot:
+                    self._release_async_slot()
+                with self._cond:
+                    self._stats["expired"] += 1
+                return job.fallback() if job.fallback else None
+            except asyncio.CancelledError:
+                if not self._leave_async_queue(job):
+                    slot.add_done_callback(lambda granted: granted.result() and self._release_async_slot())
+                raise
+        if not slot.result():
+            # Evicted by a more urgent job
+            return job.fallback() if job.fallback else None
+
+        started = time.monotonic()
+        outcome = "failed"
+        try:
+            add_span("scheduler_queue", started - job.queued)
+            _current_job.set(job)
+            result = await job.fn(*job.args, **job.kwargs)
+            outcome = "completed"
+            return result
+        except asyncio.CancelledError:
+            outcome = None
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            with self._cond:
+                if outcome:
+                    self._stats[outcome] += 1
+                    if job.model_backed:
+                        self._record_service_time(elapsed)
+            self._release_async_slot()
+
+    def _admit_async(self, job: _Job, slot, now: float):
+        """(admitted, evicted slot): start job now or queue it for a slot (lock held)"""
+        ahead = self._async_running + sum(1 for item in self._async_queue if item[0] <= job.priority)
+        if self._shutdown or not self._finishes_in_time(job, now, ahead, self.async_slots):
+            return False, None
+        if self._async_running < self.async_slots:
+            self._async_running += 1
+            slot.set_result(True)
+            return True, None
+        evicted = None
+        if len(self._async_queue) >= self.max_queue:
+            # Full queue: shed the newest lower-priority job instead
+            worst = max(self._async_queue, key=lambda item: (item[0], item[1]), default=None)
+            if worst is None or worst[0] <= job.priority:
+                return False, None
+            self._async_queue.remove(worst)
+            heapq.heapify(self._async_queue)
+            evicted = worst[3]
+        heapq.heappush(self._async_queue, (job.priority, next(self._seq), job, slot))
+        return True, evicted
+
+    def _leave_async_queue(self, job: _Job) -> bool:
+        """Take a job that stopped waiting off the queue; False if it was already dequeued"""
+        with self._cond:
+            for index, item in enumerate(self._async_queue):
+                if item[2] is job:
+                    self._async_queue.pop(index)
+                    heapq.heapify(self._async_queue)
+                    return True
+        return False
+
+    def _release_async_slot(self):
+        """A coroutine job finished: hand its slot to the most urgent waiting job"""
+        with self._cond:
+            if not self._async_queue:
+                self._async_running -= 1
+                return
+            *_, slot = heapq.heappop(self._async_queue)
+        _hand_over(slot, True)
+
+    def _resolve_with_fallback(self, job: _Job):
+        """Complete a job's future without running it"""
+        if not job.future.set_running_or_notify_cancel():
+            return
+        try:
+            job.future.set_result(job.fallback() if job.fallback else None)
+        except Exception as e:
+            job.future.set_exception(e)
+
+    def _worker(self):
+        """Worker loop: pop the most urgent job and run it"""
+        while True:
+            with self._cond:
+                while not self._queue and not self._shutdown:
+                    self._cond.wait()
+                if self._shutdown and not self._queue:
+                    return
+                priority, _, job = heapq.heappop(self._queue)
+                self._depth_by_priority[priority] -= 1
+
+                expired = time.monotonic() > job.deadline
+                if expired:
+                    self._stats["expired"] += 1
+                else:
+                    self._running += 1
+
+            if expired:
+                self._resolve_with_fallback(job)
+                continue
+
+            started = time.monotonic()
+            outcome = None
+            try:
+                if job.future.set_running_or_notify_cancel():
+                    try:
+                        job.future.set_result(job.context.run(self._call, job, started - job.queued))
+                        outcome = "completed"
+                    except Exception as e:
+                        job.future.set_exception(e)
+                        outcome = "failed"
+            finally:
+                elapsed = time.monotonic() - started
+                with self._cond:
+                    self._running -= 1
+                    if outcome:
+                        self._stats[outcome] += 1
+                        if job.model_backed:
+                            self._record_service_time(elapsed)
+
+    @staticmethod
+    def _call(job: _Job, waited: float):
+        add_span("scheduler_queue", waited)
+        _current_job.set(job)
+        return job.fn(*job.args, **job.kwargs)
+
+    def _record_service_time(self, elapsed: float):
+        """Update the exponentially weighted service time (lock held)"""
+        if self._service_time is None:
+            self._service_time = elapsed
+        else:
+            self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+
+    def queue_depth(self) -> int:
+        """Number of jobs waiting to run"""
+        with self._cond:
+            return len(self._queue) + len(self._async_queue)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of queue depth, in-flight jobs and outcome counters"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "queue_depth": len(self._queue),
+                "queue_limit": self.max_queue,
+                "running": self._running,
+                "workers": self.workers,
+                "async_queue_depth": len(self._async_queue),
+                "async_running": self._async_running,
+                "async_slots": self.async_slots,
+                "service_time_ms": round(self._service_time * 1000, 1) if self._service_time else None,
+            })
+            return stats
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting work; queued jobs still drain"""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+
+def _hand_over(slot, granted: bool):
+    """Wake a waiting coroutine job, on its own event loop: granted a slot, or evicted"""
+    slot.get_loop().call_soon_threadsafe(slot.set_result, granted)
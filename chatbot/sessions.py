@@ -0,0 +1,35 @@
+"""
+ConvoAI Web Sessions - Cookie session ids mapped to conversation user ids
+"""
+
+import re
+import secrets
+from typing import Optional
+
+SESSION_COOKIE = "convoai_sid"
+SESSION_MAX_AGE = 30 * 24 * 3600
+
+# /chat/batch user ids are namespaced so scripts can't write into browser sessions
+BATCH_USER_PREFIX = "batch_"
+
+# What new_session_id() produces; anything else in the cookie is replaced
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(18)
+
+
+def valid_session_id(value: Optional[str]) -> bool:
+    return bool(value) and _SESSION_ID.match(value) is not None
+
+
+def user_id_for(session_id: str) -> str:
+    """Memory/brain user id for a browser session"""
+    return f"web_{session_id}"
+
+
+def session_cookie(session_id: str) -> str:
+    """Set-Cookie header value for servers without a cookie helper (the ASGI app)"""
+    return (f"{SESSION_COOKIE}={session_id}; Max-Age={SESSION_MAX_AGE}; Path=/; "
+            f"HttpOnly; SameSite=Lax")
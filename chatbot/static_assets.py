@@ -0,0 +1,184 @@
+"""
+ConvoAI Static Assets - Fingerprinted, precompressed responses for the web interface
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import brotli
+
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+CONTENT_TYPES = {
+    ".css": "text/css; charset=utf-8",
+    ".js": "application/javascript; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+    ".ico": "image/x-icon",
+}
+HTML = CONTENT_TYPES[".html"]
+
+# Hashed URLs never change content, so browsers may keep them for a year
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Everything else is revalidated with If-None-Match on each use
+REVALIDATE = "no-cache"
+
+# Below this, compression framing costs more than it saves
+MIN_COMPRESS_SIZE = 256
+
+
+class Precompressed:
+    """A response body encoded once (identity, gzip and brotli if installed).
+
+    respond() turns request headers into (status, headers, body) without
+    touching the bytes again: a matching If-None-Match gets an empty 304,
+    otherwise the smallest encoding the client accepts is returned.
+    """
+
+    __slots__ = ("content_type", "cache_control", "digest", "bodies")
+
+    def __init__(self, body: bytes, content_type: str, cache_control: str = REVALIDATE):
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        self.bodies = {"identity": body}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            if HAS_BROTLI:
+                self._add("br", brotli.compress(body, quality=11))
+            self._add("gzip", gzip.compress(body, compresslevel=9, mtime=0))
+
+    def _add(self, encoding: str, body: bytes):
+        if len(body) < len(self.bodies["identity"]):
+            self.bodies[encoding] = body
+
+    def etag(self, encoding: str = "identity") -> str:
+        # Each encoding is a different byte sequence, so it gets its own strong tag
+        suffix = "" if encoding == "identity" else f"-{encoding}"
+        return f'"{self.digest}{suffix}"'
+
+    def not_modified(self, if_none_match: Optional[str]) -> bool:
+        """True if the client already holds this content in any encoding"""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag.strip('"').split("-", 1)[0] == self.digest:
+                return True
+        return False
+
+    def negotiate(self, accept_encoding: Optional[str]) -> str:
+        """Smallest available encoding the client accepts"""
+        accepted = set()
+        for part in (accept_encoding or "").split(","):
+            coding, *params = part.split(";")
+            quality = 1.0
+            for param in params:
+                key, _, value = param.strip().partition("=")
+                if key.strip() == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            if quality > 0:
+                accepted.add(coding.strip().lower())
+        for encoding in ("br", "gzip"):
+            if encoding in self.bodies and (encoding in accepted or "*" in accepted):
+                return encoding
+        return "identity"
+
+    def respond(self, if_none_match: Optional[str] = None,
+                accept_encoding: Optional[str] = None) -> Tuple[int, List[Tuple[str, str]], bytes]:
+        """(status, headers, body) for a GET with these request headers"""
+        encoding = self.negotiate(accept_encoding)
+        headers = [("ETag", self.etag(encoding)), ("Cache-Control", self.cache_control)]
+        if len(self.bodies) > 1:
+            headers.append(("Vary", "Accept-Encoding"))
+        if self.not_modified(if_none_match):
+            return 304, headers, b""
+
+        body = self.bodies[encoding]
+        headers.append(("Content-Type", self.content_type))
+        headers.append(("Content-Length", str(len(body))))
+        if encoding != "identity":
+            headers.append(("Content-Encoding", encoding))
+        return 200, headers, body
+
+
+class StaticAssets:
+    """Files from one directory, each served under a content-hashed name.
+
+    chat.css is published as chat.<hash>.css with a year-long immutable
+    cache lifetime; url("chat.css") gives the current hashed URL for
+    templates. The plain name is still served, but revalidated each time.
+    """
+
+    def __init__(self, directory: str, prefix: str = "/static/"):
+        self.directory = directory
+        self.prefix = prefix
+        self.urls: Dict[str, str] = {}
+        self.files: Dict[str, Precompressed] = {}
+        self.load()
+
+    def load(self):
+        """(Re)read every file in the directory"""
+        urls, files = {}, {}
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if not os.path.isfile(path) or name.startswith("."):
+                continue
+            with open(path, "rb") as f:
+                body = f.read()
+            stem, ext = os.path.splitext(name)
+            content_type = CONTENT_TYPES.get(ext, "application/octet-stream")
+
+            hashed = Precompressed(body, content_type, IMMUTABLE)
+            hashed_name = f"{stem}.{hashed.digest[:10]}{ext}"
+            files[hashed_name] = hashed
+            files[name] = Precompressed(body, content_type, REVALIDATE)
+            urls[name] = self.prefix + hashed_name
+        self.urls, self.files = urls, files
+
+    def url(self, name: str) -> str:
+        return self.urls[name]
+
+    def get(self, name: str) -> Optional[Precompressed]:
+        return self.files.get(name)
+
+
+class RenderedPage:
+    """A page rendered once and re-rendered only when version() changes.
+
+    render() returns the HTML text; version() must be cheap since it is
+    checked on every request.
+    """
+
+    def __init__(self, render: Callable[[], str], version: Callable[[], object],
+                 content_type: str = HTML):
+        self.render = render
+        self.version = version
+        self.content_type = content_type
+        self._page: Optional[Tuple[object, Precompressed]] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Precompressed:
+        version = self.version()
+        page = self._page
+        if page is None or page[0] != version:
+            with self._lock:
+                page = self._page
+                if page is None or page[0] != version:
+                    body = self.render().encode("utf-8")
+                    page = (version, Precompressed(body, self.content_type, REVALIDATE))
+                    self._page = page
+        return page[1]
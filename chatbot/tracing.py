@@ -0,0 +1,234 @@
+"""
+ConvoAI Tracing - Per-request spans and an on-demand stack sampler
+"""
+
+import collections
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# The trace of the request being handled; copied into worker threads with the context
+_current: contextvars.ContextVar = contextvars.ContextVar("convoai_trace", default=None)
+_depth: contextvars.ContextVar = contextvars.ContextVar("convoai_span_depth", default=0)
+
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# Most recent traces over TRACE_SLOW_MS, newest last (/admin/traces)
+SLOW_TRACES: "collections.deque[Trace]" = collections.deque(maxlen=100)
+_slow_log_lock = threading.Lock()
+
+
+def new_request_id(candidate: Optional[str] = None) -> str:
+    """The caller's X-Request-ID if it looks sane, otherwise a fresh one"""
+    if candidate and _REQUEST_ID.match(candidate):
+        return candidate
+    return uuid.uuid4().hex[:16]
+
+
+class Trace:
+    """The spans recorded while handling one request (or one GUI turn)"""
+
+    def __init__(self, name: str, request_id: Optional[str] = None):
+        self.name = name
+        self.request_id = new_request_id(request_id)
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+        # (name, depth, start offset, duration); appended from any thread working on the request
+        self.spans: List[tuple] = []
+
+    def add(self, name: str, depth: int, start: float, duration: float):
+        self.spans.append((name, depth, start - self.started, duration))
+
+    def breakdown(self) -> Dict[str, float]:
+        """Total seconds per span name, slowest first"""
+        totals = collections.Counter()
+        for name, _, _, duration in self.spans:
+            totals[name] += duration
+        return dict(totals.most_common())
+
+    def summary(self) -> str:
+        parts = ", ".join(f"{name} {seconds * 1e3:.0f}ms" for name, seconds in self.breakdown().items())
+        return f"{self.name} {self.duration * 1e3:.0f}ms [{self.request_id}]: {parts or 'no spans'}"
+
+    def to_dict(self) -> Dict:
+        return {
+            "request_id": self.request_id,
+            "name": self.name,
+            "started_at": round(self.started_at, 3),
+            "duration_ms": round((self.duration or 0.0) * 1e3, 2),
+            "spans": [{"name": name, "depth": depth, "start_ms": round(start * 1e3, 2),
+                       "duration_ms": round(duration * 1e3, 2)}
+                      for name, depth, start, duration in sorted(self.spans, key=lambda s: s[2])],
+        }
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+def begin(name: str, request_id: Optional[str] = None) -> Trace:
+    """Start the root trace for a request in the current context"""
+    trace_ = Trace(name, request_id)
+    _current.set(trace_)
+    _depth.set(0)
+    return trace_
+
+
+def finish(trace_: Trace):
+    """End a root trace, logging its breakdown if it was slow"""
+    trace_.duration = time.perf_counter() - trace_.started
+    if _current.get() is trace_:
+        _current.set(None)
+    if Settings.TRACE_SLOW_MS and trace_.duration * 1e3 >= Settings.TRACE_SLOW_MS:
+        SLOW_TRACES.append(trace_)
+        logger.warning("Slow request %s", trace_.summary())
+        if Settings.TRACE_SLOW_LOG:
+            line = json.dumps(trace_.to_dict())
+            with _slow_log_lock, open(Settings.TRACE_SLOW_LOG, "a", encoding="utf-8") as log:
+                log.write(line + "\n")
+
+
+class span(contextlib.ContextDecorator):
+    """with span("name"): ... or @span("name") - records a span in the current trace.
+
+    Without an active trace only observe (if given) is called, so spans can
+    sit on hot paths. Don't hold one open across a generator's yields.
+    """
+
+    def __init__(self, name: str, observe: Optional[Callable[[float], None]] = None):
+        self.name = name
+        self.observe = observe
+
+    def _recreate_cm(self):
+        return span(self.name, self.observe)
+
+    def __enter__(self):
+        self._trace = _current.get()
+        if self._trace is not None:
+            self._parent_depth = _depth.get()
+            _depth.set(self._parent_depth + 1)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._start
+        if self.observe is not None:
+            self.observe(elapsed)
+        if self._trace is not None:
+            self._trace.add(self.name, self._parent_depth, self._start, elapsed)
+            _depth.set(self._parent_depth)
+        return False
+
+
+def add_span(name: str, duration: float):
+    """Record a span that just ended (e.g. time spent waiting in a queue)"""
+    trace_ = _current.get()
+    if trace_ is not None:
+        trace_.add(name, _depth.get(), time.perf_counter() - duration, duration)
+
+
+@contextlib.contextmanager
+def trace(name: str, request_id: Optional[str] = None):
+    """A span inside the current request's trace, or a new root trace if there is none"""
+    trace_ = _current.get()
+    if trace_ is not None:
+        with span(name):
+            yield trace_
+        return
+    trace_ = begin(name, request_id)
+    try:
+        yield trace_
+    finally:
+        finish(trace_)
+
+
+class StackSampler:
+    """Low-overhead sampling profiler writing flamegraph-compatible collapsed stacks.
+
+    A background thread reads every thread's Python stack with
+    sys._current_frames() each interval and counts identical stacks; the
+    output file has one "thread;outer;...;inner count" line per stack, ready
+    for flamegraph.pl or speedscope. One profile at a time per process.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.last: Optional[Dict] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, path: str) -> str:
+        """Sample for `seconds` in the background, then write `path`"""
+        with self._lock:
+            if self.running:
+                raise RuntimeError("a profile is already running")
+            self._thread = threading.Thread(target=self._run, args=(seconds, path),
+                                            name="stack-sampler", daemon=True)
+            self._thread.start()
+        return path
+
+    def _run(self, seconds: float, path: str):
+        me = threading.get_ident()
+        counts = collections.Counter()
+        labels = {}  # code object -> frame label; avoids re-formatting hot frames
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = (f"{code.co_name} "
+                                                f"({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                counts[";".join(reversed(stack))] += 1
+            samples += 1
+            time.sleep(self.interval)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        partial = path + ".tmp"
+        with open(partial, "w", encoding="utf-8") as out:
+            for stack, count in counts.most_common():
+                out.write(f"{stack} {count}\n")
+        os.replace(partial, path)
+        self.last = {"path": path, "seconds": round(time.perf_counter() - started, 2),
+                     "samples": samples, "stacks": len(counts)}
+        logger.info("Profile written to %s (%d samples)", path, samples)
+
+    def status(self) -> Dict:
+        return {"running": self.running, "interval": self.interval, "last": self.last}
+
+
+SAMPLER = StackSampler(Settings.PROFILE_INTERVAL)
+
+
+def start_profile(seconds: float) -> str:
+    """Profile this process for `seconds`; returns the collapsed-stack file it will write"""
+    seconds = min(max(float(seconds), 0.1), Settings.PROFILE_MAX_SECONDS)
+    name = f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.collapsed"
+    return SAMPLER.start(seconds, os.path.join(Settings.PROFILE_DIR, name))
@@ -1,16 +1,65 @@
 """
 Fixed memory system compatible with both brain.py and web app
 """
+import logging
+import threading
+import time
 from datetime import datetime
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from .metrics import stage
+from .sessions import SESSION_MAX_AGE
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
 
 class ConversationMemory:
-    def __init__(self):
+    """Conversations and profiles for at most max_users users, in this process.
+
+    Every web client that doesn't send the session cookie back is a new
+    user, so users idle for longer than idle_ttl (the cookie's lifetime)
+    are dropped, and past max_users the least recently active go first.
+    Eviction listeners get the user id, so caches kept per user can follow.
+    """
+
+    def __init__(self, max_users=Settings.WEB_MEMORY_MAX_USERS, idle_ttl=SESSION_MAX_AGE):
         self.conversations = defaultdict(list)
         self.user_profiles = defaultdict(dict)
-        print("💾 Fixed memory system initialized!")
+        self.max_users = max_users
+        self.idle_ttl = idle_ttl
+        self._last_active = OrderedDict()  # user_id -> monotonic time, least recent first
+        self._evict_listeners = []
+        self._lock = threading.Lock()
+        logger.info("In-memory conversation store ready")
+
+    def add_evict_listener(self, callback):
+        """Call callback(user_id) whenever a user's state is dropped"""
+        self._evict_listeners.append(callback)
+
+    def _touch(self, user_id):
+        """Mark a user active (on every write) and drop idle or excess users"""
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            self._last_active[user_id] = now
+            self._last_active.move_to_end(user_id)
+            while self._last_active:
+                oldest, active = next(iter(self._last_active.items()))
+                if len(self._last_active) <= self.max_users and now - active <= self.idle_ttl:
+                    break
+                del self._last_active[oldest]
+                self.conversations.pop(oldest, None)
+                self.user_profiles.pop(oldest, None)
+                evicted.append(oldest)
+        for evicted_user in evicted:
+            logger.debug("Evicted idle user %s", evicted_user)
+            for callback in self._evict_listeners:
+                try:
+                    callback(evicted_user)
+                except Exception:
+                    logger.exception("User eviction listener failed")
     
     # For BRAIN.PY (stores individual messages)
+    @stage("memory_write")
     def add_message(self, user_id, role, message, session_id=None):
         """Add individual message (used by brain.py)"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -20,9 +69,11 @@ class ConversationMemory:
             'timestamp': timestamp,
             'session_id': session_id
         }
+        self._touch(user_id)
         self.conversations[user_id].append(msg_data)
-        print(f"💾 Added {role} message for {user_id}")
+        logger.debug("Added %s message for %s", role, user_id)
     
+    @stage("memory_read")
     def get_recent_context(self, user_id, limit=10):
         """Get recent context (used by brain.py)"""
         if user_id not in self.conversations:
@@ -34,6 +85,7 @@ class ConversationMemory:
                 'timestamp': conv['timestamp']}
                for conv in recent]
     
+    @stage("memory_read")
     def get_user_context(self, user_id):
         """Get context string for AI (used by brain.py)"""
         if user_id not in self.conversations:
@@ -58,6 +110,7 @@ class ConversationMemory:
         self.add_message(user_id, 'user', message)
         self.add_message(user_id, 'assistant', response)
     
+    @stage("memory_read")
     def get_conversation_history(self, user_id, limit=10):
         """Get conversation history for web app"""
         if user_id not in self.conversations:
@@ -80,21 +133,33 @@ class ConversationMemory:
         return history[-limit:]  # Return last 'limit' conversations
     
     # Other required methods
+    @stage("memory_read")
     def get_user_profile(self, user_id):
         """Get user profile"""
         return self.user_profiles.get(user_id, {})
     
+    @stage("memory_write")
     def update_user_name(self, user_id, name):
         """Update user name"""
+        self._touch(user_id)
         if user_id not in self.user_profiles:
             self.user_profiles[user_id] = {}
         self.user_profiles[user_id]['name'] = name
-        print(f"💾 Updated name for {user_id}: {name}")
+        logger.debug("Updated name for %s", user_id)
     
+    @stage("memory_write")
     def add_user_interest(self, user_id, interest_text):
         """Add user interest"""
+        self._touch(user_id)
         if user_id not in self.user_profiles:
             self.user_profiles[user_id] = {}
         if 'interests' not in self.user_profiles[user_id]:
             self.user_profiles[user_id]['interests'] = []
         self.user_profiles[user_id]['interests'].append(interest_text)
+
+    @stage("memory_write")
+    def add_user_interests(self, user_id, interests, current=None):
+        """Add already-extracted interests that aren't in the profile yet"""
+        self._touch(user_id)
+        known = self.user_profiles[user_id].setdefault('interests', [])
+        known.extend(interest for interest in interests if interest not in known)
@@ -1,45 +1,119 @@
 """
-ConvoAI - Intelligent Chatbot with Memory
-Main application entry point
+ConvoAI Settings - Central configuration
+
+Every value can be overridden with a CONVOAI_<NAME> environment variable.
 """
 
-from gui.chat_interface import ChatInterface
-from chatbot.brain import ConvoAIBrain
-from chatbot.memory import ConversationMemory
-from config.settings import Settings
-import sys
+import os
+
+
+def _env(name: str, default):
+    """Read a CONVOAI_* environment override, coerced to the default's type"""
+    value = os.environ.get(f"CONVOAI_{name}")
+    if value is None:
+        return default
+    if isinstance(default, bool):
+        return value.lower() in ("1", "true", "yes", "on")
+    return type(default)(value)
+
 
+class Settings:
+    # Paths
+    DATA_DIR = _env("DATA_DIR", "data")
+    MEMORY_DB_PATH = _env("MEMORY_DB_PATH", os.path.join(DATA_DIR, "conversations.db"))
+    PERSONALITIES_FILE = _env("PERSONALITIES_FILE", os.path.join(DATA_DIR, "personalities.json"))
+    # Seconds between checks of the personalities file for edits (0 = check on every read)
+    PERSONALITIES_CHECK_INTERVAL = _env("PERSONALITIES_CHECK_INTERVAL", 1.0)
 
-def main():
-    print("🤖 Starting ConvoAI...")
-    print("=" * 50)
+    # Web server (serve.py)
+    WEB_HOST = _env("WEB_HOST", "0.0.0.0")
+    WEB_PORT = _env("WEB_PORT", 5001)
+    WEB_SERVER = _env("WEB_SERVER", "uvicorn")  # "uvicorn" (ASGI) or "flask" (threaded WSGI)
+    WEB_WORKERS = _env("WEB_WORKERS", 1)
+    # "memory" keeps conversations per process; "sqlite" shares them between workers
+    WEB_MEMORY_BACKEND = _env("WEB_MEMORY_BACKEND", "memory")
+    # Users the "memory" backend keeps (least recently active dropped first; idle ones expire
+    # with their session cookie)
+    WEB_MEMORY_MAX_USERS = _env("WEB_MEMORY_MAX_USERS", 10000)
+    # Locks serializing each browser session's turns (users hash onto these)
+    WEB_LOCK_STRIPES = _env("WEB_LOCK_STRIPES", 64)
+    # /ws WebSocket chat (ASGI server only): per-worker cap, idle close, protocol pings
+    WS_MAX_CONNECTIONS = _env("WS_MAX_CONNECTIONS", 1000)
+    WS_IDLE_TIMEOUT = _env("WS_IDLE_TIMEOUT", 300.0)
+    WS_PING_INTERVAL = _env("WS_PING_INTERVAL", 20.0)
+    # Extra page origins allowed to open /ws (comma-separated, e.g. "https://chat.example.com");
+    # by default only pages served from the request's own Host may
+    WS_ALLOWED_ORIGINS = _env("WS_ALLOWED_ORIGINS", "")
 
-    try:
-        # Ensure required directories exist
-        Settings.ensure_directories()
+    # Local model inference backend: "torch" or "onnx"
+    INFERENCE_BACKEND = _env("INFERENCE_BACKEND", "torch")
+    ONNX_CACHE_DIR = _env("ONNX_CACHE_DIR", os.path.join(DATA_DIR, "onnx"))
+    ONNX_THREADS = _env("ONNX_THREADS", 0)
 
-        # Initialize components
-        print("💾 Initializing memory system...")
-        memory = ConversationMemory()
+    # Ollama server
+    OLLAMA_URL = _env("OLLAMA_URL", "http://localhost:11434")
+    OLLAMA_MODEL = _env("OLLAMA_MODEL", "tinyllama")
+    OLLAMA_POOL_SIZE = _env("OLLAMA_POOL_SIZE", 8)
+    OLLAMA_CONNECT_TIMEOUT = _env("OLLAMA_CONNECT_TIMEOUT", 2.0)
+    OLLAMA_READ_TIMEOUT = _env("OLLAMA_READ_TIMEOUT", 10.0)
+    OLLAMA_RETRIES = _env("OLLAMA_RETRIES", 2)
+    # Coalesce identical in-flight generations through the asyncio client (needs aiohttp)
+    OLLAMA_ASYNC = _env("OLLAMA_ASYNC", True)
+    OLLAMA_MAX_CONCURRENCY = _env("OLLAMA_MAX_CONCURRENCY", 4)
+    # How long Ollama keeps the model loaded after a request ("30m", "-1" = forever)
+    OLLAMA_KEEP_ALIVE = _env("OLLAMA_KEEP_ALIVE", "30m")
+    OLLAMA_PRELOAD = _env("OLLAMA_PRELOAD", True)
+    # Users whose Ollama context (KV token history) is kept for follow-up turns
+    OLLAMA_CONTEXT_USERS = _env("OLLAMA_CONTEXT_USERS", 256)
+    OLLAMA_CONTEXT_MAX_TOKENS = _env("OLLAMA_CONTEXT_MAX_TOKENS", 2048)
+    # Circuit breaker: go straight to fallbacks while Ollama is down
+    BREAKER_FAILURE_THRESHOLD = _env("BREAKER_FAILURE_THRESHOLD", 3)
+    BREAKER_RECOVERY_TIMEOUT = _env("BREAKER_RECOVERY_TIMEOUT", 5.0)
+    BREAKER_PROBE_INTERVAL = _env("BREAKER_PROBE_INTERVAL", 2.0)
+    BREAKER_SLOW_CALL = _env("BREAKER_SLOW_CALL", 0.0)  # seconds; 0 disables slow-call tripping
 
-        print("🧠 Initializing AI brain...")
-        brain = ConvoAIBrain(memory)
+    # Web /chat backends in priority order ("ollama", "local"); more than one enables hedging
+    WEB_BACKENDS = _env("WEB_BACKENDS", "ollama")
+    HEDGE_QUANTILE = _env("HEDGE_QUANTILE", 0.95)
+    HEDGE_BUDGET = _env("HEDGE_BUDGET", 0.1)  # max fraction of requests that get a hedge
+    HEDGE_INITIAL_DELAY = _env("HEDGE_INITIAL_DELAY", 2.0)  # until enough latency samples exist
+    ROUTER_WORKERS = _env("ROUTER_WORKERS", 8)
 
-        print("🎨 Starting chat interface...")
-        app = ChatInterface(brain)
+    # Inference scheduler
+    SCHEDULER_WORKERS = _env("SCHEDULER_WORKERS", 2)
+    SCHEDULER_MAX_QUEUE = _env("SCHEDULER_MAX_QUEUE", 32)
+    # Async chats (ASGI server) running at once on the event loop; more wait in the queue
+    SCHEDULER_ASYNC_SLOTS = _env("SCHEDULER_ASYNC_SLOTS", OLLAMA_MAX_CONCURRENCY)
+    # Flask /chat/stream replies generating at once; more wait up to INTERACTIVE_DEADLINE
+    WEB_MAX_STREAMS = _env("WEB_MAX_STREAMS", OLLAMA_MAX_CONCURRENCY)
+    INTERACTIVE_DEADLINE = _env("INTERACTIVE_DEADLINE", 15.0)
+    BATCH_DEADLINE = _env("BATCH_DEADLINE", 120.0)
 
-        print("🚀 ConvoAI is ready!")
-        print("=" * 50)
+    # /chat/batch bulk traffic: users served at once (capped at SCHEDULER_WORKERS - 1 so
+    # interactive chats always find a free scheduler worker), and local-model batch size
+    BATCH_CONCURRENCY = _env("BATCH_CONCURRENCY", 3)
+    BATCH_MAX_ITEMS = _env("BATCH_MAX_ITEMS", 10000)
+    LOCAL_BATCH_SIZE = _env("LOCAL_BATCH_SIZE", 8)
 
-        # Start the application
-        app.run()
+    # Logging (chatbot.log): DEBUG adds per-turn details; "json" writes one object per line
+    LOG_LEVEL = _env("LOG_LEVEL", "INFO")
+    LOG_FORMAT = _env("LOG_FORMAT", "text")
 
-    except KeyboardInterrupt:
-        print("\n👋 Thanks for using ConvoAI!")
-    except Exception as e:
-        print(f"❌ Error starting ConvoAI: {e}")
-        sys.exit(1)
+    # Tracing: requests slower than this (ms, 0 = off) have their span breakdown logged,
+    # and appended as JSON lines to TRACE_SLOW_LOG if set
+    TRACE_SLOW_MS = _env("TRACE_SLOW_MS", 2000.0)
+    TRACE_SLOW_LOG = _env("TRACE_SLOW_LOG", "")
+    # /admin/* routes (profiler, slow traces) need this in X-Admin-Token; empty disables them
+    ADMIN_TOKEN = _env("ADMIN_TOKEN", "")
+    PROFILE_DIR = _env("PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
+    PROFILE_INTERVAL = _env("PROFILE_INTERVAL", 0.005)
+    PROFILE_MAX_SECONDS = _env("PROFILE_MAX_SECONDS", 120.0)
 
+    # Desktop GUI: messages kept in the chat display, and how many scrolling up loads at a time
+    GUI_MAX_MESSAGES = _env("GUI_MAX_MESSAGES", 200)
+    GUI_SCROLLBACK_PAGE = _env("GUI_SCROLLBACK_PAGE", 50)
 
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+    @classmethod
+    def ensure_directories(cls):
+        """Create data directories if they don't exist"""
+        os.makedirs(cls.DATA_DIR, exist_ok=True)
@@ -2,22 +2,82 @@
 ConvoAI Chat Interface - Modern GUI for the chatbot
 """
 
+import logging
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
-import threading
 from datetime import datetime
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Callable, Optional
+from chatbot.scheduler import InferenceScheduler, INTERACTIVE
+from chatbot.tracing import trace
+from config.settings import Settings
+from .transcript import Transcript
 
 if TYPE_CHECKING:
     from chatbot.brain import ConvoAIBrain
 
+logger = logging.getLogger(__name__)
+
+
+class _Turn:
+    """A message being answered: the worker queues reply text, the Tk thread draws it"""
+
+    def __init__(self, message: str, user_block):
+        self.message = message
+        self.user_block = user_block
+        self.reply_block = None
+        self.chunks = queue.SimpleQueue()
+        self.stored = ()
+        self.failed = False
+        self.future = None
+        # Stops the generation at its next token, or before it starts
+        self.cancel = threading.Event()
+        # Set last by the worker side; everything it queued is in chunks by then
+        self.result = None
+
+
+class _Startup:
+    """Background startup progress: written by the startup thread, polled by the Tk thread"""
+
+    def __init__(self):
+        self.stage = "Starting up..."
+        self.welcome = None
+        self.newest_id = None
+        # Set once memory is open and the brain exists (after welcome and newest_id)
+        self.brain = None
+        self.error = None
+        # Set last, when the model has loaded or failed to
+        self.done = False
+
 
 class ChatInterface:
-    def __init__(self, brain: 'ConvoAIBrain'):
-        self.brain = brain
+    # Streamed text is drawn at most once per frame, however fast tokens arrive
+    FRAME_MS = 33
+    # How often the status bar follows startup progress
+    STARTUP_POLL_MS = 100
+
+    def __init__(self, brain: Optional['ConvoAIBrain'] = None,
+                 brain_factory: Optional[Callable[[], 'ConvoAIBrain']] = None):
+        """Pass a ready brain, or a brain_factory: the window then shows at once and the
+        brain is built and its model loaded on a background thread"""
+        self.brain = None
         self.user_id = "default_user"
         self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
 
+        # One worker: parallel generations on the local model only thrash the CPU
+        self.scheduler = InferenceScheduler(
+            workers=1,
+            max_queue=Settings.SCHEDULER_MAX_QUEUE,
+            timeouts={INTERACTIVE: Settings.INTERACTIVE_DEADLINE},
+            name="gui-inference"
+        )
+        # Turns submitted and not yet answered, oldest first
+        self.turns = []
+        # Turns typed before the model was ready; submitted once it is
+        self.waiting = []
+        self.ready = False
+
         # Create main window
         self.root = tk.Tk()
         self.root.title("ConvoAI - Intelligent Chatbot 🤖")
@@ -30,10 +90,80 @@ class ChatInterface:
         # Create GUI elements
         self.create_widgets()
 
-        # Load user profile
-        self.load_user_welcome()
+        if brain is not None:
+            self.attach_brain(brain, self.welcome_text(brain), Transcript.newest_id(brain.memory, self.user_id))
+            self.ready = True
+        else:
+            self._startup = _Startup()
+            self.status_bar.config(text=f"⏳ {self._startup.stage}")
+            threading.Thread(target=self._start_up, args=(brain_factory,),
+                             name="gui-startup", daemon=True).start()
+            self.root.after(self.STARTUP_POLL_MS, self._poll_startup)
+
+        logger.debug("Chat interface initialized")
+
+    def _start_up(self, brain_factory: Callable[[], 'ConvoAIBrain']):
+        """Build the brain, read the profile and load the model (startup thread)"""
+        startup = self._startup
+        try:
+            startup.stage = "Opening memory..."
+            brain = brain_factory()
+            startup.stage = "Loading your profile..."
+            startup.welcome = self.welcome_text(brain)
+            startup.newest_id = Transcript.newest_id(brain.memory, self.user_id)
+            startup.brain = brain
+            if brain.loading_status == "Not started":
+                brain.load_model()
+        except Exception as e:
+            logger.exception("Startup failed")
+            startup.error = e
+        finally:
+            startup.done = True
+
+    def _poll_startup(self):
+        """Follow startup from the Tk thread: attach the brain, then submit waiting turns"""
+        startup = self._startup
+        done = startup.done
+        if startup.brain is not None and self.brain is None:
+            self.attach_brain(startup.brain, startup.welcome, startup.newest_id)
+        if done:
+            self._on_ready(startup.error)
+            return
+
+        stage = startup.stage if self.brain is None else f"Loading AI model: {self.brain.loading_status}"
+        if self.waiting:
+            stage += f" ({len(self.waiting)} waiting)"
+        self.status_bar.config(text=f"⏳ {stage}")
+        self.root.after(self.STARTUP_POLL_MS, self._poll_startup)
+
+    def _on_ready(self, error: Optional[Exception]):
+        waiting, self.waiting = self.waiting, []
+        if error is not None or self.brain is None:
+            self.add_system_message(f"❌ ConvoAI failed to start: {error}")
+            for turn in waiting:
+                self.end_turn(turn)
+            self.status_bar.config(text="❌ Startup failed")
+            return
 
-        print("🎨 Chat interface initialized!")
+        self.ready = True
+        if not self.brain.is_ai_ready():
+            self.add_system_message(f"⚠️ {self.brain.get_model_status()} - replies will be limited")
+        for turn in waiting:
+            self._submit(turn)
+        if self.turns:
+            self.status_bar.config(text="🤔 ConvoAI is thinking...")
+            self.send_button.config(state=tk.DISABLED)
+        else:
+            self.status_bar.config(text="Ready to chat! 💬")
+
+    def attach_brain(self, brain: 'ConvoAIBrain', welcome: str, newest_id: Optional[int]):
+        """Start using a brain whose memory is open (Tk thread)"""
+        self.brain = brain
+        self.personality_combo.config(values=brain.personality_manager.available_personalities(),
+                                      state="readonly")
+        self.personality_combo.set(brain.current_personality)
+        self.transcript.attach(brain.memory, newest_id)
+        self.add_system_message(welcome)
 
     def setup_styles(self):
         """Configure modern styling"""
@@ -101,11 +231,9 @@ class ChatInterface:
         self.personality_combo = ttk.Combobox(
             personality_frame,
             textvariable=self.personality_var,
-            values=self.brain.personality_manager.available_personalities(),
-            state="readonly",
+            state="disabled",  # until the brain is attached
             width=15
         )
-        self.personality_combo.set(self.brain.current_personality)
         self.personality_combo.bind("<<ComboboxSelected>>", self.on_personality_change)
         self.personality_combo.pack(side=tk.LEFT)
 
@@ -123,7 +251,6 @@ class ChatInterface:
             fg=self.colors["text_light"],
             insertbackground=self.colors["text_light"],
             selectbackground=self.colors["accent"],
-            state=tk.DISABLED,
             padx=10,
             pady=10
         )
@@ -166,6 +293,9 @@ class ChatInterface:
             justify=tk.RIGHT
         )
 
+        # Bounded window over the conversation; older history pages in on scroll
+        self.transcript = Transcript(self.chat_display, None, self.user_id)
+
     def create_input_area(self, parent):
         """Create message input area"""
         input_frame = tk.Frame(parent, bg=self.colors["bg_dark"])
@@ -200,6 +330,21 @@ class ChatInterface:
         )
         self.send_button.pack(side=tk.RIGHT)
 
+        # Stop button: abandons the reply being generated
+        self.stop_button = tk.Button(
+            input_frame,
+            text="⏹",
+            command=self.stop_generation,
+            bg=self.colors["bg_light"],
+            fg=self.colors["text_light"],
+            font=("Arial", 10),
+            relief=tk.FLAT,
+            width=3,
+            state=tk.DISABLED,
+            cursor="hand2"
+        )
+        self.stop_button.pack(side=tk.RIGHT, padx=(0, 10))
+
         # Quick actions
         actions_frame = tk.Frame(input_frame, bg=self.colors["bg_dark"])
         actions_frame.pack(side=tk.RIGHT, padx=(0, 10))
@@ -242,8 +387,13 @@ class ChatInterface:
 
     def load_user_welcome(self):
         """Load user profile and show welcome message"""
-        profile = self.brain.memory.get_user_profile(self.user_id)
-        stats = self.brain.memory.get_conversation_stats(self.user_id)
+        if self.brain is not None:
+            self.add_system_message(self.welcome_text(self.brain))
+
+    def welcome_text(self, brain: 'ConvoAIBrain') -> str:
+        """The welcome message for the user's profile (SQLite reads: fine off the Tk thread)"""
+        profile = brain.memory.get_user_profile(self.user_id)
+        stats = brain.memory.get_conversation_stats(self.user_id)
 
         welcome_msg = "🤖 ConvoAI is ready to chat!"
 
@@ -253,30 +403,17 @@ class ChatInterface:
         if stats["has_history"]:
             welcome_msg += f" We've had {stats['total_messages']} messages together."
 
-        personality_name = self.brain.get_current_personality()
+        personality_name = brain.get_current_personality()
         welcome_msg += f"\n🎭 Current personality: {personality_name}"
 
         if profile.get("interests"):
             welcome_msg += f"\n💡 I remember you're interested in: {', '.join(profile['interests'])}"
 
-        self.add_system_message(welcome_msg)
-
-    def add_message(self, sender: str, message: str, tag: str):
-        """Add a message to the chat display"""
-        self.chat_display.config(state=tk.NORMAL)
-
-        # Add timestamp
-        timestamp = datetime.now().strftime("%H:%M")
-
-        # Add message with styling
-        if sender:
-            self.chat_display.insert(tk.END, f"\n{sender} [{timestamp}]\n", "timestamp")
-
-        self.chat_display.insert(tk.END, f"{message}\n\n", tag)
+        return welcome_msg
 
-        # Auto-scroll to bottom
-        self.chat_display.see(tk.END)
-        self.chat_display.config(state=tk.DISABLED)
+    def add_message(self, sender: str, message: str, tag: str, message_id: int = None):
+        """Add a message to the chat display (trimming the oldest past GUI_MAX_MESSAGES)"""
+        return self.transcript.append(sender, message, tag, message_id)
 
     def add_system_message(self, message: str):
         """Add a system message"""
@@ -292,40 +429,135 @@ class ChatInterface:
         self.message_var.set("")
 
         # Add user message to chat
-        self.add_message("You", message, "user")
+        turn = _Turn(message, self.add_message("You", message, "user"))
+        self.turns.append(turn)
+        self.stop_button.config(state=tk.NORMAL)
+        if not self.ready:
+            # Answered once the model is ready; more can be typed meanwhile
+            self.waiting.append(turn)
+            return
 
         # Update status
         self.status_bar.config(text="🤔 ConvoAI is thinking...")
         self.send_button.config(state=tk.DISABLED)
+        self._submit(turn)
 
-        # Get AI response in a separate thread to keep GUI responsive
-        def get_response():
+    def _submit(self, turn: _Turn):
+        """Queue a turn on the inference worker and start drawing its reply"""
+        # Stream the AI response on the inference worker to keep GUI responsive
+        def stream_reply():
             try:
-                response = self.brain.generate_response(message, self.user_id)
-
-                # Update GUI in main thread
-                self.root.after(0, lambda: self.handle_ai_response(response))
+                with trace("generate_response"):
+                    parts = []
+                    for text in self.brain.generate_response_stream(turn.message, self.user_id,
+                                                                    cancel_event=turn.cancel):
+                        if turn.cancel.is_set():
+                            break
+                        parts.append(text)
+                        turn.chunks.put(text)
+                    return "".join(parts)
+            finally:
+                # Ids of the stored turn, so it pages back in after it's trimmed; read here on
+                # the worker, since on_done runs on the Tk thread when the future is already done
+                turn.stored = self.transcript.latest_stored()
+
+        def on_done(future):
+            if future.cancelled():
+                # Stopped while queued; cancel_turns() has already ended the turn
+                return
+            try:
+                response = future.result()
             except Exception as e:
-                error_msg = f"❌ Error: {str(e)}"
-                self.root.after(0, lambda: self.handle_ai_response(error_msg))
+                response = f"❌ Error: {str(e)}"
+                turn.failed = True
+            turn.result = response
 
-        # Start response generation in background
-        threading.Thread(target=get_response, daemon=True).start()
+        turn.future = self.scheduler.submit(
+            stream_reply, fallback=lambda: self.brain.get_fallback(reason="deadline")
+        )
+        turn.future.add_done_callback(on_done)
+        self.root.after(self.FRAME_MS, self.render_reply, turn)
 
-    def handle_ai_response(self, response: str):
-        """Handle AI response in main thread"""
-        # Add AI response to chat
-        personality_name = self.brain.get_current_personality()
-        self.add_message(f"ConvoAI ({personality_name})", response, "ai")
+    def render_reply(self, turn: _Turn):
+        """Draw everything streamed since the last frame with one insert (main thread)"""
+        if turn.cancel.is_set():
+            return
+        finished = turn.result is not None
+        parts = []
+        while True:
+            try:
+                parts.append(turn.chunks.get_nowait())
+            except queue.Empty:
+                break
+
+        if parts:
+            if turn.reply_block is None:
+                personality_name = self.brain.get_current_personality()
+                turn.reply_block = self.transcript.begin_stream(f"ConvoAI ({personality_name})", "ai")
+                self.status_bar.config(text="✍️ ConvoAI is typing...")
+            self.transcript.extend(turn.reply_block, "".join(parts), "ai")
+
+        if finished:
+            self.handle_ai_response(turn)
+        else:
+            self.root.after(self.FRAME_MS, self.render_reply, turn)
+
+    def handle_ai_response(self, turn: _Turn):
+        """Handle the finished AI response in main thread"""
+        stored_ids = {(row["role"], row["message"]): row["id"] for row in turn.stored}
+        turn.user_block.message_id = stored_ids.get(("user", turn.user_block.message))
+        reply_id = stored_ids.get(("assistant", turn.result))
+
+        if turn.reply_block is not None:
+            self.transcript.end_stream(turn.reply_block, reply_id)
+            if turn.failed:
+                self.add_system_message(turn.result)
+        else:
+            # Nothing was streamed: a fallback, or an error before the first token
+            personality_name = self.brain.get_current_personality()
+            self.add_message(f"ConvoAI ({personality_name})", turn.result, "ai", reply_id)
+        self.end_turn(turn)
+
+    def end_turn(self, turn: _Turn):
+        """Forget an answered or cancelled turn, and reset the controls once none are left"""
+        if turn in self.turns:
+            self.turns.remove(turn)
+        if self.turns:
+            return
 
         # Reset status
         self.status_bar.config(text="Ready to chat! 💬")
         self.send_button.config(state=tk.NORMAL)
+        self.stop_button.config(state=tk.DISABLED)
         self.message_entry.focus()
 
+    def cancel_turns(self) -> int:
+        """Cancel every unanswered turn: queued ones never run, the running one stops at
+        its next token. Returns how many were cancelled."""
+        cancelled = list(self.turns)
+        for turn in cancelled:
+            turn.cancel.set()
+            if turn.future is not None:
+                turn.future.cancel()
+            if turn in self.waiting:
+                self.waiting.remove(turn)
+            if turn.reply_block is not None:
+                self.transcript.end_stream(turn.reply_block)
+            self.end_turn(turn)
+        return len(cancelled)
+
+    def stop_generation(self):
+        """Stop the reply being generated (Stop button)"""
+        if self.cancel_turns():
+            self.add_system_message("⏹ Stopped")
+
     def on_personality_change(self, event=None):
         """Handle personality change"""
+        if self.brain is None:
+            return
         new_personality = self.personality_var.get()
+        # A reply in the old personality is no longer wanted
+        self.cancel_turns()
         result = self.brain.switch_personality(new_personality)
         self.add_system_message(result)
 
@@ -336,13 +568,15 @@ class ChatInterface:
     def clear_chat(self):
         """Clear chat history"""
         if messagebox.askyesno("Clear Chat", "Are you sure you want to clear the chat history?"):
-            self.chat_display.config(state=tk.NORMAL)
-            self.chat_display.delete(1.0, tk.END)
-            self.chat_display.config(state=tk.DISABLED)
+            self.cancel_turns()
+            self.transcript.reset()
             self.load_user_welcome()
 
     def show_stats(self):
         """Show conversation statistics"""
+        if self.brain is None:
+            messagebox.showinfo("Statistics", "ConvoAI is still starting up - try again in a moment.")
+            return
         profile = self.brain.memory.get_user_profile(self.user_id)
         stats = self.brain.memory.get_conversation_stats(self.user_id)
 
@@ -359,7 +593,7 @@ class ChatInterface:
 
     def run(self):
         """Start the chat interface"""
-        print("🚀 Starting ConvoAI chat interface...")
+        logger.info("Starting the chat interface")
         self.add_system_message("Type a message to start chatting! Try saying hello or telling me your name.")
 
         # Start the GUI event loop
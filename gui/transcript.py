@@ -0,0 +1,298 @@
+"""
+ConvoAI Transcript - A bounded window of the conversation in a Tk Text widget
+"""
+
+import contextlib
+import itertools
+import logging
+import tkinter as tk
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# Keys that move around or copy without editing; everything else is swallowed
+_NAVIGATION_KEYS = {"Up", "Down", "Left", "Right", "Prior", "Next", "Home", "End",
+                    "Shift_L", "Shift_R", "Control_L", "Control_R"}
+_CONTROL_KEYS = {"c", "C", "slash", "backslash", "Insert"}
+_CONTROL = 0x4
+
+
+class _Block:
+    """One message in the widget: it starts at its mark and ends where the next one starts"""
+    __slots__ = ("mark", "message", "message_id", "body")
+
+    def __init__(self, mark: str, message: str, message_id: Optional[int]):
+        self.mark = mark
+        self.message = message
+        self.message_id = message_id
+        self.body: Optional[str] = None  # where streamed text goes, while it streams
+
+
+class Transcript:
+    """The chat display as a window of at most max_messages messages.
+
+    New messages trim the oldest ones off the top. Scrolling to the top
+    pages earlier history in from memory with keyset queries (dropping the
+    newest messages while the user reads back); scrolling down to the
+    bottom pages them in again, and the next new message jumps back to the
+    latest page. The widget stays NORMAL and swallows edit keys, so adding a
+    message is one insert instead of two state changes around it.
+    """
+
+    def __init__(self, text: tk.Text, memory, user_id: str,
+                 max_messages: int = Settings.GUI_MAX_MESSAGES,
+                 page_size: int = Settings.GUI_SCROLLBACK_PAGE):
+        self.text = text
+        self.memory = memory
+        self.user_id = user_id
+        self.max_messages = max(max_messages, page_size + 1)
+        self.page_size = page_size
+        self.blocks: deque = deque()
+        self._marks = itertools.count()
+        # Stored messages with id < _top_cursor are above the window; with id > _bottom_cursor
+        # below it (None: nothing is, the window ends at the latest message)
+        self._top_cursor = 0
+        self._bottom_cursor: Optional[int] = None
+        self._older_exhausted = True
+        self._paging = False
+        self._pageable = False
+
+        self._scrollbar = getattr(text, "vbar", None)
+        text.configure(yscrollcommand=self._on_yscroll, state=tk.NORMAL, insertwidth=0)
+        text.bind("<Key>", self._block_edits)
+        for sequence in ("<<Paste>>", "<<PasteSelection>>", "<<Cut>>", "<<Clear>>"):
+            text.bind(sequence, lambda event: "break")
+        for sequence in ("<MouseWheel>", "<Button-4>"):
+            text.bind(sequence, self._on_wheel, add="+")
+        if memory is not None:
+            self.attach(memory, self.newest_id(memory, user_id))
+
+    @staticmethod
+    def newest_id(memory, user_id: str) -> Optional[int]:
+        """Id of the user's latest stored message (a query: call it off the Tk thread if you can)"""
+        if not hasattr(memory, "get_messages_before"):
+            return None
+        newest = memory.get_messages_before(user_id, None, 1)
+        return newest[0]["id"] if newest else None
+
+    def attach(self, memory, newest_id: Optional[int]):
+        """Page history from memory; messages up to newest_id are scrollback.
+
+        Messages shown before this (typed while memory was opening) stay as they are.
+        """
+        self.memory = memory
+        self._pageable = hasattr(memory, "get_messages_before")
+        self._top_cursor = newest_id + 1 if newest_id is not None else 0
+        self._bottom_cursor = None
+        self._older_exhausted = newest_id is None
+
+    # Adding messages
+
+    def append(self, sender: str, message: str, tag: str, message_id: Optional[int] = None,
+               timestamp: Optional[str] = None) -> _Block:
+        """Add a message at the bottom and scroll to it"""
+        if self._bottom_cursor is not None:
+            self.show_latest(before_id=message_id)
+        block = self._insert_block(tk.END, sender, message, tag, message_id, timestamp)
+        self.blocks.append(block)
+        while len(self.blocks) > self.max_messages:
+            self._trim_top()
+        self.text.see(tk.END)
+        return block
+
+    def begin_stream(self, sender: str, tag: str) -> _Block:
+        """Add an empty message for extend() to fill in"""
+        block = self.append(sender, "", tag)
+        # Just before the message's trailing blank line; right gravity moves it past each insert
+        block.body = f"{block.mark}.body"
+        self.text.mark_set(block.body, "end-3c")
+        return block
+
+    def extend(self, block: _Block, text: str, tag: str):
+        """Add streamed text to a message, following it down if the view is at the bottom"""
+        if block.body is None:
+            return
+        following = self.text.yview()[1] >= 1.0
+        self.text.insert(block.body, text, tag)
+        block.message += text
+        if following:
+            self.text.see(tk.END)
+
+    def end_stream(self, block: _Block, message_id: Optional[int] = None):
+        """The message is complete; message_id is its stored id, if known"""
+        if block.body is not None:
+            self.text.mark_unset(block.body)
+            block.body = None
+        block.message_id = message_id
+
+    def latest_stored(self, count: int = 2) -> List[Dict[str, Any]]:
+        """The newest stored messages (safe to call from a worker thread)"""
+        if not self._pageable:
+            return []
+        return self.memory.get_messages_before(self.user_id, None, count)
+
+    def reset(self):
+        """Empty the window; everything stored so far is scrollback"""
+        self._clear_widget()
+        if self.memory is not None:
+            self.attach(self.memory, self.newest_id(self.memory, self.user_id))
+
+    def show_latest(self, before_id: Optional[int] = None):
+        """Replace the window with the newest page of history (older than before_id, if given)"""
+        self._clear_widget()
+        rows = self.memory.get_messages_before(self.user_id, before_id, self.page_size)
+        for row in rows:
+            self.blocks.append(self._insert_row(tk.END, row))
+        self._top_cursor = rows[0]["id"] if rows else 0
+        self._bottom_cursor = None
+        self._older_exhausted = len(rows) < self.page_size
+        self.text.see(tk.END)
+
+    # Paging
+
+    def page_older(self) -> int:
+        """Insert the page of history above the window; returns how many messages came in"""
+        rows = self.memory.get_messages_before(self.user_id, self._top_cursor, self.page_size)
+        if len(rows) < self.page_size:
+            self._older_exhausted = True
+        if not rows:
+            return 0
+        with self._keep_view():
+            for row in reversed(rows):
+                self.blocks.appendleft(self._insert_row("1.0", row))
+            self._top_cursor = rows[0]["id"]
+            if len(self.blocks) > self.max_messages:
+                while len(self.blocks) > self.max_messages:
+                    self._trim_bottom()
+                stored = [block.message_id for block in self.blocks if block.message_id is not None]
+                self._bottom_cursor = max(stored) if stored else self._top_cursor - 1
+        return len(rows)
+
+    def page_newer(self) -> int:
+        """Append the page of history below the window; returns how many messages came in"""
+        rows = self.memory.get_messages_after(self.user_id, self._bottom_cursor, self.page_size)
+        with self._keep_view():
+            for row in rows:
+                self.blocks.append(self._insert_row(tk.END, row))
+            if len(rows) < self.page_size:
+                self._bottom_cursor = None
+            else:
+                self._bottom_cursor = rows[-1]["id"]
+            while len(self.blocks) > self.max_messages:
+                self._trim_top()
+        return len(rows)
+
+    def _request_page(self, older: bool):
+        if self._paging or not self._pageable:
+            return
+        if older and self._older_exhausted:
+            return
+        if not older and self._bottom_cursor is None:
+            return
+        self._paging = True
+        self.text.after_idle(self._run_page, older)
+
+    def _run_page(self, older: bool):
+        try:
+            self.page_older() if older else self.page_newer()
+        except Exception:
+            logger.exception("Failed to page %s history", "older" if older else "newer")
+        finally:
+            self._paging = False
+
+    # Widget plumbing
+
+    def _insert_block(self, index: str, sender: str, message: str, tag: str,
+                      message_id: Optional[int], timestamp: Optional[str]) -> _Block:
+        start = "1.0" if index == "1.0" else self.text.index("end-1c")
+        chunks = []
+        if sender:
+            chunks += [f"\n{sender} [{timestamp or datetime.now().strftime('%H:%M')}]\n", "timestamp"]
+        chunks += [f"{message}\n\n", tag]
+        self.text.insert(index, *chunks)
+        block = _Block(f"msg{next(self._marks)}", message, message_id)
+        # Marks keep right gravity: text inserted at "1.0" pushes older blocks' marks along
+        self.text.mark_set(block.mark, start)
+        return block
+
+    def _insert_row(self, index: str, row: Dict[str, Any]) -> _Block:
+        if row["role"] == "user":
+            sender, tag = "You", "user"
+        else:
+            sender, tag = "ConvoAI", "ai"
+        return self._insert_block(index, sender, row["message"], tag, row["id"],
+                                  _stored_time(row.get("timestamp")))
+
+    def _trim_top(self):
+        block = self.blocks.popleft()
+        end = self.blocks[0].mark if self.blocks else tk.END
+        self.text.delete("1.0", end)
+        self._forget(block)
+        if block.message_id is not None:
+            self._top_cursor = block.message_id + 1
+        self._older_exhausted = False
+
+    def _trim_bottom(self):
+        block = self.blocks.pop()
+        self.text.delete(block.mark, tk.END)
+        self._forget(block)
+
+    def _clear_widget(self):
+        self.text.delete("1.0", tk.END)
+        while self.blocks:
+            self._forget(self.blocks.pop())
+
+    def _forget(self, block: _Block):
+        self.text.mark_unset(block.mark)
+        if block.body is not None:
+            self.text.mark_unset(block.body)
+            block.body = None
+
+    @contextlib.contextmanager
+    def _keep_view(self):
+        """Keep the line at the top of the view in place while text above or below it changes"""
+        self.text.mark_set("transcript_view", "@0,0")
+        try:
+            yield
+        finally:
+            self.text.yview("transcript_view")
+            self.text.mark_unset("transcript_view")
+
+    def _on_yscroll(self, first, last):
+        if self._scrollbar is not None:
+            self._scrollbar.set(first, last)
+        first, last = float(first), float(last)
+        if first <= 0.0 and last < 1.0:
+            self._request_page(older=True)
+        elif last >= 1.0 and first > 0.0:
+            self._request_page(older=False)
+
+    def _on_wheel(self, event):
+        # With less than a screenful there is no scrolling, so yscrollcommand never says "top"
+        if (getattr(event, "delta", 0) > 0 or getattr(event, "num", 0) == 4) and self.text.yview()[0] <= 0.0:
+            self._request_page(older=True)
+
+    @staticmethod
+    def _block_edits(event):
+        if event.keysym in _NAVIGATION_KEYS:
+            return None
+        if event.state & _CONTROL and event.keysym in _CONTROL_KEYS:
+            return None
+        return "break"
+
+
+def _stored_time(timestamp: Optional[str]) -> str:
+    """A stored UTC timestamp as local HH:MM, with the date if it isn't today"""
+    if not timestamp:
+        return ""
+    try:
+        stamp = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).astimezone()
+    except ValueError:
+        return timestamp
+    if stamp.date() == datetime.now().date():
+        return stamp.strftime("%H:%M")
+    return stamp.strftime("%Y-%m-%d %H:%M")
@@ -3,22 +3,28 @@ ConvoAI - Intelligent Chatbot with Memory
 Main application entry point
 """
 
+import logging
+
+from chatbot.log import configure_logging
 from gui.chat_interface import ChatInterface
-from chatbot.brain import ConvoAIBrain
-from chatbot.memory import ConversationMemory
 
 
-def main():
-    print("🤖 Starting ConvoAI...")
+def load_brain():
+    """Open memory and build the brain; runs on the GUI's startup thread"""
+    # Imported here: transformers alone takes seconds, and the window shouldn't wait for it
+    from chatbot.brain import ConvoAIBrain
+    from chatbot.memory import ConversationMemory
+    return ConvoAIBrain(ConversationMemory(), load_model=False)
 
-    # Initialize components
-    memory = ConversationMemory()
-    brain = ConvoAIBrain(memory)
 
-    # Start the GUI
-    app = ChatInterface(brain)
+def main():
+    configure_logging()
+    logging.getLogger("main").info("Starting ConvoAI")
+
+    # Show the window first; memory and the model load behind it
+    app = ChatInterface(brain_factory=load_brain)
     app.run()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,63 @@
+"""
+ConvoAI Server - Production launcher for the web interface
+
+Runs the ASGI app under uvicorn with one or more worker processes, or the
+Flask app on its threaded WSGI server for comparison. With more than one
+worker, conversations are kept in the shared SQLite database (WAL mode) so
+every process sees the same history.
+
+Usage: python serve.py [--server uvicorn|flask] [--host 0.0.0.0] [--port 5001] [--workers 4]
+Every option defaults to the matching CONVOAI_WEB_* setting.
+"""
+
+import argparse
+import logging
+import os
+
+from config.settings import Settings
+from chatbot.log import configure_logging
+
+logger = logging.getLogger("serve")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--server", choices=("uvicorn", "flask"), default=Settings.WEB_SERVER)
+    parser.add_argument("--host", default=Settings.WEB_HOST)
+    parser.add_argument("--port", type=int, default=Settings.WEB_PORT)
+    parser.add_argument("--workers", type=int, default=Settings.WEB_WORKERS)
+    args = parser.parse_args()
+    configure_logging()
+
+    if args.workers > 1 and Settings.WEB_MEMORY_BACKEND != "sqlite":
+        logger.info("Multiple workers: sharing conversations through SQLite")
+        # Worker processes read the environment; this process reads Settings
+        os.environ["CONVOAI_WEB_MEMORY_BACKEND"] = "sqlite"
+        Settings.WEB_MEMORY_BACKEND = "sqlite"
+
+    logger.info("Starting ConvoAI (%s, %d worker(s))", args.server, args.workers)
+    logger.info("Access your chatbot at: http://localhost:%d", args.port)
+
+    if args.server == "flask":
+        if args.workers > 1:
+            logger.warning("The Flask server runs a single process; use --server uvicorn for workers")
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        from web_app_with_personalities import app
+        app.run(host=args.host, port=args.port, threaded=True, debug=False)
+    else:
+        import uvicorn
+        uvicorn.run(
+            "asgi_app:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            log_level="warning",
+            timeout_keep_alive=30,
+            # WebSocket heartbeat: a peer that misses a ping is disconnected
+            ws_ping_interval=Settings.WS_PING_INTERVAL,
+            ws_ping_timeout=Settings.WS_PING_INTERVAL
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+// ConvoAI web interface: personality selection and streamed chat
+let currentPersonality = document.getElementById('personality').value;
+
+// Persistent WebSocket (ASGI server); without it, replies stream over HTTP
+const socket = { ws: null, nextId: 1, pending: {}, retryDelay: 1000 };
+
+function connectSocket() {
+    if (!window.WebSocket) return;
+    const ws = new WebSocket((location.protocol === 'https:' ? 'wss://' : 'ws://') + location.host + '/ws');
+    let opened = false;
+
+    ws.onopen = () => {
+        opened = true;
+        socket.ws = ws;
+        socket.retryDelay = 1000;
+        ws.send(JSON.stringify({ t: 'p', p: currentPersonality }));
+    };
+    ws.onmessage = (event) => handleFrame(JSON.parse(event.data));
+    ws.onclose = (event) => {
+        if (socket.ws === ws) socket.ws = null;
+        // Replies that were mid-stream on this socket won't finish
+        for (const id in socket.pending) showError(socket.pending[id].bubble);
+        socket.pending = {};
+        // Never opened (e.g. the Flask server) or taken over by another tab: stay on HTTP
+        if (!opened || event.code === 4000) return;
+        setTimeout(connectSocket, socket.retryDelay);
+        socket.retryDelay = Math.min(socket.retryDelay * 2, 30000);
+    };
+}
+
+function updatePersonality() {
+    const select = document.getElementById('personality');
+    currentPersonality = select.value;
+    document.getElementById('current-personality').textContent = select.options[select.selectedIndex].text;
+    if (socket.ws) socket.ws.send(JSON.stringify({ t: 'p', p: currentPersonality }));
+}
+
+async function sendMessage() {
+    const input = document.getElementById('user-input');
+    const chatBox = document.getElementById('chat-box');
+    const message = input.value.trim();
+
+    if (!message) return;
+
+    // Add user message (appended, so in-flight reply bubbles stay attached)
+    const userBubble = addBubble('user', 'You:');
+    userBubble.append(' ' + message);
+    input.value = '';
+
+    // Add thinking indicator
+    const personalityTag = document.getElementById('current-personality').textContent;
+    const bubble = addBubble('ai', 'ConvoAI:');
+    bubble.append(' ', element('span', 'personality-tag', personalityTag), ' ',
+                  element('em', null, '🧠 Thinking...'));
+    chatBox.scrollTop = chatBox.scrollHeight;
+
+    if (socket.ws && socket.ws.readyState === WebSocket.OPEN) {
+        const id = socket.nextId++;
+        socket.pending[id] = { bubble: bubble, tag: personalityTag, reply: null };
+        socket.ws.send(JSON.stringify({ t: 'msg', id: id, m: message }));
+        return;
+    }
+
+    try {
+        // Stream the reply from the backend with personality
+        const response = await fetch('/chat/stream', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                message: message,
+                personality: currentPersonality
+            })
+        });
+        if (!response.ok || !response.body) throw new Error('Streaming unavailable');
+
+        const reply = replyBubble(bubble, personalityTag);
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // SSE frames are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                handleEvent(buffer.slice(0, boundary), reply);
+                buffer = buffer.slice(boundary + 2);
+            }
+            chatBox.scrollTop = chatBox.scrollHeight;
+        }
+
+    } catch (error) {
+        showError(bubble);
+    }
+}
+
+// Text always goes in as textContent, never parsed as markup
+function element(tag, className, text) {
+    const node = document.createElement(tag);
+    if (className) node.className = className;
+    if (text) node.textContent = text;
+    return node;
+}
+
+// A new message bubble at the bottom of the chat, starting with its sender label
+function addBubble(kind, label) {
+    const chatBox = document.getElementById('chat-box');
+    const bubble = element('div', 'message ' + kind);
+    bubble.append(element('strong', null, label));
+    chatBox.append(bubble);
+    chatBox.scrollTop = chatBox.scrollHeight;
+    return bubble;
+}
+
+// Turn the thinking indicator into the reply bubble, returning the span tokens go into
+function replyBubble(bubble, personalityTag) {
+    const reply = element('span', 'reply');
+    bubble.replaceChildren(element('strong', null, 'ConvoAI:'), ' ',
+                           element('span', 'personality-tag', personalityTag), ' ', reply);
+    return reply;
+}
+
+function showError(bubble) {
+    const chatBox = document.getElementById('chat-box');
+    bubble.replaceChildren(element('strong', null, 'ConvoAI:'), ' ',
+                           element('em', null, 'Sorry, I encountered an error. Please try again.'));
+    chatBox.scrollTop = chatBox.scrollHeight;
+}
+
+function handleFrame(frame) {
+    const turn = socket.pending[frame.id];
+    if (!turn) return;
+    if (frame.t === 'err') {
+        delete socket.pending[frame.id];
+        showError(turn.bubble);
+        return;
+    }
+    if (!turn.reply) turn.reply = replyBubble(turn.bubble, turn.tag);
+    if (frame.t === 'tok') {
+        turn.reply.textContent += frame.d;
+    } else if (frame.t === 'end') {
+        turn.reply.textContent = frame.d;
+        delete socket.pending[frame.id];
+    }
+    const chatBox = document.getElementById('chat-box');
+    chatBox.scrollTop = chatBox.scrollHeight;
+}
+
+function handleEvent(frame, reply) {
+    let event = 'message';
+    let data = '';
+    for (const line of frame.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+    }
+    if (!data) return;
+
+    const payload = JSON.parse(data);
+    if (event === 'done') {
+        reply.textContent = payload.response;
+    } else if (event === 'error') {
+        reply.replaceChildren(element('em', null, 'Sorry, I encountered an error. Please try again.'));
+    } else {
+        reply.textContent += payload.token;
+    }
+}
+
+connectSocket();
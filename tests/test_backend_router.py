@@ -0,0 +1,135 @@
+import time
+
+import pytest
+
+from chatbot.backend_router import BackendRouter, CannedBackend, LatencyHistogram
+from chatbot.intent_router import IntentRouter
+from chatbot.scheduler import model_backed
+
+
+class FakeBackend:
+    """compose_reply stand-in: answers after delay, or short-circuits without calling a model"""
+
+    def __init__(self, reply="reply", delay=0.0, available=True):
+        self.reply = reply
+        self.delay = delay
+        self.available = available
+        self.calls = 0
+
+    def compose_reply(self, user_input, user_id, personality_name, cancel_event=None):
+        self.calls += 1
+        if not self.available:
+            return None
+        model_backed()
+        if cancel_event is not None and cancel_event.wait(self.delay):
+            return None
+        return self.reply
+
+
+def make_router(*backends, **options):
+    canned = CannedBackend(IntentRouter(), lambda personality, reason: "fallback")
+    return BackendRouter(None, list(backends), canned, **options)
+
+
+@pytest.fixture
+def routers():
+    made = []
+
+    def build(*backends, **options):
+        made.append(make_router(*backends, **options))
+        return made[-1]
+
+    yield build
+    for router in made:
+        router.shutdown()
+
+
+def test_short_circuits_do_not_feed_the_latency_histogram(routers):
+    router = routers(("ollama", FakeBackend(available=False)), ("local", FakeBackend("local")))
+    for _ in range(5):
+        assert router.route("hi", "alice", "friendly_assistant") == "local"
+    assert router.histograms["ollama"].count == 0
+    assert router.stats()["backends"]["ollama"]["failures"] == 5
+
+
+def test_failed_model_calls_still_count_toward_the_tail(routers):
+    router = routers(("ollama", FakeBackend(reply=None, delay=0.05)), ("local", FakeBackend("local")),
+                     initial_hedge_delay=1.0)
+    assert router.route("hi", "alice", "friendly_assistant") == "local"
+    assert router.histograms["ollama"].count == 1
+    assert router.histograms["ollama"].quantile(0.5) >= 0.05
+
+
+def test_histogram_quantiles_within_one_bucket():
+    histogram = LatencyHistogram(growth=1.15)
+    assert histogram.quantile(0.5) is None
+    for ms in range(1, 101):
+        histogram.record(ms / 1000)
+    assert 0.050 <= histogram.quantile(0.5) <= 0.050 * 1.15
+    assert 0.095 <= histogram.quantile(0.95) <= 0.095 * 1.15
+
+
+def test_histogram_decays_old_samples():
+    histogram = LatencyHistogram(decay_every=10)
+    for _ in range(10):
+        histogram.record(1.0)
+    assert histogram.count == 5
+
+
+def test_hedge_delay_follows_the_tail_within_limits(routers):
+    router = routers(("ollama", FakeBackend()), ("local", FakeBackend()), initial_hedge_delay=2.0,
+                     min_hedge_delay=0.05, min_samples=20, timeout=15.0)
+    histogram = router.histograms["ollama"]
+    for _ in range(19):
+        histogram.record(0.5)
+    assert router.hedge_delay("ollama") == 2.0   # too few samples yet
+    histogram.record(0.5)
+    assert 0.5 <= router.hedge_delay("ollama") <= 0.5 * 1.15
+
+    fast, slow = LatencyHistogram(), LatencyHistogram()
+    for _ in range(20):
+        fast.record(0.001)
+        slow.record(100.0)
+    router.histograms["ollama"] = fast
+    assert router.hedge_delay("ollama") == 0.05   # never below min_hedge_delay
+    router.histograms["ollama"] = slow
+    assert router.hedge_delay("ollama") == 15.0   # never past the request timeout
+
+
+def test_slow_primary_is_hedged_and_the_faster_reply_wins(routers):
+    primary, secondary = FakeBackend("slow", delay=2.0), FakeBackend("fast")
+    router = routers(("ollama", primary), ("local", secondary), initial_hedge_delay=0.05,
+                     hedge_budget=1.0)
+    router._requests = 10  # some history so the budget allows a hedge
+    start = time.monotonic()
+    assert router.route("hi", "alice", "friendly_assistant") == "fast"
+    assert time.monotonic() - start < 1.0
+    stats = router.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+    assert stats["backends"]["ollama"]["cancelled"] == 1
+
+
+def test_hedges_stay_within_budget(routers):
+    primary, secondary = FakeBackend("slow", delay=0.1), FakeBackend("fast")
+    router = routers(("ollama", primary), ("local", secondary), initial_hedge_delay=0.01,
+                     hedge_budget=0.25)
+    replies = [router.route("hi", "alice", "friendly_assistant") for _ in range(8)]
+    stats = router.stats()
+    assert stats["hedged"] <= 0.25 * 8
+    assert stats["hedges_denied"] == 8 - stats["hedged"]
+    assert replies.count("fast") == stats["hedge_wins"]
+    assert secondary.calls == stats["hedged"]
+
+
+def test_failed_primary_hands_over_without_waiting_for_the_hedge_timer(routers):
+    router = routers(("ollama", FakeBackend(available=False)), ("local", FakeBackend("local")),
+                     initial_hedge_delay=5.0, hedge_budget=0.0)
+    start = time.monotonic()
+    assert router.route("hi", "alice", "friendly_assistant") == "local"
+    assert time.monotonic() - start < 1.0
+    assert router.stats()["hedged"] == 0
+
+
+def test_all_backends_failing_returns_none(routers):
+    router = routers(("ollama", FakeBackend(reply=None)), ("local", FakeBackend(available=False)))
+    assert router.route("hi", "alice", "friendly_assistant") is None
@@ -0,0 +1,155 @@
+import contextvars
+import threading
+import time
+
+import pytest
+
+from chatbot.batching import BatchItem, parse_batch, run_batch
+from chatbot.scheduler import InferenceScheduler
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def items_for(users, turns):
+    return [BatchItem(turn * len(users) + n, user, f"{user} {turn}", "friendly_assistant")
+            for turn in range(turns) for n, user in enumerate(users)]
+
+
+class Recorder:
+    """generate_response stand-in: records calls and the context they ran in"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.calls = []
+        self.request_ids = set()
+
+    def __call__(self, message, user_id, personality):
+        with self.lock:
+            self.calls.append(message)
+            self.request_ids.add(request_id.get())
+        time.sleep(self.delay)
+        return message.upper()
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = InferenceScheduler(workers=2, max_queue=8)
+    yield scheduler
+    scheduler.shutdown()
+
+
+@pytest.fixture(params=["threads", "scheduler"])
+def runner(request, scheduler):
+    use = scheduler if request.param == "scheduler" else None
+    return lambda generate, items, concurrency=2: run_batch(generate, items, concurrency, scheduler=use)
+
+
+def test_parse_batch_validates_items():
+    with pytest.raises(ValueError):
+        parse_batch({"message": "hi"})
+    with pytest.raises(ValueError):
+        parse_batch([{"user_id": "a"}])
+    with pytest.raises(ValueError):
+        parse_batch([{"message": "hi"}] * 3, max_items=2)
+    (item,) = parse_batch([{"user_id": "a", "message": "hi"}], user_prefix="batch:")
+    assert item == BatchItem(0, "batch:a", "hi", "friendly_assistant")
+
+
+def test_every_item_answered_each_user_in_order(runner):
+    users = ["alice", "bob", "carol"]
+    items = items_for(users, 4)
+    generate = Recorder(delay=0.001)
+    token = request_id.set("req-1")
+    try:
+        results = list(runner(generate, items))
+    finally:
+        request_id.reset(token)
+
+    assert sorted(result.index for result in results) == [item.index for item in items]
+    assert all(result.response == items[result.index].message.upper() for result in results)
+    for user in users:
+        calls = [call for call in generate.calls if call.startswith(user)]
+        assert calls == [f"{user} {turn}" for turn in range(4)]
+    # Workers run in the caller's context
+    assert generate.request_ids == {"req-1"}
+
+
+def test_errors_come_back_per_item(runner):
+    def generate(message, user_id, personality):
+        if message == "bob 0":
+            raise RuntimeError("model down")
+        return "ok"
+
+    results = {result.index: result for result in runner(generate, items_for(["alice", "bob"], 1))}
+    assert results[0].response == "ok" and results[0].error is None
+    assert results[1].response is None and results[1].error == "model down"
+
+
+def test_closing_early_stops_each_chain(runner):
+    items = items_for(["alice", "bob"], 20)
+    generate = Recorder(delay=0.02)
+    results = runner(generate, items)
+    next(results)
+    results.close()
+    time.sleep(0.1)
+    settled = len(generate.calls)
+    time.sleep(0.1)
+    assert len(generate.calls) == settled < len(items)
+
+
+def test_concurrency_bounds_users_in_flight(scheduler):
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def generate(message, user_id, personality):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        return "ok"
+
+    list(run_batch(generate, items_for(["a", "b", "c", "d"], 2), 1, scheduler=scheduler))
+    assert peak[0] == 1
+
+
+def test_items_the_scheduler_sheds_come_back_as_errors(scheduler):
+    scheduler.shutdown()
+    results = list(run_batch(Recorder(), items_for(["alice"], 2), 2, scheduler=scheduler))
+    assert len(results) == 2
+    assert all(result.response is None and "overloaded" in result.error for result in results)
+
+
+def test_batch_leaves_a_worker_for_interactive_chats():
+    scheduler = InferenceScheduler(workers=3, max_queue=8)
+    release = threading.Event()
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def generate(message, user_id, personality):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        release.wait(5)
+        with lock:
+            running[0] -= 1
+        return "ok"
+
+    try:
+        results = []
+        consumer = threading.Thread(target=lambda: results.extend(
+            run_batch(generate, items_for(["a", "b", "c", "d"], 2), 10, scheduler=scheduler)
+        ))
+        consumer.start()
+        deadline = time.monotonic() + 5
+        while running[0] < 2 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        # Every batch job in flight is stuck, yet an interactive chat still gets a worker
+        assert scheduler.run(lambda: "interactive", timeout=1, fallback=lambda: "starved") == "interactive"
+        release.set()
+        consumer.join(5)
+        assert len(results) == 8
+        assert peak[0] == 2
+    finally:
+        release.set()
+        scheduler.shutdown()
@@ -0,0 +1,89 @@
+import threading
+import time
+
+from chatbot.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow_request()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success(0.01)  # resets the streak
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    stats = breaker.stats()
+    assert stats["trips"] == 1 and stats["short_circuited"] == 1
+
+
+def test_half_open_lets_one_trial_through_and_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    trip(breaker)
+    time.sleep(0.06)
+
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()  # one trial at a time
+    breaker.record_success(0.01)
+    assert breaker.state == CLOSED
+    assert breaker.allow_request()
+
+
+def test_failed_trial_opens_again():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    trip(breaker)
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.stats()["trips"] == 2
+
+
+def test_release_gives_the_trial_back():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    trip(breaker)
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60, slow_call_threshold=0.5)
+    breaker.record_success(0.1)
+    breaker.record_success(1.0)
+    breaker.record_success(1.0)
+    assert breaker.state == OPEN
+
+
+def test_probe_moves_to_half_open_once_it_succeeds():
+    healthy = threading.Event()
+
+    def probe():
+        if not healthy.is_set():
+            raise ConnectionError("down")
+
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.01, probe=probe,
+                             probe_interval=0.01)
+    trip(breaker)
+    time.sleep(0.05)
+    assert breaker.state == OPEN  # the probe keeps failing
+
+    healthy.set()
+    deadline = time.monotonic() + 2
+    while breaker.state != HALF_OPEN and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
@@ -0,0 +1,179 @@
+import asyncio
+import concurrent.futures
+import threading
+
+import pytest
+
+from chatbot.async_ollama_client import AsyncOllamaClient, BackgroundLoop, CoalescingOllamaClient
+
+
+class UpstreamStub:
+    """Replaces AsyncOllamaClient._post_generate: records payloads, answers when released"""
+
+    def __init__(self, client):
+        self.payloads = []
+        self.release = None
+        self.error = None
+        client._post_generate = self
+
+    async def __call__(self, payload):
+        self.payloads.append(payload)
+        if self.release is None:
+            self.release = asyncio.Event()
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return {"response": f"reply to {payload['prompt']}"}
+
+
+def run(scenario):
+    client = AsyncOllamaClient()
+    upstream = UpstreamStub(client)
+    return asyncio.run(scenario(client, upstream)), client, upstream
+
+
+async def settle():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_identical_requests_share_one_upstream_call():
+    async def scenario(client, upstream):
+        calls = [asyncio.ensure_future(client.generate("hi", {"temperature": 0.8, "num_predict": 60}))
+                 for _ in range(3)]
+        # Same options in another order: same key
+        calls.append(asyncio.ensure_future(client.generate("hi", {"num_predict": 60, "temperature": 0.8})))
+        await settle()
+        upstream.release.set()
+        return await asyncio.gather(*calls)
+
+    results, client, upstream = run(scenario)
+    assert len(upstream.payloads) == 1
+    assert all(result == {"response": "reply to hi"} for result in results)
+    # Each caller gets its own copy
+    results[0]["response"] = "changed"
+    assert results[1]["response"] == "reply to hi"
+    assert client.stats["coalesced"] == 3
+
+
+def test_different_requests_are_not_coalesced():
+    async def scenario(client, upstream):
+        calls = [asyncio.ensure_future(client.generate("hi")),
+                 asyncio.ensure_future(client.generate("hello")),
+                 asyncio.ensure_future(client.generate("hi", {"temperature": 0.1})),
+                 asyncio.ensure_future(client.generate("hi", context=[1, 2]))]
+        await settle()
+        upstream.release.set()
+        return await asyncio.gather(*calls)
+
+    _, client, upstream = run(scenario)
+    assert len(upstream.payloads) == 4
+    assert client.stats["coalesced"] == 0
+
+
+def test_finished_calls_are_not_reused():
+    async def scenario(client, upstream):
+        first = asyncio.ensure_future(client.generate("hi"))
+        await settle()
+        upstream.release.set()
+        await first
+        await client.generate("hi")
+        return client._inflight
+
+    inflight, _, upstream = run(scenario)
+    assert len(upstream.payloads) == 2
+    assert inflight == {}
+
+
+def test_cancelled_waiter_detaches_without_cancelling_the_others():
+    async def scenario(client, upstream):
+        leaving = asyncio.ensure_future(client.generate("hi"))
+        staying = asyncio.ensure_future(client.generate("hi"))
+        await settle()
+        leaving.cancel()
+        await settle()
+        upstream.release.set()
+        return await staying, leaving.cancelled()
+
+    (result, cancelled), client, upstream = run(scenario)
+    assert result == {"response": "reply to hi"} and cancelled
+    assert client.stats["cancelled"] == 0
+
+
+def test_last_waiter_cancelling_cancels_the_upstream_call():
+    async def scenario(client, upstream):
+        only = asyncio.ensure_future(client.generate("hi"))
+        await settle()
+        flight = client._inflight[next(iter(client._inflight))]
+        only.cancel()
+        await settle()
+        return flight.task.cancelled()
+
+    upstream_cancelled, client, _ = run(scenario)
+    assert upstream_cancelled
+    assert client.stats["cancelled"] == 1
+
+
+def test_upstream_errors_reach_every_waiter():
+    async def scenario(client, upstream):
+        calls = [asyncio.ensure_future(client.generate("hi")) for _ in range(2)]
+        await settle()
+        upstream.error = ConnectionError("down")
+        upstream.release.set()
+        return await asyncio.gather(*calls, return_exceptions=True)
+
+    results, _, upstream = run(scenario)
+    assert len(upstream.payloads) == 1
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+
+class SyncStub:
+    base_url = "http://stub"
+    model = "stub"
+
+
+def test_threads_coalesce_through_the_background_loop():
+    async_client = AsyncOllamaClient()
+    release = threading.Event()
+    payloads = []
+
+    async def post(payload):
+        payloads.append(payload)
+        await asyncio.get_running_loop().run_in_executor(None, release.wait, 5)
+        return {"response": "shared"}
+
+    async_client._post_generate = post
+    loop = BackgroundLoop("test-coalescing")
+    client = CoalescingOllamaClient(SyncStub(), async_client, loop=loop, timeout=lambda: 5.0)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(4) as pool:
+            futures = [pool.submit(client.generate, "hi") for _ in range(4)]
+            while async_client.stats["requests"] < 4:
+                threading.Event().wait(0.001)
+            release.set()
+            assert [future.result(5)["response"] for future in futures] == ["shared"] * 4
+        assert len(payloads) == 1
+    finally:
+        release.set()
+        loop.stop()
+
+
+def test_timeout_function_bounds_the_wait_and_cancels_upstream():
+    async_client = AsyncOllamaClient()
+
+    async def never(payload):
+        await asyncio.sleep(10)
+
+    async_client._post_generate = never
+    loop = BackgroundLoop("test-coalescing-timeout")
+    client = CoalescingOllamaClient(SyncStub(), async_client, loop=loop, timeout=lambda: 0.05)
+    try:
+        with pytest.raises(concurrent.futures.TimeoutError):
+            client.generate("hi")
+        for _ in range(100):
+            if async_client.stats["cancelled"]:
+                break
+            threading.Event().wait(0.01)
+        assert async_client.stats["cancelled"] == 1
+    finally:
+        loop.stop()
@@ -0,0 +1,82 @@
+from chatbot.intent_router import GREETING_MAX_WORDS, IntentRouter
+
+PERSONALITIES = {
+    "friendly": {
+        "greetings": ["Hello there!"],
+        "intents": {
+            "thanks": {"patterns": ["thank you", "thanks"], "responses": ["You're welcome!"],
+                       "max_words": 6},
+            "bye": {"patterns": ["good bye", "bye"], "responses": ["See you!"]},
+        },
+    },
+    "quiet": {},
+}
+
+
+def router():
+    return IntentRouter.from_personalities(PERSONALITIES)
+
+
+def test_matches_whole_phrases_case_and_space_insensitive():
+    r = router()
+    assert r.respond("friendly", "Thank   YOU so much") == "You're welcome!"
+    assert r.respond("friendly", "ok, bye!") == "See you!"
+    assert r.respond("friendly", "goodbye") is None        # not the phrase "good bye" or "bye"
+    assert r.respond("friendly", "thanksgiving plans") is None
+
+
+def test_greeting_intent_built_from_greetings_pool():
+    r = router()
+    assert r.respond("friendly", "Hey") == "Hello there!"
+    assert r.respond("friendly", "good morning") == "Hello there!"
+    long_message = "hi " + "word " * GREETING_MAX_WORDS
+    assert r.respond("friendly", long_message) is None
+
+
+def test_long_messages_go_to_the_model():
+    r = router()
+    assert r.respond("friendly", "thanks, now explain how tides work please") is None
+    # A later intent without a word limit can still match the same message
+    assert r.respond("friendly", "thanks for everything you did today, bye then") == "See you!"
+
+
+def test_personalities_without_intents_never_match():
+    r = router()
+    assert r.respond("quiet", "hello") is None
+    assert r.respond("missing", "hello") is None
+
+
+def test_stats_count_hits_and_misses():
+    r = router()
+    r.respond("friendly", "thanks")
+    r.respond("friendly", "thanks")
+    r.respond("friendly", "what is the capital of peru")
+    stats = r.stats()
+    assert stats["hits"] == {"friendly/thanks": 2}
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == round(2 / 3, 3)
+
+
+def test_add_intent_recompiles_and_replaces():
+    r = router()
+    r.add_intent("quiet", "hello", ["hello"], ["..."])
+    assert r.respond("quiet", "hello") == "..."
+    r.add_intent("quiet", "hello", ["hello"], ["hi."])
+    assert r.respond("quiet", "hello") == "hi."
+    # Intents without patterns or responses are ignored
+    r.add_intent("quiet", "empty", [], ["never"])
+    assert r.respond("quiet", "empty") is None
+
+
+def test_reload_swaps_only_the_named_personalities():
+    r = router()
+    edited = {
+        "friendly": {"intents": {"thanks": {"patterns": ["cheers"], "responses": ["Any time!"]}}},
+        "quiet": {"intents": {"hello": {"patterns": ["hello"], "responses": ["Hm."]}}},
+    }
+    r.reload_personalities(edited, ["friendly"])
+    assert r.respond("friendly", "cheers") == "Any time!"
+    assert r.respond("friendly", "thanks") is None
+    assert r.respond("quiet", "hello") is None   # not reloaded
+    r.reload_personalities({}, ["friendly"])    # removed personality
+    assert r.respond("friendly", "cheers") is None
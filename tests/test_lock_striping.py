@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from chatbot.lock_striping import AsyncStripedLock, StripedLock
+
+
+def test_needs_a_stripe():
+    with pytest.raises(ValueError):
+        StripedLock(0)
+
+
+def test_same_key_same_stripe():
+    locks = StripedLock(8)
+    assert locks.lock_for("alice") is locks.lock_for("alice")
+    assert 0 <= locks.stripe("bob") < 8
+
+
+def test_hold_times_out_while_another_thread_holds_the_stripe():
+    locks = StripedLock(4)
+    held, done = threading.Event(), threading.Event()
+
+    def holder():
+        with locks.hold("alice"):
+            held.set()
+            done.wait(5)
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    try:
+        assert held.wait(5)
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            with locks.hold("alice", timeout=0.05):
+                pass
+        assert time.monotonic() - start < 1
+    finally:
+        done.set()
+        thread.join()
+
+    with locks.hold("alice", timeout=0.05):
+        pass
+
+
+def test_acquire_can_be_released_from_another_thread():
+    locks = StripedLock(4)
+    lock = locks.acquire("alice", timeout=1)
+    threading.Thread(target=lock.release).start()
+    locks.acquire("alice", timeout=1).release()
+
+
+def test_hold_releases_on_error():
+    locks = StripedLock(4)
+    with pytest.raises(RuntimeError):
+        with locks.hold("alice"):
+            raise RuntimeError
+    assert not locks.lock_for("alice").locked()
+
+
+def test_async_acquire_times_out():
+    async def scenario():
+        locks = AsyncStripedLock(4)
+        lock = await locks.acquire("alice")
+        with pytest.raises(TimeoutError):
+            await locks.acquire("alice", timeout=0.05)
+        lock.release()
+        (await locks.acquire("alice", timeout=0.05)).release()
+
+    asyncio.run(scenario())
+
+
+def test_async_hold_times_out():
+    async def scenario():
+        locks = AsyncStripedLock(4)
+        async with locks.hold("alice"):
+            with pytest.raises(TimeoutError):
+                async with locks.hold("alice", timeout=0.05):
+                    pass
+        async with locks.hold("alice", timeout=0.05):
+            pass
+
+    asyncio.run(scenario())
+
+
+def test_async_hold_serializes_turns_per_key():
+    async def scenario():
+        locks = AsyncStripedLock(4)
+        order = []
+
+        async def turn(name):
+            async with locks.hold("alice"):
+                order.append(f"{name} start")
+                await asyncio.sleep(0.01)
+                order.append(f"{name} end")
+
+        await asyncio.gather(turn("first"), turn("second"))
+        return order
+
+    assert asyncio.run(scenario()) == ["first start", "first end", "second start", "second end"]
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+from chatbot.async_ollama_client import HAS_AIOHTTP, AsyncOllamaClient
+from chatbot.ollama_client import OllamaClient, _never_sent
+
+needs_aiohttp = pytest.mark.skipif(not HAS_AIOHTTP, reason="aiohttp not installed")
+
+
+class FlakyOllama(BaseHTTPRequestHandler):
+    """Answers the first `failures` requests badly (drop or 503), then normally"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _handle(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        with server.lock:
+            server.requests += 1
+            failing = server.requests <= server.failures
+        if failing and server.mode == "drop":
+            self.connection.shutdown(socket.SHUT_RDWR)
+            self.close_connection = True
+            return
+        status, body = (503, b"{}") if failing else (200, json.dumps({"response": "ok"}).encode())
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _handle
+
+
+@pytest.fixture
+def flaky():
+    def start(mode, failures):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyOllama)
+        server.mode, server.failures, server.requests, server.lock = mode, failures, 0, threading.Lock()
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        client = OllamaClient(f"http://127.0.0.1:{server.server_port}", retries=2, backoff=0)
+        return server, client
+
+    servers = []
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def refused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_never_sent_classification():
+    refused = requests.exceptions.ConnectionError(
+        MaxRetryError(None, "/api/generate", NewConnectionError(None, "refused"))
+    )
+    dropped = requests.exceptions.ConnectionError(ProtocolError("Connection aborted."))
+    assert _never_sent(refused)
+    assert _never_sent(requests.exceptions.ConnectTimeout())
+    assert not _never_sent(dropped)
+    assert not _never_sent(requests.exceptions.ReadTimeout())
+    assert not _never_sent(requests.exceptions.ConnectionError())
+
+
+def test_dropped_generation_is_not_resent(flaky):
+    server, client = flaky("drop", failures=1)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.generate("hi")
+    assert server.requests == 1
+
+
+def test_dropped_health_check_is_retried(flaky):
+    server, client = flaky("drop", failures=2)
+    assert client.tags() == {"response": "ok"}
+    assert server.requests == 3
+
+
+def test_unavailable_status_retried_only_for_get(flaky):
+    server, client = flaky("503", failures=2)
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.generate("hi")
+    assert server.requests == 1
+    assert client.tags() == {"response": "ok"}
+    assert server.requests == 3
+
+
+def test_refused_generation_is_retried_then_raised():
+    client = OllamaClient(f"http://127.0.0.1:{refused_port()}", retries=2, backoff=0)
+    attempts = []
+    original = client.session.request
+
+    def counting(*args, **kwargs):
+        attempts.append(args)
+        return original(*args, **kwargs)
+
+    client.session.request = counting
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.generate("hi")
+    assert len(attempts) == 3
+
+
+async def _generate_then_close(client):
+    try:
+        return await client.generate("hi")
+    finally:
+        await client.close()
+
+
+@needs_aiohttp
+def test_async_refused_generation_is_retried():
+    client = AsyncOllamaClient(f"http://127.0.0.1:{refused_port()}", retries=2, backoff=0)
+    with pytest.raises(Exception):
+        asyncio.run(_generate_then_close(client))
+    assert client.stats["upstream"] == 3
+
+
+@needs_aiohttp
+def test_async_dropped_generation_is_not_resent(flaky):
+    server, _ = flaky("drop", failures=1)
+    client = AsyncOllamaClient(f"http://127.0.0.1:{server.server_port}", retries=2, backoff=0)
+    with pytest.raises(Exception):
+        asyncio.run(_generate_then_close(client))
+    assert server.requests == 1
@@ -0,0 +1,106 @@
+import json
+import os
+
+import pytest
+
+from chatbot import personality as personality_module
+from chatbot.personality import PersonalityManager
+
+BASE = {
+    "friendly_assistant": {"name": "Friendly Assistant", "description": "Warm"},
+    "wise_mentor": {"name": "Wise Mentor", "description": "Thoughtful"},
+}
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "personalities.json"
+    path.write_text(json.dumps(BASE))
+    return path
+
+
+def rewrite(path, personalities):
+    path.write_text(json.dumps(personalities))
+    # Make sure the mtime moves even on coarse-grained filesystems
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_edits_are_picked_up_with_the_changed_names(path):
+    manager = PersonalityManager(str(path), check_interval=0)
+    changes = []
+    manager.add_listener(changes.append)
+    version = manager.version
+
+    edited = {**BASE, "wise_mentor": {"name": "Wise Mentor", "description": "Wiser"},
+              "pirate": {"name": "Pirate", "description": "Arr"}}
+    rewrite(path, edited)
+    assert manager.personalities == edited
+    assert manager.version == version + 1
+    assert changes == [{"wise_mentor", "pirate"}]
+
+
+def test_touch_without_edit_changes_nothing(path):
+    manager = PersonalityManager(str(path), check_interval=0)
+    version = manager.version
+    rewrite(path, BASE)
+    assert manager.refresh() is False
+    assert manager.version == version
+
+
+def test_half_written_file_keeps_the_last_good_copy(path):
+    manager = PersonalityManager(str(path), check_interval=0)
+    path.write_text('{"friendly_assistant": {"na')
+    assert manager.refresh(force=True) is False
+    assert manager.personalities == BASE
+
+
+def test_checks_are_rate_limited(path):
+    manager = PersonalityManager(str(path), check_interval=3600)
+    manager.refresh()  # the first read checks the file and starts the interval
+    rewrite(path, {"friendly_assistant": BASE["friendly_assistant"]})
+    assert "wise_mentor" in manager.personalities
+    assert manager.refresh(force=True) is True
+    assert "wise_mentor" not in manager.personalities
+
+
+def test_shared_returns_one_manager_per_file(path, tmp_path):
+    other = tmp_path / "other.json"
+    other.write_text(json.dumps(BASE))
+    assert PersonalityManager.shared(str(path)) is PersonalityManager.shared(str(path))
+    assert PersonalityManager.shared(str(path)) is not PersonalityManager.shared(str(other))
+
+
+def test_custom_personality_is_saved_atomically(path, tmp_path):
+    manager = PersonalityManager(str(path), check_interval=0)
+    changes = []
+    manager.add_listener(changes.append)
+    version = manager.version
+
+    manager.add_custom_personality("pirate", {"name": "Pirate", "description": "Arr"})
+    assert json.loads(path.read_text())["pirate"]["name"] == "Pirate"
+    assert os.listdir(tmp_path) == ["personalities.json"]
+    assert changes == [{"pirate"}]
+    # Our own write is not reloaded as an outside edit
+    assert manager.refresh(force=True) is False
+    assert manager.version == version + 1
+
+
+def test_failed_save_leaves_the_old_file_in_place(path, tmp_path, monkeypatch):
+    manager = PersonalityManager(str(path), check_interval=0)
+    original = path.read_text()
+
+    def broken_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(personality_module.os, "replace", broken_replace)
+    manager.add_custom_personality("pirate", {"name": "Pirate", "description": "Arr"})
+    assert path.read_text() == original
+    assert os.listdir(tmp_path) == ["personalities.json"]
+
+
+def test_missing_file_is_created_with_defaults(tmp_path):
+    path = tmp_path / "data" / "personalities.json"
+    manager = PersonalityManager(str(path), check_interval=0)
+    assert "friendly_assistant" in manager.personalities
+    assert json.loads(path.read_text()) == manager.personalities
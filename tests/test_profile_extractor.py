@@ -0,0 +1,46 @@
+import pytest
+
+from chatbot.profile_extractor import ProfileExtractor, default_extractor
+
+
+@pytest.mark.parametrize("text, name", [
+    ("My name is alice", "Alice"),
+    ("hi, I'm   Bob and I like games", "Bob"),
+    ("call me MAUD.", "Maud"),
+    ("i am x", None),          # one letter is not a name
+    ("I'm 42 years old", None),
+    ("the maximum is fine", None),
+])
+def test_names(text, name):
+    assert default_extractor.extract(text).name == name
+
+
+@pytest.mark.parametrize("text, interests", [
+    ("I love AI and coding", ["technology"]),
+    ("she said hi", []),                  # "ai" inside "said" is not AI
+    ("soccerball is not a sport here", []),
+    ("I enjoy books, films and Piano", ["music", "reading", "movies"]),
+    ("video   games and board games", ["games"]),
+    ("Machine Learning!", ["technology"]),
+])
+def test_interests_match_whole_words_only(text, interests):
+    assert default_extractor.extract_interests(text) == interests
+
+
+def test_triggers():
+    assert default_extractor.extract("I really like it").has_interest_trigger is False
+    assert default_extractor.extract("I like it").has_interest_trigger is True
+    assert default_extractor.extract("I'm interested in travel").has_interest_trigger is True
+
+
+def test_name_word_can_also_be_an_interest():
+    hits = default_extractor.extract("I'm cooking dinner")
+    assert hits.name == "Cooking"
+    assert hits.interests == ["cooking"]
+
+
+def test_custom_vocabulary():
+    extractor = ProfileExtractor(name_patterns=["they call me"], interest_triggers=["i dig"],
+                                 interest_keywords={"space": ["rockets", "black holes"]})
+    hits = extractor.extract("They call me Ziggy and I dig black  holes")
+    assert hits == ("Ziggy", ["space"], True)
@@ -0,0 +1,76 @@
+from chatbot.prompt_builder import PromptBuilder
+
+
+class CharTokenizer:
+    """One token per character, counting how often each piece is tokenized"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, text, add_special_tokens=False):
+        self.encoded.append(text)
+        return [ord(c) for c in text]
+
+
+def text(ids):
+    return "".join(chr(i) for i in ids)
+
+
+def history(*messages):
+    return [{"role": "user" if n % 2 == 0 else "assistant", "message": m}
+            for n, m in enumerate(messages)]
+
+
+def test_everything_fits_in_order():
+    builder = PromptBuilder(CharTokenizer(), context_window=200, max_new_tokens=20)
+    prompt = text(builder.build("Be nice.\n", history("hi", "hello"), "how are you"))
+    assert prompt == "Be nice.\nHuman: hi\nAI: hello\nHuman: how are you\nAI:"
+
+
+def test_oldest_context_dropped_first():
+    header, current = "H\n", "now"
+    context = history("first message", "second message", "third")
+    builder = PromptBuilder(CharTokenizer(), context_window=1000, max_new_tokens=0)
+    full = len(builder.build(header, context, current))
+
+    # One token short of everything: the oldest line has to go, the rest stay
+    builder = PromptBuilder(CharTokenizer(), context_window=full - 1, max_new_tokens=0)
+    prompt = text(builder.build(header, context, current))
+    assert prompt == "H\nAI: second message\nHuman: third\nHuman: now\nAI:"
+    assert len(prompt) <= full - 1
+
+
+def test_a_line_that_does_not_fit_stops_older_ones():
+    builder = PromptBuilder(CharTokenizer(), context_window=40, max_new_tokens=0)
+    prompt = text(builder.build("", history("old", "x" * 30, "new"), "q"))
+    # The long line doesn't fit, and nothing older than it is pulled in around it
+    assert prompt == "Human: new\nHuman: q\nAI:"
+
+
+def test_oversized_message_keeps_its_end_and_the_cue():
+    builder = PromptBuilder(CharTokenizer(), context_window=30, max_new_tokens=10)
+    prompt = text(builder.build("Header\n", history("ignored"), "a" * 50 + "END"))
+    assert len(prompt) == builder.budget == 20
+    assert prompt.endswith("END\nAI:")
+
+
+def test_pieces_are_tokenized_once():
+    tokenizer = CharTokenizer()
+    builder = PromptBuilder(tokenizer, context_window=500, max_new_tokens=20)
+    context = history("hi", "hello")
+    builder.build("Be nice.\n", context, "one")
+    builder.build("Be nice.\n", context + history("one", "reply"), "two")
+    assert sorted(tokenizer.encoded) == sorted(
+        ["AI:", "Be nice.\n", "Human: one\n", "Human: hi\n", "AI: hello\n", "AI: reply\n", "Human: two\n"]
+    )
+
+
+def test_line_cache_is_bounded():
+    tokenizer = CharTokenizer()
+    builder = PromptBuilder(tokenizer, context_window=500, max_new_tokens=20, max_cached_lines=2)
+    for message in ("a", "b", "c"):
+        builder.line_ids("user", message)
+    builder.line_ids("user", "a")  # evicted as least recently used
+    builder.line_ids("user", "c")  # still cached
+    assert tokenizer.encoded.count("Human: a\n") == 2
+    assert tokenizer.encoded.count("Human: c\n") == 1
@@ -0,0 +1,239 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from chatbot.scheduler import BATCH, INTERACTIVE, InferenceScheduler, job_timeout, model_backed
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = InferenceScheduler(workers=1, max_queue=2)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def occupy(scheduler):
+    """Block the single worker until the returned event is set"""
+    release, started = threading.Event(), threading.Event()
+
+    def busy():
+        started.set()
+        release.wait(5)
+        return "busy"
+
+    future = scheduler.submit(busy)
+    assert started.wait(5)
+    return release, future
+
+
+def test_runs_jobs_and_counts_them(scheduler):
+    assert scheduler.run(lambda a, b: a + b, 2, 3) == 5
+    assert scheduler.stats()["completed"] == 1
+
+
+def test_job_expiring_in_queue_gets_its_fallback(scheduler):
+    release, _ = occupy(scheduler)
+    ran = []
+    future = scheduler.submit(ran.append, 1, timeout=0.05, fallback=lambda: "fallback")
+    time.sleep(0.1)
+    release.set()
+    assert future.result(5) == "fallback"
+    assert not ran
+    assert scheduler.stats()["expired"] == 1
+
+
+def test_late_result_falls_back_but_job_finishes(scheduler):
+    release, _ = occupy(scheduler)
+    future = scheduler.submit(lambda: "answer", timeout=5.0, fallback=lambda: "fallback")
+    assert scheduler.result(future, 0.05, lambda: "fallback") == "fallback"
+    assert scheduler.stats()["late"] == 1
+    release.set()
+    assert future.result(5) == "answer"
+
+
+def test_late_result_without_fallback_raises(scheduler):
+    release, busy = occupy(scheduler)
+    with pytest.raises(TimeoutError):
+        scheduler.result(busy, 0.01)
+    release.set()
+
+
+def test_full_queue_evicts_batch_for_interactive(scheduler):
+    release, _ = occupy(scheduler)
+    first = scheduler.submit(lambda: "batch 1", priority=BATCH, fallback=lambda: "shed")
+    second = scheduler.submit(lambda: "batch 2", priority=BATCH, fallback=lambda: "shed")
+    urgent = scheduler.submit(lambda: "interactive", priority=INTERACTIVE)
+
+    # The newest lower-priority job makes room
+    assert second.result(1) == "shed"
+    release.set()
+    assert urgent.result(5) == "interactive"
+    assert first.result(5) == "batch 1"
+    assert scheduler.stats()["rejected"] == 1
+
+
+def test_full_queue_rejects_same_priority(scheduler):
+    release, _ = occupy(scheduler)
+    queued = [scheduler.submit(lambda: "ok", priority=BATCH) for _ in range(2)]
+    rejected = scheduler.submit(lambda: "ok", priority=BATCH, fallback=lambda: "rejected")
+    assert rejected.result(1) == "rejected"
+    release.set()
+    assert [future.result(5) for future in queued] == ["ok", "ok"]
+
+
+def test_admission_rejects_jobs_that_would_miss_their_deadline(scheduler):
+    scheduler._service_time = 1.0
+    future = scheduler.submit(lambda: "ok", timeout=0.1, fallback=lambda: "rejected")
+    assert future.result(1) == "rejected"
+    assert scheduler.stats()["rejected"] == 1
+
+
+def test_only_model_backed_jobs_feed_the_service_time(scheduler):
+    scheduler.run(lambda: "canned")
+    assert scheduler.stats()["service_time_ms"] is None
+
+    def model_call():
+        model_backed()
+        time.sleep(0.02)
+        return "generated"
+
+    scheduler.run(model_call)
+    assert scheduler.stats()["service_time_ms"] >= 20
+
+
+def test_failed_job_without_fallback_raises(scheduler):
+    def boom():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        scheduler.run(boom)
+    assert scheduler.run(boom, fallback=lambda: "fallback") == "fallback"
+    assert scheduler.stats()["failed"] == 2
+
+
+def test_shutdown_rejects_new_jobs(scheduler):
+    scheduler.shutdown()
+    assert scheduler.submit(lambda: "ok", fallback=lambda: "closed").result(1) == "closed"
+
+
+def test_async_jobs_run_on_the_loop_within_their_slots():
+    scheduler = InferenceScheduler(workers=1, max_queue=8, async_slots=2)
+    running, peak = [0], [0]
+
+    async def generate(n):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        return n
+
+    async def scenario():
+        tasks = [scheduler.submit_async(generate, n) for n in range(6)]
+        return [await scheduler.result_async(task, 5) for task in tasks]
+
+    try:
+        assert asyncio.run(scenario()) == list(range(6))
+        assert peak[0] == 2
+        stats = scheduler.stats()
+        assert stats["completed"] == 6 and stats["async_running"] == 0
+    finally:
+        scheduler.shutdown()
+
+
+def test_async_job_expiring_in_queue_gets_its_fallback():
+    scheduler = InferenceScheduler(workers=1, async_slots=1)
+
+    async def scenario():
+        release = asyncio.Event()
+        busy = scheduler.submit_async(release.wait)
+        await asyncio.sleep(0)
+        waiting = scheduler.submit_async(asyncio.sleep, 0, "ran", timeout=0.05,
+                                         fallback=lambda: "fallback")
+        await asyncio.sleep(0.1)
+        release.set()
+        await busy
+        # The slot freed by busy went to no one: a new job starts at once
+        assert await scheduler.submit_async(asyncio.sleep, 0, "next") == "next"
+        return await waiting
+
+    try:
+        assert asyncio.run(scenario()) == "fallback"
+        assert scheduler.stats()["expired"] == 1
+        assert scheduler.stats()["async_running"] == 0
+    finally:
+        scheduler.shutdown()
+
+
+def test_full_async_queue_evicts_batch_for_interactive():
+    scheduler = InferenceScheduler(workers=1, max_queue=1, async_slots=1)
+
+    async def scenario():
+        release = asyncio.Event()
+        busy = scheduler.submit_async(release.wait)
+        await asyncio.sleep(0)
+        batch = scheduler.submit_async(asyncio.sleep, 0, "batch", priority=BATCH,
+                                       fallback=lambda: "shed")
+        await asyncio.sleep(0)
+        urgent = scheduler.submit_async(asyncio.sleep, 0, "interactive", priority=INTERACTIVE)
+        rejected = scheduler.submit_async(asyncio.sleep, 0, "again", priority=INTERACTIVE,
+                                          fallback=lambda: "rejected")
+        assert await batch == "shed"
+        assert await rejected == "rejected"
+        release.set()
+        return await urgent
+
+    try:
+        assert asyncio.run(scenario()) == "interactive"
+        assert scheduler.stats()["rejected"] == 2
+    finally:
+        scheduler.shutdown()
+
+
+def test_cancelled_async_waiter_passes_its_turn_on():
+    scheduler = InferenceScheduler(workers=1, async_slots=1)
+
+    async def scenario():
+        release = asyncio.Event()
+        busy = scheduler.submit_async(release.wait)
+        await asyncio.sleep(0)
+        gone = scheduler.submit_async(asyncio.sleep, 0, "gone")
+        after = scheduler.submit_async(asyncio.sleep, 0, "after")
+        await asyncio.sleep(0)
+        gone.cancel()
+        release.set()
+        await busy
+        return await asyncio.wait_for(after, 1)
+
+    try:
+        assert asyncio.run(scenario()) == "after"
+        assert scheduler.stats()["async_running"] == 0
+    finally:
+        scheduler.shutdown()
+
+
+def test_late_async_result_falls_back_but_job_finishes():
+    scheduler = InferenceScheduler(workers=1, async_slots=1)
+
+    async def scenario():
+        task = scheduler.submit_async(asyncio.sleep, 0.1, "answer")
+        assert await scheduler.result_async(task, 0.01, lambda: "fallback") == "fallback"
+        return await task
+
+    try:
+        assert asyncio.run(scenario()) == "answer"
+        assert scheduler.stats()["late"] == 1
+    finally:
+        scheduler.shutdown()
+
+
+def test_job_timeout_is_the_budget_of_the_running_job():
+    scheduler = InferenceScheduler(workers=1, timeouts={INTERACTIVE: 15.0, BATCH: 120.0})
+    try:
+        assert job_timeout(7.0) == 7.0
+        assert scheduler.run(job_timeout) == pytest.approx(15.0)
+        assert scheduler.run(job_timeout, priority=BATCH) == pytest.approx(120.0)
+        assert scheduler.run(job_timeout, timeout=3.0) == pytest.approx(3.0)
+    finally:
+        scheduler.shutdown()
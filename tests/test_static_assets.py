@@ -0,0 +1,78 @@
+import gzip
+
+from chatbot.static_assets import IMMUTABLE, REVALIDATE, Precompressed, RenderedPage, StaticAssets
+
+BODY = b"body { color: #333; }\n" * 40
+
+
+def test_matching_etag_gets_an_empty_304():
+    asset = Precompressed(BODY, "text/css")
+    status, headers, body = asset.respond()
+    assert status == 200 and body == BODY
+    etag = dict(headers)["ETag"]
+
+    status, headers, body = asset.respond(if_none_match=etag)
+    assert status == 304 and body == b""
+    assert "Content-Length" not in dict(headers)
+
+
+def test_any_encodings_tag_revalidates_the_content():
+    asset = Precompressed(BODY, "text/css")
+    gzip_tag = dict(asset.respond(accept_encoding="gzip")[1])["ETag"]
+    assert gzip_tag != asset.etag()
+    assert asset.respond(if_none_match=gzip_tag)[0] == 304
+    assert asset.respond(if_none_match=f'W/{asset.etag()}, "other"')[0] == 304
+    assert asset.respond(if_none_match="*")[0] == 304
+    assert asset.respond(if_none_match='"0123456789abcdef"')[0] == 200
+
+
+def test_precompressed_body_is_served_to_clients_that_accept_it():
+    asset = Precompressed(BODY, "text/css")
+    status, headers, body = asset.respond(accept_encoding="gzip, deflate")
+    headers = dict(headers)
+    assert headers["Content-Encoding"] in ("gzip", "br")
+    assert headers["Vary"] == "Accept-Encoding"
+    assert int(headers["Content-Length"]) == len(body) < len(BODY)
+    if headers["Content-Encoding"] == "gzip":
+        assert gzip.decompress(body) == BODY
+
+    status, headers, body = asset.respond(accept_encoding="gzip;q=0, identity")
+    assert "Content-Encoding" not in dict(headers) and body == BODY
+
+
+def test_small_bodies_are_not_compressed():
+    asset = Precompressed(b"tiny", "text/plain")
+    status, headers, body = asset.respond(accept_encoding="gzip, br")
+    assert body == b"tiny"
+    assert "Vary" not in dict(headers) and "Content-Encoding" not in dict(headers)
+
+
+def test_hashed_names_are_immutable_and_change_with_content(tmp_path):
+    (tmp_path / "chat.css").write_bytes(BODY)
+    assets = StaticAssets(str(tmp_path))
+    url = assets.url("chat.css")
+    assert url.startswith("/static/chat.") and url.endswith(".css")
+    assert assets.get(url.rsplit("/", 1)[1]).cache_control == IMMUTABLE
+    assert assets.get("chat.css").cache_control == REVALIDATE
+
+    (tmp_path / "chat.css").write_bytes(BODY + b"a { }\n")
+    assets.load()
+    assert assets.url("chat.css") != url
+    assert assets.get(url.rsplit("/", 1)[1]) is None
+
+
+def test_rendered_page_rerenders_only_when_version_changes():
+    renders, version = [], [1]
+
+    def render():
+        renders.append(version[0])
+        return f"<p>version {version[0]}</p>"
+
+    page = RenderedPage(render, lambda: version[0])
+    first = page.get()
+    assert page.get() is first and renders == [1]
+
+    version[0] = 2
+    second = page.get()
+    assert second is not first and renders == [1, 2]
+    assert second.respond(if_none_match=first.etag())[0] == 200
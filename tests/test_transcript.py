@@ -0,0 +1,153 @@
+import re
+
+import pytest
+
+pytest.importorskip("tkinter")
+
+from chatbot.memory import ConversationMemory
+from gui.transcript import Transcript
+
+
+class FakeText:
+    """Just enough of a Tk Text widget: one string, marks as offsets with right gravity"""
+
+    def __init__(self):
+        self.content = "\n"
+        self.marks = {}
+        self.view = 0
+        self.idle = []
+
+    def _offset(self, index):
+        index = str(index)
+        if index == "end":
+            return len(self.content)
+        if index.startswith("end-"):
+            return len(self.content) - int(index[4:-1])
+        if index == "@0,0":
+            return self.view
+        if index in self.marks:
+            return self.marks[index]
+        line, column = map(int, index.split("."))
+        return sum(len(text) + 1 for text in self.content.split("\n")[:line - 1]) + column
+
+    def index(self, index):
+        before = self.content[:self._offset(index)]
+        return f"{before.count(chr(10)) + 1}.{len(before) - before.rfind(chr(10)) - 1}"
+
+    def insert(self, index, *chunks):
+        at = min(self._offset(index), len(self.content) - 1)
+        text = "".join(chunks[0::2])
+        self.content = self.content[:at] + text + self.content[at:]
+        for mark, offset in self.marks.items():
+            if offset >= at:
+                self.marks[mark] = offset + len(text)
+        if self.view > at or (self.view == at and at > 0):
+            self.view += len(text)
+
+    def delete(self, start, end):
+        start, end = self._offset(start), min(self._offset(end), len(self.content) - 1)
+        if end <= start:
+            return
+        self.content = self.content[:start] + self.content[end:]
+
+        def shift(offset):
+            if start <= offset < end:
+                return start
+            return offset - (end - start) if offset >= end else offset
+
+        self.marks = {mark: shift(offset) for mark, offset in self.marks.items()}
+        self.view = shift(self.view)
+
+    def mark_set(self, mark, index):
+        self.marks[mark] = self._offset(index)
+
+    def mark_unset(self, mark):
+        self.marks.pop(mark, None)
+
+    def yview(self, index=None):
+        if index is None:
+            return (0.0, 1.0)
+        self.view = self._offset(index)
+
+    def see(self, index):
+        pass
+
+    def configure(self, **options):
+        pass
+
+    def bind(self, *args, **kwargs):
+        pass
+
+    def after_idle(self, fn, *args):
+        self.idle.append((fn, args))
+
+
+@pytest.fixture
+def memory(tmp_path):
+    memory = ConversationMemory(str(tmp_path / "conversations.db"))
+    for n in range(30):
+        memory.add_message("alice", "user" if n % 2 == 0 else "assistant", f"m{n}")
+    memory.add_message("bob", "user", "not alice's")
+    return memory
+
+
+def shown(text):
+    return re.findall(r"\bm\d+\b|live\d+", text.content)
+
+
+def assert_marks_in_order(transcript, text):
+    offsets = [text.marks[block.mark] for block in transcript.blocks]
+    assert offsets == sorted(set(offsets))
+
+
+def test_keyset_pages(memory):
+    newest = memory.get_messages_before("alice", None, 5)
+    assert [row["message"] for row in newest] == [f"m{n}" for n in range(25, 30)]
+    older = memory.get_messages_before("alice", newest[0]["id"], 5)
+    assert [row["message"] for row in older] == [f"m{n}" for n in range(20, 25)]
+    newer = memory.get_messages_after("alice", older[-1]["id"], 3)
+    assert [row["message"] for row in newer] == ["m25", "m26", "m27"]
+    assert memory.get_messages_before("alice", memory.get_messages_after("alice", 0, 1)[0]["id"], 5) == []
+
+
+def test_new_messages_trim_the_top(memory):
+    text = FakeText()
+    transcript = Transcript(text, memory, "alice", max_messages=10, page_size=4)
+    for n in range(12):
+        transcript.append("You", f"live{n}", "user")
+    assert shown(text) == [f"live{n}" for n in range(2, 12)]
+    assert_marks_in_order(transcript, text)
+
+
+def test_scrolling_back_pages_older_history_then_newer(memory):
+    text = FakeText()
+    transcript = Transcript(text, memory, "alice", max_messages=10, page_size=4)
+
+    loaded = []
+    while not transcript._older_exhausted:
+        loaded.append(transcript.page_older())
+        assert_marks_in_order(transcript, text)
+        assert len(transcript.blocks) <= 10
+    assert sum(loaded) == 30
+    # Paged all the way up: the window holds the oldest messages
+    assert shown(text) == [f"m{n}" for n in range(10)]
+    assert transcript._bottom_cursor is not None
+
+    while transcript._bottom_cursor is not None:
+        transcript.page_newer()
+        assert_marks_in_order(transcript, text)
+    assert shown(text) == [f"m{n}" for n in range(20, 30)]
+
+
+def test_new_message_while_scrolled_back_jumps_to_latest(memory):
+    text = FakeText()
+    transcript = Transcript(text, memory, "alice", max_messages=10, page_size=4)
+    for _ in range(5):
+        transcript.page_older()
+    assert transcript._bottom_cursor is not None
+
+    message_id = memory.add_message("alice", "user", "m30")
+    transcript.append("You", "m30", "user", message_id=message_id)
+    assert shown(text) == ["m26", "m27", "m28", "m29", "m30"]
+    assert transcript._bottom_cursor is None
+    assert_marks_in_order(transcript, text)
@@ -2,51 +2,117 @@
 ConvoAI Web Interface with Personality Selection - FIXED
 """
 
-from flask import Flask, render_template, request, jsonify
+import hmac
+import html
+import json
+import logging
+import os
+import threading
+import time
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, abort, g
 from chatbot.personality_brain import ConvoAIBrain
 from chatbot.web_memory_fixed import ConversationMemory
+from chatbot.memory import ConversationMemory as SQLiteMemory
 from chatbot.personality import PersonalityManager
+from chatbot.scheduler import InferenceScheduler, INTERACTIVE, BATCH
+from chatbot.backend_router import router_from_settings
+from chatbot.static_assets import StaticAssets, RenderedPage
+from chatbot.lock_striping import StripedLock
+from chatbot.sessions import SESSION_COOKIE, SESSION_MAX_AGE, BATCH_USER_PREFIX, new_session_id, valid_session_id, user_id_for
+from chatbot.batching import parse_batch
+from chatbot.metrics import REGISTRY, CONTENT_TYPE, ERRORS, QUEUE_DEPTH, REQUESTS, REQUEST_SECONDS
+from chatbot import tracing
+from chatbot.log import configure_logging
+from config.settings import Settings
 
-app = Flask(__name__)
+# Static files are served by static_asset() with hashing and precompression
+app = Flask(__name__, static_folder=None)
 
 # Initialize ConvoAI
-print("🤖 Starting ConvoAI Web Interface with Personalities...")
-memory = ConversationMemory()
+configure_logging()
+logger = logging.getLogger(__name__)
+logger.info("Starting ConvoAI web interface (pid %d)", os.getpid())
+if Settings.WEB_MEMORY_BACKEND == "sqlite":
+    # Shared by every server process (WAL lets them read while one writes)
+    memory = SQLiteMemory(Settings.MEMORY_DB_PATH, wal=True)
+else:
+    memory = ConversationMemory()
 brain = ConvoAIBrain(memory)
-personality_manager = PersonalityManager()
+# The same instance the brain uses: one parse, reloaded when the file is edited
+personality_manager = PersonalityManager.shared()
 
-@app.route('/')
-def home():
-    # Get available personalities
+# Optional hedged routing across several backends (Settings.WEB_BACKENDS)
+router = router_from_settings(memory, brain)
+chat_brain = router or brain
+
+# Bounded queue in front of the brain so load can't pile up without limit
+scheduler = InferenceScheduler(
+    workers=Settings.SCHEDULER_WORKERS,
+    max_queue=Settings.SCHEDULER_MAX_QUEUE,
+    timeouts={INTERACTIVE: Settings.INTERACTIVE_DEADLINE, BATCH: Settings.BATCH_DEADLINE},
+    name="web-inference",
+    async_slots=Settings.SCHEDULER_ASYNC_SLOTS
+)
+QUEUE_DEPTH.labels("web-inference").set_function(scheduler.queue_depth)
+
+# One browser session's turns run in order; different sessions run in parallel
+user_locks = StripedLock(Settings.WEB_LOCK_STRIPES)
+# Streams hold their connection to the backend for the whole reply, outside the scheduler
+stream_slots = threading.BoundedSemaphore(Settings.WEB_MAX_STREAMS)
+
+def session_user_id():
+    """user_id for this browser, issuing a session cookie on first contact"""
+    session_id = request.cookies.get(SESSION_COOKIE)
+    if not valid_session_id(session_id):
+        session_id = g.new_session_id = new_session_id()
+    return user_id_for(session_id)
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+    g.trace = tracing.begin(f"{request.method} {request.path}", request.headers.get('X-Request-ID'))
+
+@app.teardown_request
+def finish_trace(error=None):
+    # Streamed responses tear down once the stream ends, so their trace covers it
+    trace = g.pop('trace', None)
+    if trace is not None:
+        tracing.finish(trace)
+
+@app.after_request
+def record_request(response):
+    # Streaming routes are timed until their response starts, not until the stream ends
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUEST_SECONDS.labels(route, request.method).observe(time.perf_counter() - g.request_started)
+    REQUESTS.labels(route, request.method, response.status_code).inc()
+    if response.status_code >= 500:
+        ERRORS.labels("web").inc()
+    if 'trace' in g:
+        response.headers['X-Request-ID'] = g.trace.request_id
+    return response
+
+@app.after_request
+def set_session_cookie(response):
+    session_id = g.pop('new_session_id', None)
+    if session_id:
+        response.set_cookie(SESSION_COOKIE, session_id, max_age=SESSION_MAX_AGE,
+                            httponly=True, samesite='Lax')
+    return response
+
+def render_home():
+    """The chat page HTML; rendered once per personality change, not per request"""
     personalities = personality_manager.available_personalities()
     
     personality_options = ""
     for p in personalities:
-        display_name = p.replace("_", " ").title()
-        personality_options += f'<option value="{p}">{display_name}</option>'
+        display_name = html.escape(p.replace("_", " ").title())
+        personality_options += f'<option value="{html.escape(p)}">{display_name}</option>'
     
-    return f'''
-<!DOCTYPE html>
+    return f'''<!DOCTYPE html>
 <html>
 <head>
     <title>ConvoAI - Intelligent Chatbot</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 20px; background: #f0f2f5; }}
-        .container {{ max-width: 800px; margin: 0 auto; background: white; border-radius: 10px; padding: 20px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
-        .header {{ text-align: center; color: #333; margin-bottom: 30px; }}
-        .personality-selector {{ margin-bottom: 20px; text-align: center; }}
-        .personality-selector select {{ padding: 8px; border-radius: 5px; border: 2px solid #ddd; font-size: 16px; }}
-        .chat-box {{ border: 2px solid #ddd; border-radius: 10px; height: 400px; overflow-y: auto; padding: 15px; margin-bottom: 20px; background: #fafafa; }}
-        .message {{ margin: 10px 0; padding: 10px; border-radius: 8px; }}
-        .user {{ background: #007bff; color: white; margin-left: 20%; text-align: right; }}
-        .ai {{ background: #e9ecef; color: #333; margin-right: 20%; }}
-        .personality-tag {{ background: #28a745; color: white; padding: 2px 6px; border-radius: 4px; font-size: 12px; margin-left: 5px; }}
-        .input-area {{ display: flex; gap: 10px; }}
-        .input-area input {{ flex: 1; padding: 12px; border: 2px solid #ddd; border-radius: 8px; font-size: 16px; }}
-        .input-area button {{ padding: 12px 20px; background: #007bff; color: white; border: none; border-radius: 8px; cursor: pointer; font-size: 16px; }}
-        .input-area button:hover {{ background: #0056b3; }}
-        .status {{ text-align: center; color: #666; margin-bottom: 20px; }}
-    </style>
+    <link rel="stylesheet" href="{assets.url('chat.css')}">
 </head>
 <body>
     <div class="container">
@@ -68,7 +134,7 @@ def home():
         
         <div id="chat-box" class="chat-box">
             <div class="message ai">
-                <strong>ConvoAI:</strong> <span class="personality-tag" id="current-personality">{personalities[0].replace("_", " ").title()}</span> Hello! I'm ConvoAI with {len(personalities)} different personalities. Choose a personality above and let's chat!
+                <strong>ConvoAI:</strong> <span class="personality-tag" id="current-personality">{html.escape(personalities[0].replace("_", " ").title())}</span> Hello! I'm ConvoAI with {len(personalities)} different personalities. Choose a personality above and let's chat!
             </div>
         </div>
         
@@ -78,61 +144,34 @@ def home():
         </div>
     </div>
 
-    <script>
-        let currentPersonality = '{personalities[0]}';
-        
-        function updatePersonality() {{
-            const select = document.getElementById('personality');
-            currentPersonality = select.value;
-            document.getElementById('current-personality').textContent = select.options[select.selectedIndex].text;
-        }}
-        
-        async function sendMessage() {{
-            const input = document.getElementById('user-input');
-            const chatBox = document.getElementById('chat-box');
-            const message = input.value.trim();
-            
-            if (!message) return;
-            
-            // Add user message
-            chatBox.innerHTML += '<div class="message user"><strong>You:</strong> ' + message + '</div>';
-            input.value = '';
-            chatBox.scrollTop = chatBox.scrollHeight;
-            
-            // Add thinking indicator
-            chatBox.innerHTML += '<div class="message ai" id="thinking"><strong>ConvoAI:</strong> <span class="personality-tag">' + document.getElementById('current-personality').textContent + '</span> <em>🧠 Thinking...</em></div>';
-            chatBox.scrollTop = chatBox.scrollHeight;
-            
-            try {{
-                // Send to backend with personality
-                const response = await fetch('/chat', {{
-                    method: 'POST',
-                    headers: {{ 'Content-Type': 'application/json' }},
-                    body: JSON.stringify({{ 
-                        message: message,
-                        personality: currentPersonality
-                    }})
-                }});
-                
-                const data = await response.json();
-                
-                // Remove thinking indicator
-                document.getElementById('thinking').remove();
-                
-                // Add AI response with personality tag
-                chatBox.innerHTML += '<div class="message ai"><strong>ConvoAI:</strong> <span class="personality-tag">' + document.getElementById('current-personality').textContent + '</span> ' + data.response + '</div>';
-                chatBox.scrollTop = chatBox.scrollHeight;
-                
-            }} catch (error) {{
-                document.getElementById('thinking').remove();
-                chatBox.innerHTML += '<div class="message ai"><strong>ConvoAI:</strong> <em>Sorry, I encountered an error. Please try again.</em></div>';
-                chatBox.scrollTop = chatBox.scrollHeight;
-            }}
-        }}
-    </script>
+    <script src="{assets.url('chat.js')}"></script>
 </body>
 </html>
-    '''
+'''
+
+# CSS/JS under content-hashed names; the page itself is cached until personalities change
+# (reading version notices edits to personalities.json, at most once per check interval)
+assets = StaticAssets(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+home_page = RenderedPage(render_home, lambda: personality_manager.version)
+
+def precompressed_response(resource):
+    """Flask response for a Precompressed body (304 if the client's copy is current)"""
+    status, headers, body = resource.respond(
+        request.headers.get('If-None-Match'), request.headers.get('Accept-Encoding')
+    )
+    return Response(body, status=status, headers=headers)
+
+@app.route('/')
+def home():
+    session_user_id()
+    return precompressed_response(home_page.get())
+
+@app.route('/static/<path:name>')
+def static_asset(name):
+    resource = assets.get(name)
+    if resource is None:
+        abort(404)
+    return precompressed_response(resource)
 
 @app.route('/chat', methods=['POST'])
 def chat():
@@ -140,15 +179,151 @@ def chat():
         data = request.json
         user_message = data.get('message', '')
         personality = data.get('personality', 'friendly_assistant')
+        priority = BATCH if data.get('priority') == 'batch' else INTERACTIVE
+        user_id = session_user_id()
         
-        # Generate AI response with personality
-        response = brain.generate_response(user_message, 'web_user', personality)
+        fallback = lambda: chat_brain.get_fallback(personality, reason="deadline")
+        # One deadline covers waiting for the session's lock and for the reply
+        deadline = time.monotonic() + scheduler.timeouts[priority]
+        try:
+            # Wait for this browser's previous turn here, not on a scheduler worker
+            lock = user_locks.acquire(user_id, timeout=scheduler.timeouts[priority])
+        except TimeoutError:
+            return jsonify({'response': fallback()})
+        try:
+            future = scheduler.submit(
+                chat_brain.generate_response, user_message, user_id, personality,
+                priority=priority, timeout=deadline - time.monotonic(), fallback=fallback
+            )
+        except BaseException:
+            lock.release()
+            raise
+        # A late reply still finishes (and stores its turn) on its worker; keep the session's
+        # lock until then so the browser's next turn can't interleave with it
+        future.add_done_callback(lambda _: lock.release())
+        response = scheduler.result(future, deadline - time.monotonic(), fallback)
         
         return jsonify({'response': response})
     except Exception as e:
+        ERRORS.labels("web").inc()
         return jsonify({'response': f'Error: {str(e)}'})
 
+def stream_reply(user_message, user_id, personality, timeout):
+    """Reply chunks for /chat/stream, at most WEB_MAX_STREAMS at a time.
+
+    The Ollama brain streams; the hedged router (WEB_BACKENDS) answers in
+    one chunk. A stream that can't start within timeout gets the fallback.
+    """
+    if not stream_slots.acquire(timeout=max(timeout, 0)):
+        yield chat_brain.get_fallback(personality, reason="deadline")
+        return
+    try:
+        if router is None:
+            yield from brain.generate_response_stream(user_message, user_id, personality)
+        else:
+            yield router.generate_response(user_message, user_id, personality)
+    finally:
+        stream_slots.release()
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    data = request.json or {}
+    user_message = data.get('message', '')
+    personality = data.get('personality', 'friendly_assistant')
+    user_id = session_user_id()
+    
+    def events():
+        # Server-Sent Events: one "data:" frame per chunk, then a final "done" frame
+        parts = []
+        deadline = time.monotonic() + Settings.INTERACTIVE_DEADLINE
+        try:
+            with user_locks.hold(user_id, timeout=Settings.INTERACTIVE_DEADLINE):
+                for text in stream_reply(user_message, user_id, personality, deadline - time.monotonic()):
+                    parts.append(text)
+                    yield f"data: {json.dumps({'token': text})}\n\n"
+            yield f"event: done\ndata: {json.dumps({'response': ''.join(parts)})}\n\n"
+        except Exception as e:
+            ERRORS.labels("web").inc()
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """Many chat turns in one request, streamed back as NDJSON in completion order"""
+    data = request.get_json(silent=True) or {}
+    try:
+        items = parse_batch(data.get('items'), user_prefix=BATCH_USER_PREFIX,
+                            max_items=Settings.BATCH_MAX_ITEMS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def lines():
+        # One {"index", "response", "elapsed_ms"} line per item, then a summary line
+        start = time.perf_counter()
+        errors = 0
+        # Items queue on the shared scheduler at BATCH priority, behind interactive chats
+        for result in chat_brain.generate_batch(items, scheduler=scheduler):
+            errors += bool(result.error)
+            yield json.dumps(result.to_dict()) + "\n"
+        yield json.dumps({'done': True, 'count': len(items), 'errors': errors,
+                          'elapsed_s': round(time.perf_counter() - start, 3)}) + "\n"
+    
+    return Response(
+        stream_with_context(lines()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/status')
+def status():
+    stats = {
+        'scheduler': scheduler.stats(),
+        'ollama_breaker': brain.breaker.stats(),
+        'intents': brain.intent_router.stats(),
+        'user_locks': user_locks.stats()
+    }
+    if router:
+        stats['router'] = router.stats()
+    return jsonify(stats)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text format; each server process has its own registry"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+def require_admin():
+    """Admin routes exist only when ADMIN_TOKEN is set, and need it in X-Admin-Token"""
+    token = request.headers.get('X-Admin-Token', '')
+    if not Settings.ADMIN_TOKEN or not hmac.compare_digest(token, Settings.ADMIN_TOKEN):
+        abort(404)
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    """POST {"seconds": 10} samples this process's stacks into a collapsed-stack file"""
+    require_admin()
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            path = tracing.start_profile(data.get('seconds', 10))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'seconds must be a number'}), 400
+        except RuntimeError as e:
+            return jsonify({'error': str(e)}), 409
+        return jsonify({'path': path, 'pid': os.getpid()}), 202
+    return jsonify(tracing.SAMPLER.status())
+
+@app.route('/admin/traces')
+def admin_traces():
+    """Span breakdowns of the most recent requests slower than TRACE_SLOW_MS"""
+    require_admin()
+    return jsonify({'slow_ms': Settings.TRACE_SLOW_MS,
+                    'traces': [trace.to_dict() for trace in reversed(tracing.SLOW_TRACES)]})
+
 if __name__ == '__main__':
-    print("🌐 Starting web interface with personalities...")
-    print("🔗 Access your chatbot at: http://localhost:5000")
+    logger.info("Access your chatbot at: http://localhost:5001")
     app.run(host='0.0.0.0', port=5001, debug=True)